@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark offline del throughput end-to-end
+Un server HTTP locale serve pannelli Maps (fixture con la stessa struttura DOM letta
+dall'estrattore e lo stato APP_INITIALIZATION_STATE, assente in una scheda su nove per
+misurare anche il ripiego sul DOM) e siti aziendali sintetici; le righe finiscono in un
+foglio Sheets finto.
+Il percorso misurato è quello reale: worker() → estrai_dati_azienda → estrai_contatti_da_sito.
+
+Uso:
+    python bench/bench_throughput.py --urls 2000 --workers 4
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from queue import Queue
+from string import Template
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = Path(__file__).resolve().parent.parent
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+sys.path.insert(0, str(ROOT))
+
+from metrics import chromium_rss_by_browser
+
+BENCH_DOMAIN = "bench.local"
+HOST_RULES = f"MAP *.{BENCH_DOMAIN} 127.0.0.1"
+CATEGORIES = ["Ristorante", "Idraulico", "Parrucchiere", "Studio dentistico", "Ferramenta", "Hotel"]
+FILLER = "<p>" + "Da oltre vent'anni al servizio dei clienti della zona con professionalità e cortesia. " * 30 + "</p>"
+PHOTO_BYTES = b"\xff\xd8\xff\xe0" + b"\x00" * 40_000
+
+
+def place_state_script(name, category, address, phone, website, rating, reviews, cid):
+    """<script> con APP_INITIALIZATION_STATE nella forma letta da place_state.py"""
+    place = [None] * 179
+    place[4] = [None] * 7 + [rating, reviews]
+    place[7] = [website, website.split("//", 1)[-1].rstrip("/")] if website else None
+    place[10] = f"0x0:{cid:#x}"
+    place[11] = name
+    place[13] = [category]
+    place[18] = f"{name}, {address}"
+    place[39] = address
+    place[178] = [[phone, [[phone.replace(" ", ""), 1]]]] if phone else None
+    payload = ")]}'\n" + json.dumps([None] * 6 + [place], ensure_ascii=False)
+    state = [[[0, 0, 0], [0, 0], [800, 600], 1], None, None, [None] * 6 + [payload]]
+    script = json.dumps(state, ensure_ascii=False).replace("</", "<\\/")
+    return f"<script>window.APP_INITIALIZATION_STATE={script};window.APP_FLAGS=[];</script>"
+
+
+# ========== SERVER LOCALE ==========
+class BenchServer:
+    """Server HTTP che simula Google Maps (maps.bench.local) e i siti (bizN.bench.local)"""
+
+    def __init__(self, n_sites):
+        self.n_sites = max(1, n_sites)
+        self.place_template = Template((FIXTURES / "place_panel.html").read_text(encoding="utf-8"))
+        self.bytes_sent = 0
+        self.requests = 0
+        self.first_hit = {}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="bench-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def place_url(self, index):
+        return f"http://maps.{BENCH_DOMAIN}:{self.port}/maps/place/{index}"
+
+    def site_url(self, site):
+        return f"http://biz{site}.{BENCH_DOMAIN}:{self.port}/"
+
+    def render(self, host, path):
+        """Ritorna (status, content_type, body) per host e path richiesti"""
+        path = path.split("?", 1)[0]
+        if host == f"maps.{BENCH_DOMAIN}":
+            if path.startswith("/maps/photo/"):
+                return 200, "image/jpeg", PHOTO_BYTES
+            if path.startswith("/maps/place/"):
+                return 200, "text/html; charset=utf-8", self._render_place(int(path.rsplit("/", 1)[-1]))
+        elif host.startswith("biz") and host.endswith("." + BENCH_DOMAIN):
+            site = int(host[3:].split(".", 1)[0])
+            if path.endswith(".png"):
+                return 200, "image/png", PHOTO_BYTES
+            page = self._render_site(site, path)
+            if page is not None:
+                return 200, "text/html; charset=utf-8", page
+        return 404, "text/plain", b"not found"
+
+    def _render_place(self, index):
+        with self._lock:
+            self.first_hit.setdefault(index, time.monotonic())
+        name = f"Azienda Bench {index}"
+        phone = f"+39 02 {index:07d}"
+        phone_block = "" if index % 7 == 0 else (
+            f'<button class="CsEnBe" data-item-id="phone:tel:{phone}" aria-label="Telefono: {phone}">'
+            f'<div class="Io6YTe fontBodyMedium">{phone}</div></button>'
+        )
+        website_block = ""
+        url = None
+        if index % 4 != 0:
+            url = self.site_url(index % self.n_sites)
+            website_block = (
+                f'<a class="CsEnBe" data-item-id="authority" aria-label="Sito web: {url}" href="{url}">'
+                f'<div class="Io6YTe fontBodyMedium">{url}</div></a>'
+            )
+        category = CATEGORIES[index % len(CATEGORIES)]
+        address = f"Via Roma {index % 200 + 1}, 20100 Milano MI"
+        state_script = "" if index % 9 == 0 else place_state_script(
+            name, category, address, None if index % 7 == 0 else phone, url, 4 + index % 10 / 10, index % 500, index + 1,
+        )
+        return self.place_template.substitute(
+            name=name,
+            index=index,
+            rating="4,%d" % (index % 10),
+            reviews=index % 500,
+            category=category,
+            address=address,
+            phone_block=phone_block,
+            website_block=website_block,
+            state_script=state_script,
+        ).encode("utf-8")
+
+    def _render_site(self, site, path):
+        """Cinque varianti: mailto+social, email solo in /contatti, email nel testo,
+        guscio JavaScript, nessun contatto"""
+        kind = site % 5
+        email = f"info@biz{site}.{BENCH_DOMAIN}"
+        nav = '<nav><a href="/">Home</a> <a href="/servizi">Servizi</a> <a href="/contatti">Contatti</a></nav>'
+        logo = '<img src="/logo.png" alt="logo">'
+        if path == "/contatti":
+            body = f"<h1>Contatti</h1><p>Scrivici a {email}</p>" if kind == 1 else "<h1>Contatti</h1>"
+        elif path in ("/", ""):
+            if kind == 0:
+                body = (
+                    f'<footer><a href="mailto:{email}">{email}</a> '
+                    f'<a href="https://www.facebook.com/biz{site}">Facebook</a> '
+                    f'<a href="https://www.instagram.com/biz{site}/">Instagram</a></footer>'
+                )
+            elif kind == 2:
+                body = f"<footer>Email: {email}</footer>"
+            elif kind == 3:
+                return (
+                    '<!DOCTYPE html><html><head><meta charset="utf-8"></head><body><div id="root"></div>'
+                    '<script>document.getElementById("root").innerHTML = '
+                    f'\'<p>Sito dinamico</p><a href="mailto:{email}">Scrivici</a>\';</script></body></html>'
+                ).encode("utf-8")
+            else:
+                body = "<footer>Nessun contatto</footer>"
+        elif path == "/servizi":
+            body = "<h1>Servizi</h1>"
+        else:
+            return None
+        return (
+            f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Biz {site}</title></head>'
+            f"<body>{logo}{nav}<main>{FILLER}</main>{body}</body></html>"
+        ).encode("utf-8")
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                host = self.headers.get("Host", "").split(":", 1)[0].lower()
+                status, content_type, body = server.render(host, self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.requests += 1
+                    server.bytes_sent += len(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+# ========== STAND-IN ==========
+class FakeWorksheet:
+    """Foglio finto: conta le righe ricevute da append_rows con una latenza simulata"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.rows = 0
+        self.calls = 0
+
+    def append_rows(self, rows, value_input_option=None):
+        time.sleep(self.latency)
+        self.rows += len(rows)
+        self.calls += 1
+
+
+class _NullBar:
+    def update(self, n=1):
+        pass
+
+
+def _patch_dns():
+    """Risolve *.bench.local su 127.0.0.1 anche per il fast path HTTP (requests)"""
+    real_getaddrinfo = socket.getaddrinfo
+
+    def bench_getaddrinfo(host, *args, **kwargs):
+        if isinstance(host, str) and host.endswith(BENCH_DOMAIN):
+            host = "127.0.0.1"
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    socket.getaddrinfo = bench_getaddrinfo
+    os.environ["NO_PROXY"] = ",".join(filter(None, [os.environ.get("NO_PROXY"), f".{BENCH_DOMAIN}", "127.0.0.1"]))
+
+
+# ========== MEMORIA ==========
+class RssSampler:
+    """Campiona ogni secondo l'RSS di ogni browser"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for pid, rss in chromium_rss_by_browser().items():
+                self.samples.setdefault(pid, []).append(rss)
+
+
+# ========== REPORT ==========
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_benchmark(args):
+    workdir = tempfile.mkdtemp(prefix="bench_maps_")
+    os.chdir(workdir)
+    os.environ.setdefault("SHEETS_FLUSH_INTERVAL", "1")
+    _patch_dns()
+
+    import scraper_maps as sm
+    from rate_limiter import HostRateLimiter
+
+    sm.CONTACT_CACHE_FILE = os.path.join(workdir, "contact_cache.sqlite")
+    # Ogni worker avvia il proprio Playwright: *.bench.local → 127.0.0.1 passa dalle opzioni di lancio
+    sm.LAUNCH_OPTIONS = dict(sm.LAUNCH_OPTIONS, args=[f"--host-resolver-rules={HOST_RULES}"])
+    sm.rate_limiter = HostRateLimiter(args.maps_rate, args.maps_rate, args.maps_rate, args.site_rate)
+    sm.current_project = "bench"
+    sm.output_worksheet = FakeWorksheet(args.sheets_latency)
+    sm.init_retry_scheduler("bench")
+    sm.start_sheets_writer("bench")
+
+    done_at = {}
+    real_write = sm.write_to_sheet
+
+    def timed_write(data_row, url=None):
+        done_at[url] = time.monotonic()
+        real_write(data_row, url)
+
+    sm.write_to_sheet = timed_write
+
+    server = BenchServer(args.sites or max(1, args.urls // 2)).start()
+    queue = Queue()
+    for i in range(args.urls):
+        queue.put(server.place_url(i))
+
+    sampler = RssSampler().start()
+    started = time.monotonic()
+    sm.run_supervised_workers(queue, _NullBar(), args.workers)
+    elapsed = time.monotonic() - started
+
+    sm.stop_sheets_writer()
+    sm.close_processed_store()
+    sm.close_contact_cache()
+    sampler.stop()
+    server.stop()
+
+    latencies = []
+    for url, finished in done_at.items():
+        index = int(url.rsplit("/", 1)[-1])
+        if index in server.first_hit:
+            latencies.append(finished - server.first_hit[index])
+
+    browsers = [
+        {"pid": pid, "avg_mb": sum(s) / len(s) / 2 ** 20, "peak_mb": max(s) / 2 ** 20}
+        for pid, s in sampler.samples.items() if s
+    ]
+    processed = len(done_at)
+    return {
+        "urls": args.urls,
+        "workers": args.workers,
+        "processed": processed,
+        "errors": sm.stats["errors"],
+        "rows_written": sm.output_worksheet.rows,
+        "elapsed_s": elapsed,
+        "places_per_min": processed / elapsed * 60 if elapsed else 0.0,
+        "latency_p50_s": percentile(latencies, 50),
+        "latency_p95_s": percentile(latencies, 95),
+        "latency_p99_s": percentile(latencies, 99),
+        "browsers": browsers,
+        "bytes_transferred": server.bytes_sent,
+        "bytes_per_place": server.bytes_sent / processed if processed else 0.0,
+        "http_requests": server.requests,
+        "blocked": [sm.MAPS_ROUTE_POLICY.summary(), sm.SITE_ROUTE_POLICY.summary()],
+        "workdir": workdir,
+    }
+
+
+def print_report(result):
+    print("=" * 60)
+    print("📈 BENCHMARK THROUGHPUT (offline)")
+    print("=" * 60)
+    print(f"🔗 URL: {result['urls']}  👷 Worker: {result['workers']}  ⏱️  {result['elapsed_s']:.1f}s")
+    print(f"✅ Processati: {result['processed']}  ❌ Errori: {result['errors']}  📄 Righe: {result['rows_written']}")
+    print(f"🚀 Luoghi/minuto: {result['places_per_min']:.1f}")
+    print(f"⌛ Latenza per luogo: p50 {result['latency_p50_s']:.2f}s  "
+          f"p95 {result['latency_p95_s']:.2f}s  p99 {result['latency_p99_s']:.2f}s")
+    for b in result["browsers"]:
+        print(f"🧠 Browser {b['pid']}: RSS medio {b['avg_mb']:.0f} MB, picco {b['peak_mb']:.0f} MB")
+    print(f"📦 Byte trasferiti: {result['bytes_transferred'] / 2 ** 20:.1f} MB "
+          f"({result['bytes_per_place'] / 1024:.1f} KB/luogo, {result['http_requests']} richieste)")
+    for line in result["blocked"]:
+        print(f"🛡️  {line}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline di worker() su Maps e siti simulati")
+    parser.add_argument("--urls", type=int, default=2000, help="numero di luoghi da elaborare")
+    parser.add_argument("--workers", type=int, default=4, help="thread worker (un browser ciascuno)")
+    parser.add_argument("--sites", type=int, default=0, help="siti distinti (default: urls / 2)")
+    parser.add_argument("--maps-rate", type=float, default=1000.0, help="req/s verso il finto Maps")
+    parser.add_argument("--site-rate", type=float, default=1000.0, help="req/s per dominio sito")
+    parser.add_argument("--sheets-latency", type=float, default=0.3, help="secondi per append_rows")
+    parser.add_argument("--json", help="salva il risultato anche in questo file JSON")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    result = run_benchmark(args)
+    print_report(result)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
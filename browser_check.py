@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Controllo veloce del Chromium di Playwright all'avvio, senza sottoprocesso
+- le revisioni attese sono in playwright/driver/package/browsers.json (letto senza importare Playwright)
+- un browser è installato se la sua cartella (es. chromium-1187) ha il marker INSTALLATION_COMPLETE
+- il controllo riuscito lascia un timbro (versione di Playwright + revisioni) nella cartella dei
+  browser: finché il timbro corrisponde basta che le cartelle esistano
+Solo se manca qualcosa si lancia `playwright install chromium` come in passato.
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+import importlib.util
+from pathlib import Path
+from importlib import metadata
+
+STAMP_FILE = ".scraper_browser_stamp.json"
+MARKER_FILE = "INSTALLATION_COMPLETE"
+# Con headless=True Playwright (>= 1.49) usa chromium-headless-shell; `install chromium` li scarica entrambi
+CHROMIUM_BROWSERS = ("chromium", "chromium-headless-shell")
+INSTALL_TIMEOUT = 300  # secondi
+
+
+def _playwright_package_dir():
+    spec = importlib.util.find_spec("playwright")
+    if spec is None or not spec.origin:
+        return None
+    return Path(spec.origin).parent
+
+
+def browsers_path():
+    """Cartella dei browser di Playwright (PLAYWRIGHT_BROWSERS_PATH o la cache di sistema)"""
+    configured = os.environ.get("PLAYWRIGHT_BROWSERS_PATH", "").strip()
+    if configured == "0":
+        package = _playwright_package_dir()
+        return package / "driver" / "package" / ".local-browsers" if package else None
+    if configured:
+        return Path(configured).expanduser()
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "ms-playwright"
+    if sys.platform.startswith("win"):
+        return Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")) / "ms-playwright"
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ms-playwright"
+
+
+def expected_stamp():
+    """{"playwright": versione, "browsers": {nome: revisione}} richiesti da questa versione (None se ignoti)"""
+    package = _playwright_package_dir()
+    if package is None:
+        return None
+    try:
+        with open(package / "driver" / "package" / "browsers.json", "r", encoding="utf-8") as f:
+            descriptors = json.load(f).get("browsers") or []
+        version = metadata.version("playwright")
+    except (OSError, ValueError, metadata.PackageNotFoundError):
+        return None
+    browsers = {d["name"]: str(d["revision"]) for d in descriptors if d.get("name") in CHROMIUM_BROWSERS}
+    if "chromium" not in browsers:
+        return None
+    return {"playwright": version, "browsers": browsers}
+
+
+def _browser_dirs(root, stamp):
+    return [root / f"{name.replace('-', '_')}-{revision}" for name, revision in stamp["browsers"].items()]
+
+
+def _read_stamp(root):
+    try:
+        with open(root / STAMP_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_stamp(root, stamp):
+    try:
+        tmp = root / f"{STAMP_FILE}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(stamp, f)
+        os.replace(tmp, root / STAMP_FILE)
+    except OSError:
+        pass  # cartella in sola lettura: al prossimo avvio si ricontrollano i marker
+
+
+def chromium_ready(write_stamp=True):
+    """True se il Chromium richiesto dalla versione installata di Playwright è già presente"""
+    stamp = expected_stamp()
+    root = browsers_path()
+    if stamp is None or root is None:
+        return False
+    dirs = _browser_dirs(root, stamp)
+    if _read_stamp(root) == stamp:
+        return all(d.is_dir() for d in dirs)
+    if not all((d / MARKER_FILE).exists() for d in dirs):
+        return False
+    if write_stamp:
+        _write_stamp(root, stamp)
+    return True
+
+
+def ensure_chromium(timeout=INSTALL_TIMEOUT):
+    """Verifica Chromium dal timbro; lo installa con `playwright install chromium` solo se manca"""
+    start = time.monotonic()
+    if chromium_ready():
+        print(f"✅ Browser Playwright già installato (controllo in {time.monotonic() - start:.2f}s)")
+        return True
+
+    print("🔧 Installazione browser Playwright...")
+    try:
+        result = subprocess.run([
+            sys.executable, "-m", "playwright", "install", "chromium"
+        ], capture_output=True, text=True, timeout=timeout)
+
+        if result.returncode == 0:
+            print("✅ Browser Playwright installati con successo")
+        else:
+            print(f"⚠️  Avviso durante installazione browser: {result.stderr}")
+    except subprocess.TimeoutExpired:
+        print("⚠️  Timeout durante installazione browser (continua comunque)")
+    except Exception as e:
+        print(f"⚠️  Errore durante installazione browser: {e}")
+    return chromium_ready()
+
+
+if __name__ == "__main__":
+    # Es. nel Dockerfile dopo `playwright install chromium`: lascia il timbro nell'immagine
+    sys.exit(0 if ensure_chromium() else 1)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Browser gestiti per i worker thread
+- BrowserSlot: pagina Maps calda riutilizzata, riciclo di contesto e browser dopo N pagine
+  o oltre una soglia di RSS, rilancio automatico se il browser cade
+- PrelaunchedSlots: thread dei worker avviati prima del lavoro (es. durante l'autenticazione
+  a Sheets e la lettura dell'INPUT), ognuno con il proprio Playwright e browser già pronti
+- WorkerSupervisor: riavvia i worker caduti finché c'è lavoro e sblocca quelli appesi
+"""
+
+import os
+import time
+import signal
+import logging
+import threading
+from queue import Queue
+
+from metrics import chromium_rss_by_browser
+
+# I lanci sono serializzati per riconoscere il PID del browser appena avviato
+_launch_lock = threading.Lock()
+
+
+def launched_browser_pid(before):
+    """PID del browser comparso rispetto all'insieme before (None se ambiguo)"""
+    started = set(chromium_rss_by_browser()) - set(before)
+    return started.pop() if len(started) == 1 else None
+
+
+def browser_rss_mb(pid) -> float:
+    if pid is None:
+        return 0.0
+    return chromium_rss_by_browser().get(pid, 0) / (1024 * 1024)
+
+
+class BrowserSlot:
+    """Browser + contesto di un worker
+
+    - acquire_page() ritorna la pagina calda (la crea, e rilancia il browser, se serve)
+    - release_page(healthy) la tiene per l'URL successivo, o la chiude dopo un errore
+    - dopo max_pages pagine o oltre max_rss_mb il browser viene chiuso e rilanciato
+    Gli oggetti Playwright sync sono legati al thread che li ha creati: playwright deve
+    essere avviato nel thread che usa lo slot (uno per worker).
+    """
+
+    def __init__(self, playwright, context_options=None, setup_context=None, max_pages=200,
+                 max_rss_mb=0, rss_check_every=10, launch_retries=3, launch_options=None):
+        self.playwright = playwright
+        self.launch_options = launch_options or {"headless": True}
+        self.context_options = context_options or {}
+        self.setup_context = setup_context
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.rss_check_every = rss_check_every
+        self.launch_retries = launch_retries
+        self.browser = None
+        self.context = None
+        self.pid = None
+        self.pages_served = 0
+        self.recycles = 0
+        self._page = None
+
+    def _launch(self):
+        last_error = None
+        for attempt in range(self.launch_retries):
+            try:
+                with _launch_lock:
+                    before = set(chromium_rss_by_browser())
+                    self.browser = self.playwright.chromium.launch(**self.launch_options)
+                    self.pid = launched_browser_pid(before)
+                self.context = self.browser.new_context(**self.context_options)
+                if self.setup_context:
+                    self.setup_context(self.context)
+                self.pages_served = 0
+                return
+            except Exception as e:
+                last_error = e
+                logging.warning(f"Avvio browser fallito (tentativo {attempt + 1}/{self.launch_retries}): {e}")
+                self._close_browser()
+                time.sleep(2 ** attempt)
+        raise RuntimeError(f"impossibile avviare il browser: {last_error}")
+
+    def _alive(self):
+        try:
+            return self.browser is not None and self.browser.is_connected()
+        except Exception:
+            return False
+
+    def acquire_page(self):
+        if not self._alive():
+            self._close_browser()
+            self._launch()
+        if self._page is None or self._page.is_closed():
+            self._page = self.context.new_page()
+        return self._page
+
+    def release_page(self, healthy=True):
+        self.pages_served += 1
+        if not healthy:
+            self._close_page()
+        if self._should_recycle():
+            self.recycle()
+
+    def rss_mb(self) -> float:
+        return browser_rss_mb(self.pid)
+
+    def _should_recycle(self):
+        if self.max_pages and self.pages_served >= self.max_pages:
+            return True
+        if self.max_rss_mb and self.pages_served % self.rss_check_every == 0:
+            return self.rss_mb() > self.max_rss_mb
+        return False
+
+    def recycle(self):
+        """Chiude contesto e browser: il prossimo acquire_page() parte da un browser nuovo"""
+        self._close_browser()
+        self.recycles += 1
+
+    def kill(self):
+        """Termina il processo del browser (anche da un altro thread) per sbloccare chiamate appese"""
+        if self.pid is None:
+            return False
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+            return True
+        except OSError:
+            return False
+
+    def _close_page(self):
+        if self._page is not None:
+            try:
+                self._page.close()
+            except Exception:
+                pass
+            self._page = None
+
+    def _close_browser(self):
+        self._close_page()
+        for closable in (self.context, self.browser):
+            if closable is not None:
+                try:
+                    closable.close()
+                except Exception:
+                    pass
+        self.context = None
+        self.browser = None
+        self.pid = None
+
+    def close(self):
+        self._close_browser()
+
+
+class PrelaunchedSlots:
+    """n thread worker avviati in anticipo, ognuno con il proprio Playwright e BrowserSlot pronto
+
+    Gli oggetti Playwright sync sono legati al thread che li crea, quindi il browser viene
+    avviato nello stesso thread che poi lo usa: spawn(run, handle) è lo spawn di
+    WorkerSupervisor e consegna run(handle) a un thread pre-avviato (handle.playwright e
+    handle.slot già pronti; slot None se il lancio è fallito), poi crea thread nuovi.
+    on_ready() quando tutti i lanci sono conclusi, se almeno uno è riuscito.
+    """
+
+    def __init__(self, start_playwright, factory, n, on_ready=None):
+        self.start_playwright = start_playwright
+        self.factory = factory
+        self.on_ready = on_ready
+        self.launched = 0
+        self._pending = n
+        self._lock = threading.Lock()
+        self._idle = []
+        for i in range(n):
+            jobs = Queue(maxsize=1)
+            thread = threading.Thread(target=self._run, args=(jobs,), name=f"browser-prelaunch-{i + 1}", daemon=True)
+            self._idle.append((thread, jobs))
+
+    def start(self):
+        for thread, _ in self._idle:
+            thread.start()
+        return self
+
+    def _launch(self):
+        playwright = slot = None
+        try:
+            playwright = self.start_playwright()
+            slot = self.factory(playwright)
+            slot.acquire_page()
+            with self._lock:
+                self.launched += 1
+        except Exception as e:
+            logging.warning(f"Pre-avvio browser fallito: {e}")
+            if slot is not None:
+                slot.close()
+                slot = None
+        finally:
+            with self._lock:
+                self._pending -= 1
+                done = self._pending == 0 and self.launched > 0
+            if done and self.on_ready:
+                self.on_ready()
+        return playwright, slot
+
+    def _run(self, jobs):
+        playwright, slot = self._launch()
+        job = jobs.get()
+        try:
+            if job is not None:
+                run, handle = job
+                handle.playwright, handle.slot = playwright, slot
+                run(handle)
+        finally:
+            if slot is not None:
+                slot.close()
+            if playwright is not None:
+                try:
+                    playwright.stop()
+                except Exception:
+                    pass
+
+    def spawn(self, run, handle):
+        with self._lock:
+            idle = self._idle.pop(0) if self._idle else None
+        if idle is None:
+            return _spawn_thread(run, handle)
+        thread, jobs = idle
+        jobs.put((run, handle))
+        return thread
+
+    def close(self, timeout=30):
+        """Chiude browser e Playwright dei thread mai consegnati a un worker"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for _, jobs in idle:
+            jobs.put(None)
+        deadline = time.monotonic() + timeout
+        for thread, _ in idle:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+
+def _spawn_thread(run, handle):
+    thread = threading.Thread(target=run, args=(handle,), name=handle.name, daemon=True)
+    thread.start()
+    return thread
+
+
+class WorkerHandle:
+    """Stato di un worker visto dal supervisore"""
+
+    def __init__(self, name):
+        self.name = name
+        self.playwright = None  # impostato solo per i thread pre-avviati
+        self.slot = None
+        self.current_url = None
+        self.busy_since = None
+        self.hang_timeout = None
+        self.killed = False
+        self.committing = False
+        self.retired = threading.Event()
+        self._lock = threading.Lock()
+
+    def begin(self, url, hang_timeout=None):
+        """Inizio di un URL; hang_timeout sostituisce quello del supervisore per questo URL"""
+        self.current_url = url
+        self.hang_timeout = hang_timeout
+        self.busy_since = time.monotonic()
+        self.killed = False
+        self.committing = False
+
+    def commit(self) -> bool:
+        """Il worker sta per scrivere il risultato: False se è già stato ritirato
+        (il supervisore ha riassegnato l'URL, scriverlo darebbe una riga doppia)"""
+        with self._lock:
+            if self.retired.is_set():
+                return False
+            self.committing = True
+            return True
+
+    def retire(self) -> bool:
+        """Ritira il worker; False se sta già scrivendo il risultato (non va sostituito)"""
+        with self._lock:
+            if self.committing:
+                return False
+            self.retired.set()
+            return True
+
+    def end(self):
+        self.current_url = None
+        self.busy_since = None
+        self.hang_timeout = None
+
+
+class WorkerSupervisor:
+    """Tiene in vita n worker thread: target(handle) è il corpo del worker
+
+    - un worker terminato mentre has_work() è ancora True viene riavviato
+    - un worker fermo sullo stesso URL oltre hang_timeout: prima si uccide il suo browser
+      (la chiamata appesa fallisce e il worker prosegue), poi se resta appeso viene
+      ritirato e sostituito; on_abandoned(url) riceve l'URL perso
+    - quando give_up() è True (es. grazia dell'arresto scaduta) run() ritorna senza attendere
+      i worker ancora al lavoro: busy_urls() dice su quali URL erano fermi
+    - oltre max_restarts i worker caduti non vengono più riavviati: restart_limit_hit
+      dice che il lavoro è rimasto a metà
+    - spawn(run, handle) avvia il thread del worker (es. PrelaunchedSlots.spawn); di default
+      un thread nuovo
+    """
+
+    def __init__(self, target, n, has_work, hang_timeout=180, on_abandoned=None, check_interval=1.0,
+                 max_restarts=50, give_up=None, spawn=None):
+        self.target = target
+        self.n = n
+        self.has_work = has_work
+        self.hang_timeout = hang_timeout
+        self.on_abandoned = on_abandoned
+        self.check_interval = check_interval
+        self.max_restarts = max_restarts
+        self.give_up = give_up
+        self.spawn = spawn or _spawn_thread
+        self.restarts = 0
+        self.replaced = 0
+        self.restart_limit_hit = False
+        self._started = 0
+        self._workers = []
+
+    def _start(self):
+        self._started += 1
+        handle = WorkerHandle(f"worker-{self._started}")
+        thread = self.spawn(self._run, handle)
+        self._workers.append((thread, handle))
+
+    def _run(self, handle):
+        try:
+            self.target(handle)
+        except Exception as e:
+            logging.error(f"{handle.name} terminato per errore: {e}")
+
+    def run(self):
+        """Blocca finché tutti i worker hanno finito e non c'è più lavoro"""
+        for _ in range(self.n):
+            self._start()
+        while True:
+            for thread, handle in list(self._workers):
+                if thread.is_alive():
+                    if not handle.retired.is_set():
+                        self._check_hung(handle)
+                    continue
+                self._workers.remove((thread, handle))
+                if handle.retired.is_set() or not self.has_work():
+                    continue
+                if self.restarts >= self.max_restarts:
+                    logging.error(f"{handle.name} terminato: limite di {self.max_restarts} riavvii raggiunto")
+                    self.restart_limit_hit = True
+                    continue
+                logging.warning(f"{handle.name} terminato con lavoro ancora in coda → riavvio")
+                self.restarts += 1
+                self._start()
+            if not any(not handle.retired.is_set() for _, handle in self._workers):
+                return
+            if self.give_up is not None and self.give_up():
+                return
+            time.sleep(self.check_interval)
+
+    def busy_urls(self):
+        """URL in lavorazione nei worker ancora vivi (non ritirati)"""
+        return [
+            handle.current_url for thread, handle in self._workers
+            if thread.is_alive() and not handle.retired.is_set() and handle.current_url
+        ]
+
+    def _check_hung(self, handle):
+        since = handle.busy_since
+        if since is None or time.monotonic() - since < (handle.hang_timeout or self.hang_timeout):
+            return
+        url = handle.current_url
+        if not handle.killed:
+            handle.killed = True
+            logging.warning(f"{handle.name} bloccato da {time.monotonic() - since:.0f}s su {url} → chiudo il browser")
+            if handle.slot is not None and handle.slot.kill():
+                handle.busy_since = time.monotonic()
+                return
+        if not handle.retire():
+            return  # sta scrivendo il risultato: si è sbloccato da solo
+        logging.error(f"{handle.name} ancora bloccato su {url} → sostituito")
+        self.replaced += 1
+        if url and self.on_abandoned:
+            self.on_abandoned(url)
+        self._start()
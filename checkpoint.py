@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Arresto coordinato e checkpoint di sessione
+- Drain: al limite di tempo o su SIGTERM (redeploy Render) / Ctrl-C si smette di prendere
+  URL, le pagine in corso hanno `grace` secondi per finire, poi il main scrive i sink
+  e salva il checkpoint. Un secondo segnale interrompe subito (KeyboardInterrupt)
+- checkpoint: JSON con coda non ancora elaborata, retry programmati, contatori e ritmo Maps;
+  la sessione successiva lo carica all'avvio e lo cancella
+"""
+
+import os
+import json
+import time
+import signal
+import logging
+import threading
+from datetime import datetime
+
+CHECKPOINT_VERSION = 1
+
+REASON_TIME_LIMIT = "time_limit"
+REASON_SIGNAL = "signal"
+REASON_WORKERS = "workers"  # browser non avviabili: worker fermi con lavoro ancora in coda
+
+
+class Drain:
+    """Stato dell'arresto: chi lo chiede imposta stop_event e la scadenza della grazia"""
+
+    def __init__(self, stop_event, grace=20.0):
+        self.stop_event = stop_event
+        self.grace = grace
+        self.reason = None
+        self.deadline = None
+        self._lock = threading.Lock()
+
+    def request(self, reason) -> bool:
+        """Avvia l'arresto (solo la prima richiesta conta); True se è partito ora"""
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            self.deadline = time.monotonic() + self.grace
+        self.stop_event.set()
+        return True
+
+    @property
+    def requested(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self):
+        """Secondi di grazia rimasti (None se l'arresto non è stato chiesto)"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def install_signal_handlers(self, on_request=None):
+        """SIGTERM e SIGINT avviano il drain; al secondo segnale KeyboardInterrupt
+
+        Va chiamato dal thread principale. on_request(signum) viene chiamato alla prima richiesta.
+        """
+        def handler(signum, frame):
+            if self.request(REASON_SIGNAL):
+                if on_request:
+                    on_request(signum)
+                return
+            raise KeyboardInterrupt
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            try:
+                signal.signal(signum, handler)
+            except (ValueError, OSError) as e:
+                logging.warning(f"Handler del segnale {signum} non installato: {e}")
+
+
+def save_checkpoint(path, state):
+    """Scrive il checkpoint in modo atomico (file temporaneo + rename)"""
+    state = dict(state, version=CHECKPOINT_VERSION, saved_at=datetime.now().isoformat(timespec="seconds"))
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    """Checkpoint salvato (dict) oppure None se assente, illeggibile o di un'altra versione"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logging.error(f"Checkpoint {path} illeggibile: {e}")
+        return None
+    if not isinstance(state, dict) or state.get("version") != CHECKPOINT_VERSION:
+        logging.warning(f"Checkpoint {path} ignorato: versione non supportata")
+        return None
+    return state
+
+
+def discard_checkpoint(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache persistente dei contatti estratti dai siti web
+SQLite in modalità WAL, chiave = dominio normalizzato, condivisa tra sessioni e progetti
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+DAY = 24 * 60 * 60
+
+
+def normalize_domain(url_or_host: str) -> str:
+    """Dominio in minuscolo senza schema, porta e prefisso www."""
+    value = (url_or_host or "").strip().lower()
+    if "://" not in value:
+        value = "//" + value
+    host = urlparse(value).hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    return host.rstrip(".")
+
+
+class ContactCache:
+    """Cache a due livelli (memoria + SQLite) per i risultati di estrai_contatti_da_sito
+
+    - ogni voce ha la sua scadenza (ttl): i siti senza contatti scadono prima (negative_ttl)
+    - il file su disco è limitato a max_entries voci, eliminando le meno usate di recente
+    - le hot_size voci più recenti restano in memoria e non toccano il database
+    """
+
+    def __init__(self, path, ttl=30 * DAY, negative_ttl=2 * DAY, max_entries=100000, hot_size=2000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hot_size = hot_size
+        self.hits = 0
+        self.misses = 0
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_trim = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS contacts ("
+            " domain TEXT PRIMARY KEY,"
+            " email TEXT NOT NULL,"
+            " social TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS contacts_last_access ON contacts(last_access)")
+        self._conn.commit()
+
+    def get(self, domain):
+        """Ritorna (email, social) se presente e non scaduto, altrimenti None"""
+        now = time.time()
+        with self._lock:
+            entry = self._hot.get(domain)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._hot.move_to_end(domain)
+                    self.hits += 1
+                    return value
+                del self._hot[domain]
+
+            try:
+                row = self._conn.execute(
+                    "SELECT email, social, expires_at FROM contacts WHERE domain = ?", (domain,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                email, social, expires_at = row
+                if expires_at <= now:
+                    self._conn.execute("DELETE FROM contacts WHERE domain = ?", (domain,))
+                    self._conn.commit()
+                    self.misses += 1
+                    return None
+                self._conn.execute("UPDATE contacts SET last_access = ? WHERE domain = ?", (now, domain))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"Errore lettura cache contatti per {domain}: {e}")
+                self.misses += 1
+                return None
+
+            value = (email, json.loads(social))
+            self._remember(domain, value, expires_at)
+            self.hits += 1
+            return value
+
+    def put(self, domain, email, social, ttl=None):
+        """Salva il risultato per un dominio con scadenza propria"""
+        if ttl is None:
+            found = email != "-" or any(v != "-" for v in social.values())
+            ttl = self.ttl if found else self.negative_ttl
+        now = time.time()
+        expires_at = now + ttl
+        value = (email, dict(social))
+        with self._lock:
+            self._remember(domain, value, expires_at)
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO contacts (domain, email, social, expires_at, last_access)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (domain, email, json.dumps(social, ensure_ascii=False), expires_at, now)
+                )
+                self._conn.commit()
+                self._puts_since_trim += 1
+                if self._puts_since_trim >= 500:
+                    self._trim()
+            except sqlite3.Error as e:
+                logging.warning(f"Errore scrittura cache contatti per {domain}: {e}")
+
+    def close(self):
+        with self._lock:
+            try:
+                self._trim()
+                self._conn.close()
+            except sqlite3.Error as e:
+                logging.warning(f"Errore chiusura cache contatti: {e}")
+
+    def _remember(self, domain, value, expires_at):
+        self._hot[domain] = (value, expires_at)
+        self._hot.move_to_end(domain)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def _trim(self):
+        """Elimina le voci scadute e quelle meno usate oltre max_entries"""
+        self._puts_since_trim = 0
+        self._conn.execute("DELETE FROM contacts WHERE expires_at <= ?", (time.time(),))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM contacts").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM contacts WHERE domain IN"
+                " (SELECT domain FROM contacts ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+        self._conn.commit()
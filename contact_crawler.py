@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ricerca dei contatti nelle pagine interne di un sito
+Classifica i link interni per testo (in più lingue) e percorso dell'URL, poi visita
+in parallelo le prime K pagine entro un budget di tempo per sito, fermandosi appena
+email e social sono completi
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse, urldefrag
+
+from contact_cache import normalize_domain
+
+POOL_SIZE = 32
+
+# Parole nel testo del link → punteggio
+LINK_TEXT_WEIGHTS = (
+    (("contatti", "contattaci", "contatto", "contact", "kontakt", "contacto", "contato", "contactez"), 10),
+    (("impressum", "note legali", "legal notice", "aviso legal", "mentions légales", "colophon"), 8),
+    (("chi siamo", "dove siamo", "about", "über uns", "ueber uns", "quiénes somos", "quienes somos",
+      "qui sommes", "azienda"), 5),
+    (("privacy", "datenschutz", "privacidad", "confidentialité"), 2),
+)
+# Frammenti del percorso dell'URL → punteggio (si somma a quello del testo)
+URL_PATH_WEIGHTS = (
+    (("contatt", "contact", "kontakt", "contacto", "contato"), 6),
+    (("impressum", "note-legali", "legal", "mentions-legales", "aviso-legal", "colophon"), 5),
+    (("chi-siamo", "chisiamo", "dove-siamo", "about", "ueber-uns", "uber-uns", "quienes-somos",
+      "qui-sommes", "azienda"), 3),
+    (("privacy", "datenschutz", "privacidad"), 1),
+)
+SKIP_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".svg", ".zip", ".doc", ".docx", ".xls", ".xlsx",
+    ".mp4", ".mp3",
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _weight(value, table):
+    for words, weight in table:
+        if any(w in value for w in words):
+            return weight
+    return 0
+
+
+def contact_link_score(href, text="") -> int:
+    """Probabilità (relativa) che la pagina contenga i contatti; 0 = da non visitare"""
+    path = urlparse(href).path.lower()
+    return _weight((text or "").lower()[:80], LINK_TEXT_WEIGHTS) + _weight(path, URL_PATH_WEIGHTS)
+
+
+def rank_contact_links(anchors, base_url, limit=3):
+    """Le limit pagine interne più promettenti tra gli anchors (href assoluto, testo)"""
+    site = normalize_domain(base_url)
+    base = urldefrag(base_url)[0].rstrip("/")
+    best = {}
+    for position, (href, text) in enumerate(anchors):
+        if not href or not href.lower().startswith(("http://", "https://")):
+            continue
+        url = urldefrag(href)[0]
+        if url.rstrip("/") == base or normalize_domain(url) != site:
+            continue
+        if urlparse(url).path.lower().endswith(SKIP_EXTENSIONS):
+            continue
+        score = contact_link_score(url, text)
+        if score <= 0:
+            continue
+        previous = best.get(url)
+        if previous is None or score > previous[0]:
+            best[url] = (score, previous[1] if previous else position)
+    ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[1][1]))
+    return [url for url, _ in ranked[:limit]]
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix="contact-crawl")
+        return _executor
+
+
+def crawl_pages(urls, fetch, on_page, is_complete, budget):
+    """Scarica gli urls in parallelo con fetch(url) (thread condivisi)
+
+    on_page(risultato) riceve ogni pagina non None nell'ordine di arrivo; si ferma quando
+    is_complete() è True o dopo budget secondi. Ritorna il numero di pagine ricevute.
+    """
+    if not urls:
+        return 0
+    futures = [_get_executor().submit(fetch, url) for url in urls]
+    received = 0
+    try:
+        for future in as_completed(futures, timeout=budget):
+            try:
+                page = future.result()
+            except Exception:
+                continue
+            if page is not None:
+                on_page(page)
+                received += 1
+            if is_complete():
+                break
+    except TimeoutError:
+        pass
+    finally:
+        for future in futures:
+            future.cancel()
+    return received
+
+
+def remaining(deadline) -> float:
+    """Secondi rimasti fino a deadline (time.monotonic), mai negativi"""
+    return max(0.0, deadline - time.monotonic())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fast path HTTP per l'estrazione dei contatti
+Scarica l'HTML statico con una sessione requests condivisa (keep-alive) e lo analizza
+senza aprire Chromium
+"""
+
+import re
+import threading
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urldefrag
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36'
+MAX_HTML_BYTES = 1_500_000
+MAX_TEXT_CHARS = 200_000
+POOL_SIZE = 32
+
+_SKIP_TEXT_TAGS = {"script", "style", "noscript", "template", "svg"}
+_SHELL_MARKERS = re.compile(
+    r"<div[^>]+id=[\"'](?:root|app|__next|__nuxt)[\"'][^>]*>\s*</div>"
+    r"|enable javascript|attiva javascript|abilita javascript",
+    re.IGNORECASE
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class HtmlPage:
+    """HTML statico di una pagina con i link già estratti"""
+
+    def __init__(self, url, html, anchors, text_length, scripts, text=""):
+        self.url = url
+        self.html = html
+        self.anchors = anchors  # lista di (href assoluto, testo del link)
+        self.text_length = text_length
+        self.scripts = scripts
+        self.text = text  # testo visibile (senza script e stili), troncato a MAX_TEXT_CHARS
+
+    @property
+    def is_shell(self) -> bool:
+        """True se la pagina sembra un guscio renderizzato via JavaScript"""
+        if self.scripts == 0:
+            return False
+        if self.text_length < 300 or len(self.anchors) < 3:
+            return True
+        return self.text_length < 1000 and bool(_SHELL_MARKERS.search(self.html))
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.anchors = []
+        self.text_length = 0
+        self.scripts = 0
+        self._skip_depth = 0
+        self._href = None
+        self._text = []
+        self._visible = []
+        self._visible_chars = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+            if tag == "script":
+                self.scripts += 1
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self._href = href.strip()
+                self._text = []
+        elif tag == "base":
+            href = dict(attrs).get("href")
+            if href:
+                self.base_url = urljoin(self.base_url, href)
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TEXT_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "a" and self._href is not None:
+            self._add_anchor()
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        self.text_length += len(data.strip())
+        if self._visible_chars < MAX_TEXT_CHARS:
+            self._visible.append(data)
+            self._visible_chars += len(data)
+        if self._href is not None:
+            self._text.append(data)
+
+    def close(self):
+        super().close()
+        if self._href is not None:
+            self._add_anchor()
+
+    @property
+    def text(self):
+        return " ".join(" ".join(self._visible).split())[:MAX_TEXT_CHARS]
+
+    def _add_anchor(self):
+        href = self._href
+        if not href.lower().startswith(("mailto:", "tel:", "javascript:")):
+            href = urldefrag(urljoin(self.base_url, href))[0]
+        self.anchors.append((href, " ".join("".join(self._text).split())))
+        self._href = None
+        self._text = []
+
+
+def get_http_session():
+    """Sessione requests condivisa con pool di connessioni keep-alive"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Import al primo uso: i processi worker non lo pagano all'avvio
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "it-IT,it;q=0.9,en;q=0.8",
+            })
+            _session = session
+        return _session
+
+
+def parse_page(url, html) -> HtmlPage:
+    """Analizza l'HTML ed estrae i link (href assoluti) e la quantità di testo visibile"""
+    parser = _LinkParser(url)
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        pass
+    return HtmlPage(url, html, parser.anchors, parser.text_length, parser.scripts, parser.text)
+
+
+def fetch_page(url, timeout=12):
+    """Scarica una pagina HTML; ritorna None per errori, risposte non HTML o status >= 400"""
+    try:
+        with get_http_session().get(url, timeout=timeout, stream=True, allow_redirects=True) as r:
+            if r.status_code >= 400:
+                return None
+            if "html" not in r.headers.get("Content-Type", "html").lower():
+                return None
+            chunks = []
+            size = 0
+            for chunk in r.iter_content(65536):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= MAX_HTML_BYTES:
+                    break
+            encoding = r.encoding if "charset" in r.headers.get("Content-Type", "").lower() else "utf-8"
+            html = b"".join(chunks).decode(encoding or "utf-8", errors="replace")
+            return parse_page(r.url, html)
+    except Exception:
+        return None
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Coda di lavoro distribuita con lease per più nodi sullo stesso progetto
+Stand-in su SQLite (file condiviso); le query sono SQL standard portabili su Postgres
+"""
+
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class LeaseQueue:
+    """URL condivisi tra nodi: ogni nodo prende blocchi in lease a tempo
+
+    - claim() prende fino a batch_size URL 'pending' (o con lease scaduto) in modo atomico
+    - heartbeat() rinnova i lease del nodo; se un nodo muore i suoi URL tornano disponibili
+      alla scadenza del lease
+    - complete() chiude gli URL, release() restituisce quelli non finiti
+    """
+
+    def __init__(self, path, project, node_id=None, lease_seconds=300, batch_size=10):
+        self.path = path
+        self.project = project
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS work ("
+            " project TEXT NOT NULL,"
+            " url TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " owner TEXT,"
+            " lease_expires REAL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (project, url))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS work_status ON work(project, status, lease_expires)")
+
+    def enqueue_many(self, urls) -> int:
+        """Aggiunge gli URL non ancora presenti; ritorna quanti sono nuovi"""
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO work (project, url, status, updated_at) VALUES (?, ?, ?, ?)",
+                    ((self.project, u, STATUS_PENDING, now) for u in urls)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return self._conn.total_changes - before
+
+    def claim(self, limit=None):
+        """Prende in lease un blocco di URL disponibili"""
+        limit = limit or self.batch_size
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT url FROM work WHERE project = ?"
+                    " AND (status = ? OR (status = ? AND lease_expires < ?))"
+                    " LIMIT ?",
+                    (self.project, STATUS_PENDING, STATUS_LEASED, now, limit)
+                ).fetchall()
+                urls = [r[0] for r in rows]
+                self._conn.executemany(
+                    "UPDATE work SET status = ?, owner = ?, lease_expires = ?, updated_at = ?"
+                    " WHERE project = ? AND url = ?",
+                    ((STATUS_LEASED, self.node_id, now + self.lease_seconds, now, self.project, u) for u in urls)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return urls
+
+    def heartbeat(self):
+        """Rinnova tutti i lease di questo nodo"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE work SET lease_expires = ?, updated_at = ?"
+                " WHERE project = ? AND owner = ? AND status = ?",
+                (now + self.lease_seconds, now, self.project, self.node_id, STATUS_LEASED)
+            )
+
+    def complete(self, urls, status=STATUS_DONE):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE work SET status = ?, lease_expires = NULL, updated_at = ? WHERE project = ? AND url = ?",
+                ((status, now, self.project, u) for u in urls)
+            )
+
+    def release(self):
+        """Restituisce alla coda gli URL ancora in lease a questo nodo"""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE work SET status = ?, owner = NULL, lease_expires = NULL, updated_at = ?"
+                " WHERE project = ? AND owner = ? AND status = ?",
+                (STATUS_PENDING, now, self.project, self.node_id, STATUS_LEASED)
+            )
+            return cur.rowcount
+
+    def outstanding(self) -> int:
+        """URL ancora da completare su tutti i nodi (pending + in lease)"""
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM work WHERE project = ? AND status IN (?, ?)",
+                (self.project, STATUS_PENDING, STATUS_LEASED)
+            ).fetchone()
+            return count
+
+    def start_heartbeat(self):
+        """Thread che rinnova i lease ogni lease_seconds / 3"""
+        def run():
+            while not self._heartbeat_stop.wait(self.lease_seconds / 3):
+                try:
+                    self.heartbeat()
+                except sqlite3.Error as e:
+                    logging.warning(f"Heartbeat coda distribuita fallito: {e}")
+
+        self._heartbeat_thread = threading.Thread(target=run, name="lease-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+        return self
+
+    def close(self):
+        self._heartbeat_stop.set()
+        with self._lock:
+            self._conn.close()
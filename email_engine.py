@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Estrazione email dai siti: link mailto e testo visibile (mai l'intero HTML)
+Normalizza le offuscazioni comuni, scarta i falsi positivi tipo logo@2x.png
+e ordina i candidati preferendo quelli sul dominio del sito
+"""
+
+import re
+from urllib.parse import unquote
+
+EMAIL_REGEX = re.compile(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", re.IGNORECASE)
+
+# info [at] dominio [dot] it, info(chiocciola)dominio(punto)it, info{at}dominio{dot}it
+_BRACKETED_AT = re.compile(r"\s*[\[\(\{<]\s*(?:at|chiocciola|@)\s*[\]\)\}>]\s*", re.IGNORECASE)
+_BRACKETED_DOT = re.compile(r"\s*[\[\(\{<]\s*(?:dot|punto|\.)\s*[\]\)\}>]\s*", re.IGNORECASE)
+# info at dominio dot it (senza parentesi: solo se c'è anche almeno un "dot", con la parte
+# locale minuscola e da casella di posta e un TLD noto, per non prendere frasi tipo
+# "Siamo at Milano punto vendita" o "write to me at home dot com")
+_SPELLED_OUT = re.compile(
+    r"\b((?-i:[a-z0-9._%+-]+))\s+(?:at|chiocciola)\s+([A-Z0-9-]+(?:\s+(?:dot|punto)\s+[A-Z0-9-]+)+)\b",
+    re.IGNORECASE
+)
+_SPELLED_DOT = re.compile(r"\s+(?:dot|punto)\s+", re.IGNORECASE)
+SPELLED_OUT_TLDS = {
+    "it", "com", "net", "org", "eu", "info", "biz", "de", "fr", "es", "ch", "at", "uk", "co",
+    "io", "me", "us", "sm", "va", "be", "nl", "pt", "ro", "pl",
+}
+
+ASSET_EXTENSIONS = {
+    "png", "jpg", "jpeg", "gif", "svg", "webp", "avif", "ico", "bmp", "tif", "tiff",
+    "css", "js", "json", "map", "woff", "woff2", "ttf", "eot", "mp4", "webm", "mp3", "pdf",
+}
+PLACEHOLDER_DOMAINS = {
+    "example.com", "example.org", "example.net", "domain.com", "dominio.it", "tuodominio.it",
+    "email.com", "yourdomain.com", "sentry.io", "wixpress.com", "sentry.wixpress.com",
+    "sentry-next.wixpress.com",
+}
+FREE_MAIL_DOMAINS = {
+    "gmail.com", "libero.it", "hotmail.com", "hotmail.it", "outlook.com", "outlook.it",
+    "yahoo.com", "yahoo.it", "virgilio.it", "alice.it", "tiscali.it", "icloud.com", "live.it",
+    "pec.it", "legalmail.it",
+}
+PREFERRED_LOCAL_PARTS = {
+    "info", "contatti", "contact", "contacts", "hello", "ciao", "commerciale", "sales",
+    "amministrazione", "segreteria", "ufficio", "booking", "prenotazioni", "office",
+}
+NO_REPLY_PREFIXES = ("noreply", "no-reply", "no_reply", "donotreply", "do-not-reply", "mailer-daemon")
+_HASH_LOCAL = re.compile(r"^[0-9a-f]{24,}$")
+_SEPARATED_LOCAL = re.compile(r"[a-z0-9]+(?:[._+-][a-z0-9]+)+")
+
+
+def deobfuscate(text: str) -> str:
+    """Riporta a forma standard le email scritte con [at], (punto), "at ... dot" ecc."""
+    text = _BRACKETED_AT.sub("@", text)
+    text = _BRACKETED_DOT.sub(".", text)
+    return _SPELLED_OUT.sub(_spelled_out_email, text)
+
+
+def _spelled_out_email(match):
+    local = match.group(1)
+    domain = _SPELLED_DOT.sub(".", match.group(2))
+    if domain.rsplit(".", 1)[-1].lower() not in SPELLED_OUT_TLDS or not _mailbox_like(local):
+        return match.group(0)
+    return f"{local}@{domain}"
+
+
+def _mailbox_like(local):
+    """Parte locale da casella (info, mario.rossi, ufficio_vendite), non una parola qualsiasi"""
+    return local in PREFERRED_LOCAL_PARTS or bool(_SEPARATED_LOCAL.fullmatch(local))
+
+
+def normalize_email(value: str):
+    """Email pulita (dominio minuscolo) o None se non valida / falso positivo"""
+    value = unquote(value or "").strip().strip(".,;:'\"<>()[]")
+    if not EMAIL_REGEX.fullmatch(value):
+        return None
+    local, domain = value.rsplit("@", 1)
+    domain = domain.lower()
+    if is_asset_like(local, domain):
+        return None
+    return f"{local}@{domain}"
+
+
+def is_asset_like(local: str, domain: str) -> bool:
+    """True per nomi di file (logo@2x.png), segnaposto e chiavi di tracker
+    
+    L'estensione si guarda solo sul TLD: mario.map@studio.it è un indirizzo valido.
+    """
+    tld = domain.rsplit(".", 1)[-1]
+    if tld in ASSET_EXTENSIONS:
+        return True
+    if re.fullmatch(r"\d+x", domain.split(".", 1)[0]):
+        return True
+    if domain in PLACEHOLDER_DOMAINS or any(domain.endswith("." + d) for d in PLACEHOLDER_DOMAINS):
+        return True
+    return bool(_HASH_LOCAL.match(local.lower()))
+
+
+def _domain_matches(domain, site_domain):
+    return domain == site_domain or domain.endswith("." + site_domain) or site_domain.endswith("." + domain)
+
+
+class EmailRanker:
+    """Raccoglie i candidati di una o più pagine dello stesso sito e sceglie il migliore"""
+
+    def __init__(self, site_domain=None):
+        self.site_domain = (site_domain or "").lower()
+        self._candidates = {}  # email minuscola → (email, ordine, da mailto)
+
+    def _add(self, email, from_mailto):
+        key = email.lower()
+        previous = self._candidates.get(key)
+        if previous is None:
+            self._candidates[key] = (email, len(self._candidates), from_mailto)
+        elif from_mailto and not previous[2]:
+            self._candidates[key] = (previous[0], previous[1], True)
+
+    def add_mailtos(self, hrefs):
+        for href in hrefs:
+            if not href or not href.lower().startswith("mailto:"):
+                continue
+            for part in href.split(":", 1)[1].split("?")[0].split(","):
+                email = normalize_email(part)
+                if email:
+                    self._add(email, True)
+
+    def add_text(self, text):
+        if not text:
+            return
+        for match in EMAIL_REGEX.finditer(deobfuscate(text)):
+            email = normalize_email(match.group(0))
+            if email:
+                self._add(email, False)
+
+    def _score(self, email, from_mailto):
+        local, domain = email.lower().rsplit("@", 1)
+        score = 0
+        if self.site_domain and _domain_matches(domain, self.site_domain):
+            score += 4
+        elif domain in FREE_MAIL_DOMAINS:
+            score += 1
+        if from_mailto:
+            score += 2
+        if local in PREFERRED_LOCAL_PARTS:
+            score += 1
+        if local.startswith(NO_REPLY_PREFIXES):
+            score -= 5
+        return score
+
+    def ranked(self):
+        """Candidati dal migliore al peggiore"""
+        items = sorted(self._candidates.values(), key=lambda c: (-self._score(c[0], c[2]), c[1]))
+        return [email for email, _, _ in items]
+
+    def best(self):
+        ranked = self.ranked()
+        return ranked[0] if ranked else None
+
+    def has_site_email(self) -> bool:
+        """True se c'è già un candidato sul dominio del sito (inutile cercare altrove)"""
+        if not self.site_domain:
+            return False
+        for key in self._candidates:
+            local, domain = key.rsplit("@", 1)
+            if _domain_matches(domain, self.site_domain) and not local.startswith(NO_REPLY_PREFIXES):
+                return True
+        return False
+
+    def __bool__(self):
+        return bool(self._candidates)
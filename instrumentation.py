@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Contatori thread-safe e tempi per fase di ogni URL
+Il timer dell'URL corrente viaggia in una ContextVar: thread e task asyncio
+hanno ognuno il proprio, senza passarlo a ogni funzione di estrazione
+"""
+
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_timer = ContextVar("url_timer", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """L'URL ha superato la sua scadenza dura"""
+
+
+class AtomicCounters:
+    """Contatori con incremento atomico; lettura stile dict (stats["processed"])"""
+
+    def __init__(self, names):
+        self._values = dict.fromkeys(names, 0)
+        self._lock = threading.Lock()
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def __getitem__(self, name):
+        with self._lock:
+            return self._values[name]
+
+    def get(self, name, default=0):
+        with self._lock:
+            return self._values.get(name, default)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values):
+        """Somma i contatori di un altro processo"""
+        with self._lock:
+            for name, amount in values.items():
+                self._values[name] = self._values.get(name, 0) + amount
+
+
+class UrlTimer:
+    """Durata delle fasi di un URL (goto, cookies, pannello, sito, ...)
+
+    Dopo start() (o come context manager) è il timer corrente: timed_stage() e
+    annotate() chiamati più in profondità scrivono qui.
+    observe(stage, seconds) riceve ogni misura (es. l'istogramma delle metriche).
+    Con deadline (secondi) ogni nuova fase oltre la scadenza solleva DeadlineExceeded.
+    failed_stage è la fase più interna da cui è uscita un'eccezione (None se nessuna).
+    """
+
+    def __init__(self, url, observe=None, deadline=None):
+        self.url = url
+        self.observe = observe
+        self.deadline = deadline
+        self.stages = {}
+        self.fields = {}
+        self.failed_stage = None
+        self._started = time.perf_counter()
+        self._token = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        if self.observe:
+            self.observe(stage, seconds)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def check_deadline(self):
+        if self.deadline is not None and self.elapsed() > self.deadline:
+            raise DeadlineExceeded(f"{self.url}: scadenza di {self.deadline:.0f}s superata")
+
+    def record(self, **fields):
+        """Record JSON-serializzabile con i tempi dell'URL"""
+        return {
+            "ts": round(time.time(), 3),
+            "url": self.url,
+            "total": round(self.elapsed(), 4),
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            **self.fields,
+            **fields,
+        }
+
+    def start(self):
+        """Rende questo il timer corrente del thread / task"""
+        self._token = _current_timer.set(self)
+        return self
+
+    def stop(self):
+        if self._token is not None:
+            _current_timer.reset(self._token)
+            self._token = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def current_timer():
+    return _current_timer.get()
+
+
+@contextmanager
+def timed_stage(stage):
+    """Misura una fase dell'URL corrente (nessun effetto fuori da un UrlTimer)
+    
+    Prima di iniziare la fase controlla la scadenza dell'URL.
+    """
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.check_deadline()
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        if timer is not None and timer.failed_stage is None:
+            timer.failed_stage = stage
+        raise
+    finally:
+        if timer is not None:
+            timer.add(stage, time.perf_counter() - start)
+
+
+def annotate(**fields):
+    """Aggiunge campi al record dell'URL corrente (es. dominio del sito)"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.fields.update(fields)
+
+
+class TimingLog:
+    """File JSONL con un record di tempi per URL
+
+    Ogni record è una sola write in append: più processi possono condividere il file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file.closed:
+                return
+            try:
+                self._file.write(line)
+                self._file.flush()
+            except OSError as e:
+                logging.warning(f"Errore scrittura log tempi: {e}")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -8,25 +8,12 @@ Entry point per l'esecuzione su Render
 
 import os
 import sys
-import subprocess
 import time
 
 def install_playwright_browsers():
-    """Installa i browser necessari per Playwright"""
-    print("🔧 Installazione browser Playwright...")
-    try:
-        result = subprocess.run([
-            "python3", "-m", "playwright", "install", "chromium"
-        ], capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0:
-            print("✅ Browser Playwright installati con successo")
-        else:
-            print(f"⚠️  Avviso durante installazione browser: {result.stderr}")
-    except subprocess.TimeoutExpired:
-        print("⚠️  Timeout durante installazione browser (continua comunque)")
-    except Exception as e:
-        print(f"⚠️  Errore durante installazione browser: {e}")
+    """Installa i browser necessari per Playwright (solo se il controllo senza sottoprocesso fallisce)"""
+    from browser_check import ensure_chromium
+    ensure_chromium()
 
 def check_environment():
     """Controlla le variabili d'ambiente necessarie"""
@@ -8,25 +8,12 @@ Versione ottimizzata per Render con variabili d'ambiente
 
 import os
 import sys
-import subprocess
 import time
 
 def install_playwright_browsers():
-    """Installa i browser necessari per Playwright"""
-    print("🔧 Installazione browser Playwright...")
-    try:
-        result = subprocess.run([
-            "python3", "-m", "playwright", "install", "chromium"
-        ], capture_output=True, text=True, timeout=300)
-        
-        if result.returncode == 0:
-            print("✅ Browser Playwright installati con successo")
-        else:
-            print(f"⚠️  Avviso durante installazione browser: {result.stderr}")
-    except subprocess.TimeoutExpired:
-        print("⚠️  Timeout durante installazione browser (continua comunque)")
-    except Exception as e:
-        print(f"⚠️  Errore durante installazione browser: {e}")
+    """Installa i browser necessari per Playwright (solo se il controllo senza sottoprocesso fallisce)"""
+    from browser_check import ensure_chromium
+    ensure_chromium()
 
 def check_environment():
     """Controlla le variabili d'ambiente necessarie"""
@@ -36,18 +23,21 @@ def check_environment():
     input_sheet = os.environ.get('INPUT_SHEET_URL')
     output_sheet = os.environ.get('OUTPUT_SHEET_URL')
     project_name = os.environ.get('PROJECT_NAME', 'default')
+    # Il foglio OUTPUT serve solo se Google Sheets è tra gli output (OUTPUT_SINKS)
+    sheets_output = "sheets" in [v.strip().lower() for v in os.environ.get('OUTPUT_SINKS', 'sheets').split(',')]
     
-    if not input_sheet or not output_sheet:
+    if not input_sheet or (sheets_output and not output_sheet):
         print("❌ ERRORE: Variabili d'ambiente mancanti!")
         print("   Configura in Render:")
         print("   - INPUT_SHEET_URL: URL del foglio INPUT")
-        print("   - OUTPUT_SHEET_URL: URL del foglio OUTPUT")
+        print("   - OUTPUT_SHEET_URL: URL del foglio OUTPUT (se OUTPUT_SINKS contiene 'sheets')")
         print("   - PROJECT_NAME: Nome del progetto (opzionale)")
         return False
     
     print("✅ Variabili d'ambiente configurate")
     print(f"   INPUT: {input_sheet[:50]}...")
-    print(f"   OUTPUT: {output_sheet[:50]}...")
+    if output_sheet:
+        print(f"   OUTPUT: {output_sheet[:50]}...")
     print(f"   PROGETTO: {project_name}")
     
     # Controlla variabili opzionali
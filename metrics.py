@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Metriche in formato Prometheus (testo) servite via HTTP per tutta la sessione
+Counter, gauge e istogrammi senza dipendenze esterne; i processi worker
+inviano al coordinatore lo stato cumulativo delle proprie metriche: counter e
+istogrammi vengono sommati, i gauge restano una serie per processo (label process)
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: label attese {self.labelnames}, ricevute {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def values(self):
+        """Copia dei valori per label (serializzabile)"""
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def _merge(a, b):
+        return a + b
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """Valore calcolato alla lettura: numero (senza label) o dict {tuple label: valore}; None lo toglie"""
+        self._function = function
+
+    def values(self):
+        if self._function is None:
+            return super().values()
+        try:
+            result = self._function()
+        except Exception:
+            return {}
+        return dict(result) if isinstance(result, dict) else {(): result}
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def values(self):
+        with self._lock:
+            return {k: (list(c), s, n) for k, (c, s, n) in self._values.items()}
+
+    @staticmethod
+    def _merge(a, b):
+        return [x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]
+
+
+class Registry:
+    """Insieme delle metriche di un processo più l'ultimo stato ricevuto dai processi worker
+
+    Con processi worker i gauge hanno la label process in più ("main" per questo processo,
+    altrimenti la sorgente di set_remote): sommarli non ha senso (RSS, ritmi, tempi di avvio).
+    """
+
+    LOCAL_SOURCE = "main"
+
+    def __init__(self):
+        self._metrics = []
+        self._remote = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def state(self):
+        """Stato cumulativo delle metriche locali (da inviare al coordinatore)"""
+        return {m.name: m.values() for m in self._metrics}
+
+    def set_remote(self, source, state):
+        """Sostituisce l'ultimo stato ricevuto da un processo worker"""
+        with self._lock:
+            self._remote[source] = state
+
+    def _series(self, metric, remote):
+        """(label, label extra, valore) da esporre: gauge per processo, il resto sommato"""
+        if metric.kind == "gauge" and remote:
+            sources = [(self.LOCAL_SOURCE, metric.values())]
+            sources += [(str(source), state.get(metric.name, {})) for source, state in remote]
+            return [
+                (key, [("process", source)], value)
+                for source, values in sources for key, value in sorted(values.items())
+            ]
+        values = metric.values()
+        for _, state in remote:
+            for key, value in state.get(metric.name, {}).items():
+                values[key] = metric._merge(values[key], value) if key in values else value
+        return [(key, [], value) for key, value in sorted(values.items())]
+
+    def render(self) -> str:
+        with self._lock:
+            remote = sorted(self._remote.items(), key=lambda item: str(item[0]))
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.documentation}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for key, extra, value in self._series(m, remote):
+                if m.kind == "histogram":
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, c in zip(m.buckets + (float("inf"),), counts):
+                        cumulative += c
+                        labels = _format_labels(m.labelnames, key, [("le", _format_value(bound))])
+                        lines.append(f"{m.name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(m.labelnames, key)
+                    lines.append(f"{m.name}_sum{labels} {_format_value(total)}")
+                    lines.append(f"{m.name}_count{labels} {count}")
+                else:
+                    lines.append(f"{m.name}{_format_labels(m.labelnames, key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(registry, port, host="0.0.0.0"):
+    """Serve /metrics (Prometheus) e / (health check) in un thread daemon"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = registry.render().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/":
+                body = b"ok\n"
+                content_type = "text/plain; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+# ========== MEMORIA BROWSER ==========
+def _read_proc(pid):
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        with open(f"/proc/{pid}/statm", "r") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = f.read().replace(b"\x00", b" ").decode("utf-8", "replace")
+        return ppid, rss, cmdline
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def chromium_rss_by_browser(ancestor=None):
+    """RSS in byte per processo browser Chromium (processo principale + figli)
+    lanciato da questo processo (o da ancestor); vuoto dove /proc non esiste"""
+    ancestor = ancestor or os.getpid()
+    procs = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return {}
+    for entry in entries:
+        if entry.isdigit():
+            info = _read_proc(int(entry))
+            if info:
+                procs[int(entry)] = info
+    children = {}
+    for pid, (ppid, _, _) in procs.items():
+        children.setdefault(ppid, []).append(pid)
+
+    def descends_from_ancestor(pid):
+        while pid in procs and pid != ancestor:
+            pid = procs[pid][0]
+        return pid == ancestor
+
+    result = {}
+    for pid, (_, _, cmdline) in procs.items():
+        if pid != ancestor and "chrom" in cmdline.lower() and "--type=" not in cmdline \
+                and descends_from_ancestor(pid):
+            total, stack = 0, [pid]
+            while stack:
+                current = stack.pop()
+                total += procs[current][1]
+                stack.extend(children.get(current, []))
+            result[pid] = total
+    return result
+
+
+# ========== AVVIO ==========
+_IMPORTED_AT = time.monotonic()
+
+
+def process_uptime() -> float:
+    """Secondi dall'avvio del processo (da /proc; altrove dall'import di questo modulo)"""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime", "r") as f:
+            return max(0.0, float(f.read().split()[0]) - started)
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _IMPORTED_AT
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Chiave canonica di un luogo Google Maps a partire dai suoi tanti URL
+- cid:<n>   da ?cid=, da ftid= o dal feature id !1s0x...:0x... nel segmento data
+- pid:<id>  place ID (ChIJ...) da query_place_id= / q=place_id:
+- kg:<mid>  id Knowledge Graph (!16s/g/...)
+- url:<...> URL normalizzato quando non c'è nessun id; per /place/ nome più coordinate
+  arrotondate a PLACE_COORD_DECIMALS (~100 m): due "Bar Sport" in città diverse restano distinti
+I link brevi (maps.app.goo.gl, goo.gl/maps) vengono risolti seguendo i redirect
+senza scaricare la pagina di Maps
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs, unquote, urljoin, urlencode
+
+SHORT_LINK_HOSTS = ("maps.app.goo.gl", "goo.gl", "g.co")
+MAX_REDIRECTS = 6
+RESOLVE_WORKERS = 8
+PLACE_COORD_DECIMALS = 3
+
+_FEATURE_ID = re.compile(r"!1s(0x[0-9a-f]+):(0x[0-9a-f]+)", re.IGNORECASE)
+_KG_ID = re.compile(r"!16s(%2Fg%2F|/g/)([0-9a-z_]+)", re.IGNORECASE)
+_PLACE_ID = re.compile(r"place_id:([A-Za-z0-9_-]{20,})")
+_VIEWPORT_ZOOM = re.compile(r"(/@-?\d+(?:\.\d+)?,-?\d+(?:\.\d+)?),[^/]*")
+# Dopo /place/<nome> ci sono solo vista della mappa (/@lat,lng,zoom) e stato (/data=...);
+# gli id del luogo nel data sono già stati cercati prima di arrivare all'URL normalizzato
+_PLACE_PATH = re.compile(r"(/place/[^/]+)/.*")
+_VIEWPORT = re.compile(r"/@(-?\d+(?:\.\d+)?),(-?\d+(?:\.\d+)?)")
+# Coordinate del luogo nel segmento data (!3d lat !4d lng): più precise della vista
+_DATA_COORDS = re.compile(r"!3d(-?\d+(?:\.\d+)?)!4d(-?\d+(?:\.\d+)?)")
+# Parametri che non cambiano il luogo (lingua, tracciamento, provenienza)
+_IGNORED_PARAMS = {"hl", "gl", "entry", "g_ep", "g_st", "authuser", "shorturl", "ucbcb", "coh", "skid", "utm_source",
+                   "utm_medium", "utm_campaign"}
+
+
+def is_short_link(url) -> bool:
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if host == "goo.gl":
+        return parsed.path.startswith("/maps")
+    return host in SHORT_LINK_HOSTS
+
+
+def _hex_to_cid(value):
+    try:
+        cid = int(value, 16)
+    except ValueError:
+        return None
+    return str(cid) if cid else None
+
+
+def place_key(url) -> str:
+    """Chiave canonica del luogo (senza richieste di rete)"""
+    parsed = urlparse(url.strip())
+    query = parse_qs(parsed.query)
+    decoded = unquote(url)
+
+    cid = (query.get("cid") or [""])[0]
+    if cid.isdigit():
+        return f"cid:{int(cid)}"
+    ftid = (query.get("ftid") or [""])[0]
+    if ":" in ftid:
+        cid = _hex_to_cid(ftid.split(":", 1)[1])
+        if cid:
+            return f"cid:{cid}"
+    feature = _FEATURE_ID.search(decoded)
+    if feature:
+        cid = _hex_to_cid(feature.group(2))
+        if cid:
+            return f"cid:{cid}"
+
+    place_id = (query.get("query_place_id") or [""])[0]
+    if not place_id:
+        match = _PLACE_ID.search(decoded)
+        place_id = match.group(1) if match else ""
+    if place_id:
+        return f"pid:{place_id}"
+
+    kg = _KG_ID.search(url)
+    if kg:
+        return f"kg:/g/{kg.group(2).lower()}"
+
+    return "url:" + _normalized_url(parsed)
+
+
+def _normalized_url(parsed):
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = unquote(parsed.path)
+    if "/place/" in path:
+        coords = _DATA_COORDS.search(path) or _VIEWPORT.search(path)
+        path = _PLACE_PATH.sub(r"\1", path).rstrip("/")
+        if coords:
+            lat, lng = (round(float(c), PLACE_COORD_DECIMALS) for c in coords.groups())
+            path += f"/@{lat:.{PLACE_COORD_DECIMALS}f},{lng:.{PLACE_COORD_DECIMALS}f}"
+    else:
+        path = _VIEWPORT_ZOOM.sub(r"\1", path).rstrip("/")
+    params = sorted((k, v) for k, values in parse_qs(parsed.query).items() if k.lower() not in _IGNORED_PARAMS
+                    for v in values)
+    return host + path + ("?" + urlencode(params) if params else "")
+
+
+def resolve_short_link(url, session, timeout=10):
+    """URL finale di un link breve seguendo i Location (None se non risolvibile)
+
+    Il redirect verso consent.google.com porta l'URL vero nel parametro continue.
+    """
+    current = url
+    for _ in range(MAX_REDIRECTS):
+        try:
+            response = session.head(current, allow_redirects=False, timeout=timeout)
+        except Exception:
+            return None
+        location = response.headers.get("Location")
+        if response.status_code not in (301, 302, 303, 307, 308) or not location:
+            return None if current == url else current
+        current = urljoin(current, location)
+        parsed = urlparse(current)
+        if (parsed.hostname or "").startswith("consent."):
+            target = parse_qs(parsed.query).get("continue")
+            return target[0] if target else None
+        if not is_short_link(current):
+            return current
+    return None
+
+
+def place_keys(urls, session=None, timeout=10):
+    """Dizionario url → chiave; i link brevi vengono risolti in parallelo (se c'è una sessione)"""
+    keys = {}
+    short = []
+    for url in urls:
+        if session is not None and is_short_link(url):
+            short.append(url)
+        else:
+            keys[url] = place_key(url)
+    if short:
+        with ThreadPoolExecutor(max_workers=min(RESOLVE_WORKERS, len(short))) as pool:
+            resolved = pool.map(lambda u: resolve_short_link(u, session, timeout), short)
+            for url, final in zip(short, resolved):
+                keys[url] = place_key(final or url)
+    return keys
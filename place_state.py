@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Dati del luogo dallo stato incorporato nella pagina Maps (window.APP_INITIALIZATION_STATE)
+Il payload del luogo è una stringa JSON con prefisso anti-XSSI )]}' dentro lo stato;
+il parser lavora su quella stringa ed è verificabile offline su pagine salvate:
+
+    python place_state.py bench/fixtures/place_state.html
+"""
+
+import re
+import sys
+import json
+
+from place_ids import place_key
+
+# Payload del luogo (stringa che inizia con )]}') senza attendere il DOM del pannello
+PLACE_STATE_JS = """
+() => {
+    const state = window.APP_INITIALIZATION_STATE;
+    if (!Array.isArray(state) || !Array.isArray(state[3])) return null;
+    for (const item of state[3]) {
+        if (typeof item === "string" && item.startsWith(")]}'")) return item;
+    }
+    return null;
+}
+"""
+
+_STATE_START = re.compile(r"APP_INITIALIZATION_STATE\s*=\s*")
+_FEATURE_ID = re.compile(r"^0x[0-9a-f]+:0x([0-9a-f]+)$", re.IGNORECASE)
+
+
+def _dig(data, *path):
+    """data[i][j]... oppure None se un indice manca o il tipo non è quello atteso"""
+    for index in path:
+        if not isinstance(data, list) or not -len(data) <= index < len(data):
+            return None
+        data = data[index]
+    return data
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) and value.strip() else "-"
+
+
+def _format_rating(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+        return f"{value:.1f}".replace(".", ",")
+    return "-"
+
+
+def state_cid(place):
+    """CID del luogo dal feature id 0x...:0x... (None se assente)"""
+    feature = _dig(place, 10)
+    match = _FEATURE_ID.match(feature) if isinstance(feature, str) else None
+    return str(int(match.group(1), 16)) if match else None
+
+
+def parse_place_payload(payload, url=None):
+    """Campi del luogo (stesso formato di PLACE_FIELDS_JS) dal payload )]}'...
+
+    Ritorna None se il payload manca, non è valido, non ha il nome o (con url) descrive
+    un luogo diverso da quello dell'URL.
+    """
+    if not isinstance(payload, str) or not payload.startswith(")]}'"):
+        return None
+    try:
+        data = json.loads(payload.split("\n", 1)[1] if "\n" in payload else payload[4:])
+    except (ValueError, IndexError):
+        return None
+    place = _dig(data, 6)
+    if not isinstance(place, list) or _text(_dig(place, 11)) == "-":
+        return None
+
+    if url:
+        expected = place_key(url)
+        cid = state_cid(place)
+        if expected.startswith("cid:") and cid and expected != f"cid:{cid}":
+            return None
+
+    categories = _dig(place, 13)
+    address = _dig(place, 39)
+    if not isinstance(address, str):
+        lines = _dig(place, 2)
+        address = ", ".join(x for x in lines if isinstance(x, str)) if isinstance(lines, list) else None
+    return {
+        "nome": _text(_dig(place, 11)),
+        "categoria": _text(categories[0]) if isinstance(categories, list) and categories else "-",
+        "indirizzo": _text(address),
+        "telefono": _text(_dig(place, 178, 0, 0)),
+        "sito": _text(_dig(place, 7, 0)),
+        "valutazione": _format_rating(_dig(place, 4, 7)),
+    }
+
+
+def state_payload_from_html(html):
+    """Payload del luogo dall'HTML di una pagina Maps salvata (None se assente)"""
+    match = _STATE_START.search(html)
+    if not match:
+        return None
+    try:
+        state, _ = json.JSONDecoder().raw_decode(html, match.end())
+    except ValueError:
+        return None
+    for item in _dig(state, 3) or []:
+        if isinstance(item, str) and item.startswith(")]}'"):
+            return item
+    return None
+
+
+def parse_place_html(html, url=None):
+    return parse_place_payload(state_payload_from_html(html), url)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8") as f:
+            print(path, json.dumps(parse_place_html(f.read()), ensure_ascii=False, indent=2))
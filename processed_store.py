@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Registro indicizzato degli URL processati per progetto (SQLite)
+Sostituisce processed_urls_<progetto>.log: lookup per chiave primaria, commit a blocchi,
+stato per URL (done / failed / retrying)
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_RETRYING = "retrying"
+
+# Stati che a una ripresa fanno saltare l'URL
+FINAL_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+
+class ProcessedStore:
+    """Stato degli URL di un progetto
+
+    - mark() accumula in memoria e scrive a blocchi (batch_size righe o commit_interval secondi)
+    - mark_many() scrive subito: usato dopo ogni flush su Sheets, così un URL risulta
+      'done' solo quando la sua riga è davvero salvata
+    - places: chiave canonica del luogo → URL scelto per visitarlo (deduplica tra sessioni)
+    """
+
+    def __init__(self, path, batch_size=500, commit_interval=2.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self._pending = {}
+        self._last_commit = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " error TEXT,"
+            " updated_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS places ("
+            " place_key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def import_legacy_log(self, log_file) -> int:
+        """Importa un vecchio processed_urls_*.log come 'done' e lo rinomina"""
+        p = Path(log_file)
+        if not p.exists():
+            return 0
+        now = time.time()
+        with p.open("r", encoding="utf-8") as f:
+            rows = [(line.strip(), STATUS_DONE, 0, None, now) for line in f if line.strip()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, status, attempts, error, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        p.rename(p.with_name(p.name + ".migrated"))
+        return len(rows)
+
+    def status(self, url):
+        """Stato dell'URL o None se mai visto"""
+        with self._lock:
+            pending = self._pending.get(url)
+            if pending is not None:
+                return pending[0]
+            row = self._conn.execute("SELECT status FROM urls WHERE url = ?", (url,)).fetchone()
+            return row[0] if row else None
+
+    def __contains__(self, url):
+        return self.status(url) in FINAL_STATUSES
+
+    def mark(self, url, status, error=None):
+        """Registra lo stato di un URL (commit a blocchi)"""
+        with self._lock:
+            self._buffer(url, status, error, time.time())
+            if len(self._pending) >= self.batch_size or \
+                    time.monotonic() - self._last_commit >= self.commit_interval:
+                self._commit()
+
+    def mark_many(self, urls, status, error=None):
+        """Registra lo stato di più URL con commit immediato"""
+        now = time.time()
+        with self._lock:
+            for url in urls:
+                self._buffer(url, status, error, now)
+            self._commit()
+
+    def place_url(self, key):
+        """URL registrato per la chiave del luogo, o None"""
+        with self._lock:
+            row = self._conn.execute("SELECT url FROM places WHERE place_key = ?", (key,)).fetchone()
+            return row[0] if row else None
+
+    def set_place_urls(self, pairs):
+        """Registra (chiave, url) per i luoghi appena messi in coda"""
+        if not pairs:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO places (place_key, url) VALUES (?, ?)"
+                " ON CONFLICT(place_key) DO UPDATE SET url = excluded.url",
+                pairs
+            )
+            self._conn.commit()
+
+    def counts(self):
+        """Numero di URL per stato"""
+        with self._lock:
+            self._commit()
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall())
+
+    def flush(self):
+        with self._lock:
+            self._commit()
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._conn.execute("DELETE FROM urls")
+            self._conn.execute("DELETE FROM places")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+    def _buffer(self, url, status, error, updated_at):
+        previous = self._pending.get(url)
+        attempts = (previous[3] if previous else 0) + (0 if status == STATUS_DONE else 1)
+        self._pending[url] = (status, error, updated_at, attempts)
+
+    def _commit(self):
+        self._last_commit = time.monotonic()
+        if not self._pending:
+            return
+        rows = [
+            (url, status, attempts, error, updated_at)
+            for url, (status, error, updated_at, attempts) in self._pending.items()
+        ]
+        try:
+            self._conn.executemany(
+                "INSERT INTO urls (url, status, attempts, error, updated_at) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT(url) DO UPDATE SET"
+                " status = excluded.status,"
+                " attempts = urls.attempts + excluded.attempts,"
+                " error = excluded.error,"
+                " updated_at = excluded.updated_at",
+                rows
+            )
+            self._conn.commit()
+            self._pending.clear()
+        except sqlite3.Error as e:
+            logging.error(f"Errore scrittura registro URL processati: {e}")
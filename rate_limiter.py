@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Rate limiting per host: un token bucket per Google Maps e uno per ogni dominio web
+Il ritmo su Maps si adatta (AIMD) agli errori e ai blocchi osservati
+"""
+
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
+MAPS = "maps"
+
+
+class TokenBucket:
+    """Token bucket thread-safe: rate token al secondo, al massimo burst accumulati"""
+
+    def __init__(self, rate, burst=1.0):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def reserve(self) -> float:
+        """Prenota un token; ritorna i secondi da attendere prima di usarlo"""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class HostRateLimiter:
+    """Budget separati: Maps (adattivo) e un bucket per dominio dei siti web
+
+    Maps: +increase req/s a ogni successo, ×decrease su blocco, ×timeout_decrease su timeout,
+    sempre tra min_rate e max_rate.
+    """
+
+    def __init__(self, maps_rate=1.0, maps_min_rate=0.2, maps_max_rate=4.0, site_rate=1.0, site_burst=2.0,
+                 increase=0.02, decrease=0.5, timeout_decrease=0.85, max_sites=10000):
+        self.maps = TokenBucket(maps_rate, burst=1.0)
+        self.maps_min_rate = maps_min_rate
+        self.maps_max_rate = maps_max_rate
+        self.site_rate = site_rate
+        self.site_burst = site_burst
+        self.increase = increase
+        self.decrease = decrease
+        self.timeout_decrease = timeout_decrease
+        self.max_sites = max_sites
+        self._sites = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bucket(self, host) -> TokenBucket:
+        if host == MAPS:
+            return self.maps
+        with self._lock:
+            bucket = self._sites.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.site_rate, self.site_burst)
+                self._sites[host] = bucket
+                if len(self._sites) > self.max_sites:
+                    self._sites.popitem(last=False)
+            else:
+                self._sites.move_to_end(host)
+            return bucket
+
+    def acquire(self, host):
+        self.bucket(host).acquire()
+
+    async def acquire_async(self, host):
+        await self.bucket(host).acquire_async()
+
+    def maps_feedback(self, error_kind=None):
+        """Aggiorna il ritmo Maps: None = successo, 'blocked' / 'timeout' = rallenta"""
+        with self._lock:
+            rate = self.maps.rate
+            if error_kind is None:
+                rate += self.increase
+            elif error_kind == "blocked":
+                rate *= self.decrease
+            elif error_kind == "timeout":
+                rate *= self.timeout_decrease
+            else:
+                return
+            self.maps.set_rate(max(self.maps_min_rate, min(self.maps_max_rate, rate)))
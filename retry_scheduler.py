@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Retry con backoff esponenziale e dead-letter per gli URL falliti
+Gli URL restano quelli originali: il numero di tentativi è tenuto dallo scheduler
+"""
+
+import csv
+import json
+import time
+import heapq
+import random
+import threading
+import itertools
+from pathlib import Path
+from datetime import datetime
+
+ERROR_TIMEOUT = "timeout"
+ERROR_BLOCKED = "blocked"
+ERROR_PARSE = "parse"
+ERROR_OTHER = "error"
+
+
+class BlockedError(Exception):
+    """Google ha risposto con captcha / pagina 'traffico insolito'"""
+
+
+class ParseError(Exception):
+    """La pagina è stata caricata ma il pannello del luogo non è leggibile"""
+
+
+def classify_error(error) -> str:
+    """Classifica un'eccezione in timeout / blocked / parse / error"""
+    if isinstance(error, BlockedError):
+        return ERROR_BLOCKED
+    if isinstance(error, ParseError):
+        return ERROR_PARSE
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return ERROR_TIMEOUT
+    return ERROR_OTHER
+
+
+class RetryScheduler:
+    """Coda di priorità ordinata per orario di retry, con dead-letter persistente
+
+    - delay = base_delay * 2^(tentativi-1), massimo max_delay, con jitter ±20%
+    - gli errori 'blocked' aspettano 4 volte di più per dare respiro a Google
+    - dopo max_attempts fallimenti l'URL va nel file dead-letter (JSONL)
+    """
+
+    def __init__(self, max_attempts=3, base_delay=30.0, max_delay=600.0, dead_letter_file=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_file = dead_letter_file
+        self.dead_count = 0
+        self._heap = []
+        self._attempts = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def record_failure(self, url, kind, message="") -> bool:
+        """Registra un fallimento: True se è stato programmato un retry, False se dead-letter"""
+        with self._lock:
+            attempts = self._attempts.get(url, 0) + 1
+            self._attempts[url] = attempts
+            if attempts >= self.max_attempts:
+                del self._attempts[url]
+                self.dead_count += 1
+                self._write_dead_letter(url, kind, attempts, message)
+                return False
+
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            if kind == ERROR_BLOCKED:
+                delay = min(self.max_delay, delay * 4)
+            delay *= random.uniform(0.8, 1.2)
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), url))
+            return True
+
+    def requeue(self, url):
+        """Rimette l'URL in testa ai retry senza contare un tentativo (il guasto non era suo)"""
+        with self._lock:
+            heapq.heappush(self._heap, (time.monotonic(), next(self._seq), url))
+
+    def record_success(self, url):
+        with self._lock:
+            self._attempts.pop(url, None)
+
+    def pop_due(self):
+        """Ritorna un URL il cui retry è scaduto, altrimenti None"""
+        with self._lock:
+            if self._heap and self._heap[0][0] <= time.monotonic():
+                return heapq.heappop(self._heap)[2]
+            return None
+
+    def next_due_in(self):
+        """Secondi al prossimo retry, None se non ci sono retry in attesa"""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def snapshot(self) -> dict:
+        """Stato serializzabile: tentativi per URL e retry programmati con l'orario assoluto (epoch)"""
+        with self._lock:
+            offset = time.time() - time.monotonic()
+            return {
+                "attempts": dict(self._attempts),
+                "scheduled": [[url, round(due + offset, 3)] for due, _, url in sorted(self._heap)],
+            }
+
+    def restore(self, state):
+        """Riprende lo stato di snapshot(); i retry già scaduti tra una sessione e l'altra partono subito"""
+        with self._lock:
+            offset = time.time() - time.monotonic()
+            for url, attempts in (state.get("attempts") or {}).items():
+                self._attempts[url] = max(self._attempts.get(url, 0), int(attempts))
+            for url, due_at in state.get("scheduled") or []:
+                heapq.heappush(self._heap, (due_at - offset, next(self._seq), url))
+            return len(state.get("scheduled") or [])
+
+    def _write_dead_letter(self, url, kind, attempts, message):
+        if not self.dead_letter_file:
+            return
+        record = {
+            "url": url,
+            "error": kind,
+            "attempts": attempts,
+            "message": message[:500],
+            "time": datetime.now().isoformat(timespec="seconds"),
+        }
+        with open(self.dead_letter_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_dead_letters(dead_letter_file):
+    """Legge i record dead-letter (ultimo record per URL)"""
+    records = {}
+    p = Path(dead_letter_file)
+    if p.exists():
+        with p.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record["url"]] = record
+    return list(records.values())
+
+
+def export_dead_letter_report(dead_letter_file, report_file):
+    """Esporta i dead-letter in CSV; ritorna il numero di righe scritte"""
+    records = load_dead_letters(dead_letter_file)
+    if not records:
+        return 0
+    with open(report_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["url", "error", "attempts", "message", "time"])
+        writer.writeheader()
+        writer.writerows(records)
+    return len(records)
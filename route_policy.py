@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Filtro delle richieste di rete via context.route / page.route
+Blocca immagini, font, media e tracker che l'estrazione non legge mai
+"""
+
+import threading
+from urllib.parse import urlparse
+
+# Peso medio stimato per tipo di risorsa, usato per stimare i byte risparmiati
+AVG_BYTES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 60_000,
+    "stylesheet": 30_000,
+    "script": 80_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+DEFAULT_AVG_BYTES = 10_000
+
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "adservice.google.com",
+    "facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "bat.bing.com",
+    "analytics.tiktok.com",
+    "scorecardresearch.com",
+    "criteo.com",
+    "taboola.com",
+    "cdn.cookielaw.org",
+    "consent.cookiebot.com",
+    "cdn.iubenda.com",
+)
+
+
+def _host_matches(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class RoutePolicy:
+    """Regole allow/deny per uno stage (es. Maps o siti web)
+
+    Ordine di valutazione: allow_hosts → deny_hosts → block_types → consenti.
+    Conta le richieste bloccate e stima i byte risparmiati.
+    """
+
+    def __init__(self, name, block_types=(), deny_hosts=(), allow_hosts=()):
+        self.name = name
+        self.block_types = frozenset(block_types)
+        self.deny_hosts = tuple(deny_hosts)
+        self.allow_hosts = tuple(allow_hosts)
+        self.allowed = 0
+        self.blocked = 0
+        self.bytes_saved = 0
+        self.blocked_by_type = {}
+        self._lock = threading.Lock()
+
+    def allows(self, resource_type, url) -> bool:
+        host = (urlparse(url).hostname or "").lower()
+        if self.allow_hosts and _host_matches(host, self.allow_hosts):
+            return True
+        if _host_matches(host, self.deny_hosts):
+            return False
+        return resource_type not in self.block_types
+
+    def _check(self, request) -> bool:
+        ok = self.allows(request.resource_type, request.url)
+        with self._lock:
+            if ok:
+                self.allowed += 1
+            else:
+                self.blocked += 1
+                self.bytes_saved += AVG_BYTES.get(request.resource_type, DEFAULT_AVG_BYTES)
+                self.blocked_by_type[request.resource_type] = self.blocked_by_type.get(request.resource_type, 0) + 1
+        return ok
+
+    def _handle(self, route):
+        if self._check(route.request):
+            route.continue_()
+        else:
+            route.abort("blockedbyclient")
+
+    async def _handle_async(self, route):
+        if self._check(route.request):
+            await route.continue_()
+        else:
+            await route.abort("blockedbyclient")
+
+    def install(self, target):
+        """Attiva il filtro su un BrowserContext o su una Page (API sync)"""
+        target.route("**/*", self._handle)
+
+    async def install_async(self, target):
+        """Attiva il filtro su un BrowserContext o su una Page (API async)"""
+        await target.route("**/*", self._handle_async)
+
+    def counters(self):
+        """Contatori serializzabili (per unire i dati di più processi)"""
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "blocked": self.blocked,
+                "bytes_saved": self.bytes_saved,
+                "blocked_by_type": dict(self.blocked_by_type),
+            }
+
+    def merge(self, counters):
+        with self._lock:
+            self.allowed += counters["allowed"]
+            self.blocked += counters["blocked"]
+            self.bytes_saved += counters["bytes_saved"]
+            for resource_type, count in counters["blocked_by_type"].items():
+                self.blocked_by_type[resource_type] = self.blocked_by_type.get(resource_type, 0) + count
+
+    def summary(self) -> str:
+        with self._lock:
+            mb = self.bytes_saved / (1024 * 1024)
+            return f"{self.name}: {self.blocked} richieste bloccate su {self.blocked + self.allowed} (~{mb:.1f} MB risparmiati)"
@@ -3,44 +3,204 @@
 
 import os
 import time
+import asyncio
+import multiprocessing
 import logging
-import random
 import threading
 import re
-import sys
-import requests
-from queue import Queue
+import itertools
+import importlib
+from queue import Queue, Empty, Full
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 from pathlib import Path
 from datetime import datetime, timedelta
 
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
-from tqdm import tqdm
-import gspread
-from google.oauth2.service_account import Credentials
+# Playwright, gspread, requests e tqdm vengono importati dove servono: avvio più rapido
+# (anche per i processi worker in modalità spawn, che reimportano questo modulo)
+
+from sheets_writer import SheetsBatchWriter
+from sinks import open_sinks, check_sinks
+from contact_cache import ContactCache, normalize_domain, DAY
+from contact_http import fetch_page, get_http_session
+from contact_crawler import rank_contact_links, crawl_pages, remaining
+from route_policy import RoutePolicy, TRACKER_HOSTS
+from retry_scheduler import (
+    RetryScheduler, BlockedError, ParseError, ERROR_BLOCKED, ERROR_TIMEOUT, classify_error, export_dead_letter_report
+)
+from place_ids import place_key, place_keys
+from place_state import PLACE_STATE_JS, parse_place_payload
+from search_feed import (
+    SEARCH_FEED_SELECTOR, FEED_SCROLL_JS, FEED_LISTINGS_JS, is_search_url, search_url, listing_fields
+)
+from processed_store import ProcessedStore, STATUS_DONE, STATUS_FAILED, STATUS_RETRYING
+from rate_limiter import HostRateLimiter, MAPS
+from distributed_queue import LeaseQueue
+from metrics import Registry, start_metrics_server, chromium_rss_by_browser, process_uptime
+from instrumentation import AtomicCounters, UrlTimer, TimingLog, DeadlineExceeded, timed_stage, annotate, current_timer
+from email_engine import EmailRanker
+from social_links import SocialCollector, empty_social
+from checkpoint import Drain, REASON_TIME_LIMIT, REASON_SIGNAL, REASON_WORKERS, save_checkpoint, load_checkpoint, discard_checkpoint
+from browser_pool import (
+    BrowserSlot, PrelaunchedSlots, WorkerHandle, WorkerSupervisor, launched_browser_pid, browser_rss_mb
+)
 
 # === CONFIG ===
 LOG_FILE = "estrazione.log"
 MAX_SESSION_TIME = 2 * 60 * 60  # 2 ore in secondi
+# ARRESTO: al limite di tempo o su SIGTERM le pagine in corso hanno DRAIN_GRACE secondi per finire
+DRAIN_GRACE = float(os.environ.get("DRAIN_GRACE", "20"))
 
 # PERFORMANCE
 NUM_WORKERS = min(max(2, (os.cpu_count() or 2) // 2), 6)
 MAX_TENTATIVI = 3
-DELAY_MIN = 2
-DELAY_MAX = 5
+RETRY_BASE_DELAY = float(os.environ.get("RETRY_BASE_DELAY", "30"))  # secondi, raddoppia a ogni tentativo
+RETRY_MAX_DELAY = float(os.environ.get("RETRY_MAX_DELAY", "600"))
+# RATE LIMIT per host (richieste/secondo): Maps si adatta tra MIN e MAX, i siti hanno un budget per dominio
+MAPS_RATE = float(os.environ.get("MAPS_RATE", "1.0"))
+MAPS_RATE_MIN = float(os.environ.get("MAPS_RATE_MIN", "0.2"))
+MAPS_RATE_MAX = float(os.environ.get("MAPS_RATE_MAX", "4.0"))
+SITE_RATE = float(os.environ.get("SITE_RATE", "1.0"))
 CONTACT_TIMEOUT = 12000  # milliseconds
+# PAGINE CONTATTI: pagine interne candidate (contatti, chi siamo, impressum, ...) visitate in parallelo
+CONTACT_PAGES = int(os.environ.get("CONTACT_PAGES", "3"))
+CONTACT_CRAWL_BUDGET = float(os.environ.get("CONTACT_CRAWL_BUDGET", "8"))  # secondi per sito
+
+# MULTI-PROCESSO: N processi, ognuno con PROCESS_WORKERS browser propri (0 = processo singolo, "auto" = core/2)
+_num_processes = os.environ.get("NUM_PROCESSES", "0").strip().lower()
+NUM_PROCESSES = max(1, (os.cpu_count() or 2) // 2) if _num_processes == "auto" else int(_num_processes or 0)
+PROCESS_WORKERS = int(os.environ.get("PROCESS_WORKERS", "2"))
+
+# ENGINE: "thread" = un browser per worker, "async" = pochi browser con molte pagine concorrenti
+ENGINE = os.environ.get("SCRAPER_ENGINE", "thread").strip().lower()
+ASYNC_BROWSERS = int(os.environ.get("ASYNC_BROWSERS", "2"))
+ASYNC_PAGES_PER_BROWSER = int(os.environ.get("ASYNC_PAGES_PER_BROWSER", "6"))
+
+# INPUT: il foglio viene letto a pagine mentre i worker lavorano già
+INPUT_PAGE_SIZE = int(os.environ.get("INPUT_PAGE_SIZE", "2000"))
+# MODALITÀ RICERCA: "search" = le righe non URL e gli URL /maps/search/ diventano ricerche Maps
+# e di ogni ricerca si raccolgono tutti i luoghi del feed ("places": un luogo per URL)
+INPUT_MODE = os.environ.get("INPUT_MODE", "places").strip().lower()
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "120"))
+SEARCH_SCROLL_PAUSE = 1200  # milliseconds tra uno scroll del feed e il successivo
+SEARCH_DEADLINE = float(os.environ.get("SEARCH_DEADLINE", "900"))  # secondi per ricerca (feed + siti)
+SEARCH_ENRICH_WORKERS = int(os.environ.get("SEARCH_ENRICH_WORKERS", "6"))  # siti in parallelo
+# Deduplica per luogo: i link brevi (maps.app.goo.gl) vengono risolti via HTTP (0 = chiave dal solo URL)
+RESOLVE_SHORT_LINKS = os.environ.get("RESOLVE_SHORT_LINKS", "1") != "0"
+
+# POOL BROWSER: pagina Maps riutilizzata, browser riciclato dopo N pagine o oltre la soglia RSS
+BROWSER_MAX_PAGES = int(os.environ.get("BROWSER_MAX_PAGES", "200"))
+BROWSER_MAX_RSS_MB = int(os.environ.get("BROWSER_MAX_RSS_MB", "1500"))  # 0 = nessun limite
+URL_DEADLINE = float(os.environ.get("URL_DEADLINE", "120"))  # secondi, scadenza dura per URL
+WORKER_HANG_GRACE = 60  # secondi oltre la scadenza: poi il supervisore sblocca il worker
+WORKER_HANG_TIMEOUT = URL_DEADLINE + WORKER_HANG_GRACE
+BROWSER_MAX_FAILURES = 5  # avvii falliti di fila prima di rinunciare a un browser async
+
+# CODA DISTRIBUITA: più nodi sullo stesso progetto (vuoto = coda locale del nodo)
+WORK_QUEUE_DB = os.environ.get("WORK_QUEUE_DB", "").strip()
+NODE_ID = os.environ.get("NODE_ID", "").strip() or None
+LEASE_SECONDS = float(os.environ.get("LEASE_SECONDS", "300"))
+LEASE_BATCH = int(os.environ.get("LEASE_BATCH", "10"))
+LEASE_POLL_INTERVAL = 5  # secondi, attesa quando gli URL rimasti sono in lease ad altri nodi
+
+# METRICHE: endpoint Prometheus sulla porta esposta dal Dockerfile
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+METRICS_PORT = int(os.environ.get("METRICS_PORT") or os.environ.get("PORT") or "10000")
+METRICS_PUSH_INTERVAL = 5  # secondi, invio delle metriche dai processi worker al coordinatore
+# File JSONL con i tempi per fase di ogni URL (vuoto = disattivato)
+TIMING_LOG_FILE = os.environ.get("TIMING_LOG_FILE", "").strip()
+
+# GOOGLE SHEETS (scrittura a blocchi in background)
+SHEETS_BATCH_SIZE = int(os.environ.get("SHEETS_BATCH_SIZE", "50"))
+SHEETS_FLUSH_INTERVAL = float(os.environ.get("SHEETS_FLUSH_INTERVAL", "5"))
+SHEETS_MAX_PENDING = int(os.environ.get("SHEETS_MAX_PENDING", "2000"))
+SHEETS_MAX_RETRIES = 5
+
+# OUTPUT: "sheets" e/o file locali in streaming "jsonl", "csv", "parquet" (separati da virgola)
+OUTPUT_SINKS = tuple(v.strip().lower() for v in os.environ.get("OUTPUT_SINKS", "sheets").split(",") if v.strip())
+SHEETS_OUTPUT = "sheets" in OUTPUT_SINKS
+LOCAL_SINKS = tuple(v for v in OUTPUT_SINKS if v != "sheets")
+OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "output")
+OUTPUT_BATCH_SIZE = int(os.environ.get("OUTPUT_BATCH_SIZE", "1000"))  # righe per blocco (row group Parquet)
+OUTPUT_FLUSH_INTERVAL = float(os.environ.get("OUTPUT_FLUSH_INTERVAL", "30"))
+OUTPUT_HEADERS = [
+    "Nome azienda", "Categoria", "Indirizzo", "Telefono", "Sito web",
+    "Email", "Facebook", "Instagram", "LinkedIn", "YouTube", "TikTok", "X", "Pinterest"
+] + (["Valutazione", "URL Maps"] if INPUT_MODE == "search" else [])
+
+# HTTP FAST PATH: prova prima l'HTML statico, il browser solo se serve
+HTTP_FIRST = os.environ.get("HTTP_FIRST", "1") != "0"
+
+# CACHE CONTATTI (persistente, condivisa tra sessioni e progetti)
+CONTACT_CACHE_FILE = os.environ.get("CONTACT_CACHE_FILE", "contact_cache.sqlite")
+CONTACT_CACHE_TTL = float(os.environ.get("CONTACT_CACHE_TTL_DAYS", "30")) * DAY
+CONTACT_CACHE_NEGATIVE_TTL = 2 * DAY  # siti senza email né social
+CONTACT_CACHE_MAX_ENTRIES = int(os.environ.get("CONTACT_CACHE_MAX_ENTRIES", "100000"))
+CONTACT_CACHE_HOT_SIZE = 2000
+
+# FILTRO RICHIESTE: tipi di risorsa e host bloccati per stage (Maps / siti web)
+BLOCK_RESOURCES = os.environ.get("BLOCK_RESOURCES", "1") != "0"
+
+def _csv_env(name, default=""):
+    return tuple(v.strip() for v in os.environ.get(name, default).split(",") if v.strip())
 
-# SOCIAL DOMAINS
-SOCIAL_DOMAINS = {
-    "facebook": ["facebook.com"],
-    "instagram": ["instagram.com"],
-    "linkedin": ["linkedin.com/company", "linkedin.com/in", "linkedin.com"],
-    "youtube": ["youtube.com", "youtu.be"],
-    "tiktok": ["tiktok.com"],
-    "x": ["x.com", "twitter.com"],
-    "pinterest": ["pinterest.com"],
+MAPS_ROUTE_POLICY = RoutePolicy(
+    "Maps",
+    block_types=_csv_env("MAPS_BLOCK_TYPES", "image,media,font"),
+    deny_hosts=TRACKER_HOSTS + _csv_env("BLOCK_HOSTS"),
+    allow_hosts=_csv_env("MAPS_ALLOW_HOSTS"),
+)
+SITE_ROUTE_POLICY = RoutePolicy(
+    "Siti web",
+    block_types=_csv_env("SITE_BLOCK_TYPES", "image,media,font,stylesheet"),
+    deny_hosts=TRACKER_HOSTS + _csv_env("BLOCK_HOSTS"),
+    allow_hosts=_csv_env("SITE_ALLOW_HOSTS"),
+)
+
+LAUNCH_OPTIONS = {"headless": True}
+
+CONTEXT_OPTIONS = {
+    "viewport": {'width': 1366, 'height': 900},
+    "locale": 'it-IT',
+    "user_agent": 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36',
 }
-EMAIL_REGEX = re.compile(r"[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}", re.IGNORECASE)
+
+# SITI WEB: tutti i link (href assoluto, testo) e il testo visibile con una sola evaluate
+SITE_SCAN_JS = """
+() => ({
+    anchors: Array.from(document.querySelectorAll("a[href]"), a => [
+        typeof a.href === "string" ? a.href : (a.getAttribute("href") || ""),
+        (a.textContent || "").trim().slice(0, 80),
+    ]),
+    text: document.body ? document.body.innerText.slice(0, 200000) : "",
+})
+"""
+
+# PANNELLO MAPS: prima lo stato incorporato nella pagina (APP_INITIALIZATION_STATE, vedi
+# place_state.py), altrimenti un'attesa sola e tutti i campi del DOM in un'unica evaluate
+PLACE_PANEL_SELECTOR = "h1.DUwDvf"
+PLACE_PANEL_TIMEOUT = 8000  # milliseconds
+PLACE_FIELDS_JS = """
+() => {
+    const text = (selector) => {
+        const el = document.querySelector(selector);
+        const value = el && el.textContent ? el.textContent.trim() : "";
+        return value || "-";
+    };
+    const attr = (selector, name) => {
+        const el = document.querySelector(selector);
+        return (el && el.getAttribute(name)) || "-";
+    };
+    return {
+        nome: text("h1.DUwDvf"),
+        categoria: text("button[jsaction*='pane.wfvdle17.category']"),
+        indirizzo: text("button[data-item-id='address'] div.Io6YTe"),
+        telefono: text("button[aria-label*='Telefono'] div.Io6YTe, button[aria-label*='tel:'] div.Io6YTe"),
+        sito: attr("a[aria-label*='Sito web'], a[aria-label*='sito web']", "href"),
+        valutazione: text("div.F7nice span[aria-hidden='true']"),
+    };
+}
+"""
 
 logging.basicConfig(
     level=logging.WARNING,
@@ -51,15 +211,52 @@ logging.basicConfig(
 # GLOBAL
 write_lock = threading.Lock()
 processed_lock = threading.Lock()
-domain_cache_lock = threading.Lock()
-sheets_lock = threading.Lock()
-domain_cache = {}
+processed_store = None
+contact_cache_lock = threading.Lock()
+contact_cache = None
 output_sheet = None
 output_worksheet = None
+sheets_writer = None
+local_writer = None
+harvested_places = set()  # chiavi dei luoghi già scritti in questa sessione dai feed di ricerca
+harvested_lock = threading.Lock()
 current_project = None
 session_start_time = None
 stop_requested = threading.Event()
-stats = {"processed": 0, "errors": 0, "emails_found": 0, "social_found": 0}
+drain = Drain(stop_requested, DRAIN_GRACE)
+unqueued_urls = []  # URL letti ma non accodati (o rimasti in coda) all'arresto → checkpoint
+interrupted_urls = []  # URL in corso oltre la grazia dell'arresto → checkpoint
+intake_done = threading.Event()  # cleared mentre arrivano ancora URL (es. da un altro processo)
+intake_done.set()
+result_queue = None  # nei processi worker: canale verso il coordinatore
+lease_queue = None  # coda distribuita (solo con WORK_QUEUE_DB)
+lease_ingest_done = threading.Event()  # set quando il foglio INPUT è tutto nella coda distribuita
+ingest_stats = {"read": 0, "skipped": 0, "duplicates": 0}
+retry_scheduler = RetryScheduler(MAX_TENTATIVI, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+rate_limiter = HostRateLimiter(MAPS_RATE, MAPS_RATE_MIN, MAPS_RATE_MAX, SITE_RATE)
+stats = AtomicCounters(("processed", "errors", "emails_found", "social_found", "search_places"))
+timing_log = None
+prelaunched_slots = None  # thread worker con browser avviati durante l'autenticazione e la lettura dell'INPUT
+startup_marks = {}  # fase dell'avvio → secondi dall'avvio del processo
+startup_lock = threading.Lock()
+
+# METRICHE
+METRICS = Registry()
+URLS_TOTAL = METRICS.counter("scraper_urls_total", "URL completati per esito", ("result",))
+RETRIES_TOTAL = METRICS.counter("scraper_retries_total", "Retry programmati per tipo di errore", ("kind",))
+STAGE_SECONDS = METRICS.histogram("scraper_stage_seconds", "Durata delle fasi di estrazione", ("stage",))
+URL_SECONDS = METRICS.histogram("scraper_url_seconds", "Durata totale per URL", ("result",))
+SHEETS_ROWS = METRICS.counter("scraper_sheets_rows_total", "Righe inviate a Google Sheets per esito", ("result",))
+STARTUP_SECONDS = METRICS.gauge("scraper_startup_seconds", "Secondi dall'avvio del processo a ogni fase della partenza", ("phase",))
+QUEUE_DEPTH = METRICS.gauge("scraper_queue_depth", "URL in coda non ancora presi da un worker")
+ACTIVE_PAGES = METRICS.gauge("scraper_active_pages", "Pagine del browser aperte")
+BROWSER_RSS = METRICS.gauge("scraper_browser_rss_bytes", "RSS per browser Chromium (processo principale e figli)", ("browser",))
+MAPS_RATE_GAUGE = METRICS.gauge("scraper_maps_rate", "Richieste al secondo concesse a Google Maps")
+PLACE_FIELDS_SOURCE = METRICS.counter("scraper_place_fields_total", "Schede lette dallo stato della pagina o dal DOM", ("source",))
+SHEETS_PENDING = METRICS.gauge("scraper_sheets_pending_rows", "Righe in attesa di essere scritte su Google Sheets")
+BROWSER_RSS.set_function(lambda: {(str(pid),): rss for pid, rss in chromium_rss_by_browser().items()})
+MAPS_RATE_GAUGE.set_function(lambda: rate_limiter.maps.rate)
+SHEETS_PENDING.set_function(lambda: sheets_writer.pending() if sheets_writer else 0)
 
 
 # ========== TELEGRAM ==========
@@ -72,6 +269,7 @@ def send_telegram_notification(message):
         return  # Notifiche non configurate
     
     try:
+        import requests
         url = f"https://api.telegram.org/bot{token}/sendMessage"
         data = {"chat_id": chat_id, "text": message, "parse_mode": "HTML"}
         requests.post(url, data=data, timeout=10)
@@ -82,13 +280,16 @@ def send_telegram_notification(message):
 # ========== GOOGLE SHEETS ==========
 def init_google_sheets():
     """Inizializza la connessione a Google Sheets usando Service Account"""
+    import gspread
+    from google.oauth2.service_account import Credentials as ServiceAccountCredentials
+    
     try:
         # Prova prima con Service Account
         credentials_json = os.environ.get('GOOGLE_CREDENTIALS')
         if credentials_json:
             import json
             creds_info = json.loads(credentials_json)
-            creds = Credentials.from_service_account_info(creds_info)
+            creds = ServiceAccountCredentials.from_service_account_info(creds_info)
             client = gspread.authorize(creds)
             print("✅ Google Sheets connesso tramite Service Account")
             return client
@@ -139,14 +340,10 @@ def get_or_create_tab(client, output_sheet_url, tab_name, create_new=False):
             # Crea nuova tab con timestamp
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             unique_tab_name = f"{tab_name}_{timestamp}"
-            output_worksheet = output_sheet.add_worksheet(title=unique_tab_name, rows=1000, cols=13)
+            output_worksheet = output_sheet.add_worksheet(title=unique_tab_name, rows=1000, cols=len(OUTPUT_HEADERS))
             
             # Scrivi intestazioni
-            headers = [
-                "Nome azienda", "Categoria", "Indirizzo", "Telefono", "Sito web",
-                "Email", "Facebook", "Instagram", "LinkedIn", "YouTube", "TikTok", "X", "Pinterest"
-            ]
-            output_worksheet.append_row(headers)
+            output_worksheet.append_row(OUTPUT_HEADERS)
             print(f"✅ Creata nuova tab: {unique_tab_name}")
             return unique_tab_name
         else:
@@ -160,34 +357,197 @@ def get_or_create_tab(client, output_sheet_url, tab_name, create_new=False):
         raise
 
 
-def get_urls_from_sheet(client, input_sheet_url):
-    """Legge gli URL dal foglio INPUT"""
+def select_output_project(client, output_sheet_url):
+    """Mostra le tab del foglio OUTPUT e fa scegliere (o creare) il progetto"""
+    print("\n📋 Progetti esistenti nel foglio OUTPUT:")
+    existing_tabs = get_existing_tabs(client, output_sheet_url)
+    
+    if existing_tabs:
+        for i, tab in enumerate(existing_tabs, 1):
+            print(f"   {i}. {tab}")
+        print(f"   {len(existing_tabs) + 1}. [NUOVO PROGETTO]")
+        
+        choice = input(f"\nScegli un progetto (1-{len(existing_tabs) + 1}): ").strip()
+        
+        try:
+            choice_idx = int(choice) - 1
+            if 0 <= choice_idx < len(existing_tabs):
+                # Progetto esistente
+                project = existing_tabs[choice_idx]
+                get_or_create_tab(client, output_sheet_url, project, create_new=False)
+            else:
+                # Nuovo progetto
+                project = input("\n🏷️  Nome del nuovo progetto: ").strip()
+                project = get_or_create_tab(client, output_sheet_url, project, create_new=True)
+        except (ValueError, IndexError):
+            print("❌ Scelta non valida. Creo nuovo progetto.")
+            project = input("\n🏷️  Nome del nuovo progetto: ").strip()
+            project = get_or_create_tab(client, output_sheet_url, project, create_new=True)
+    else:
+        print("   (Nessun progetto esistente)")
+        project = input("\n🏷️  Nome del nuovo progetto: ").strip()
+        project = get_or_create_tab(client, output_sheet_url, project, create_new=True)
+    
+    return project
+
+
+def iter_url_pages(client, input_sheet_url, page_size=INPUT_PAGE_SIZE):
+    """Legge la colonna A del foglio INPUT a pagine di page_size righe
+    
+    Generatore: ogni pagina è la lista degli URL validi di quel blocco di righe.
+    """
     try:
         sheet = client.open_by_url(input_sheet_url)
         worksheet = sheet.get_worksheet(0)
-        values = worksheet.col_values(1)
+        row_count = worksheet.row_count
+    except Exception as e:
+        logging.error(f"Errore lettura foglio INPUT: {e}")
+        raise
+    
+    for start in range(1, row_count + 1, page_size):
+        end = min(start + page_size - 1, row_count)
+        try:
+            values = worksheet.get(f"A{start}:A{end}")
+        except Exception as e:
+            logging.error(f"Errore lettura foglio INPUT (righe {start}-{end}): {e}")
+            raise
         
         urls = []
-        for val in values:
-            val = val.strip()
+        for row in values:
+            val = row[0].strip() if row else ""
             if val and _looks_like_url(val):
                 urls.append(_ensure_url_scheme(val))
-        
-        return urls
-    except Exception as e:
-        logging.error(f"Errore lettura foglio INPUT: {e}")
-        raise
+            elif val and INPUT_MODE == "search":
+                urls.append(search_url(val))
+        yield urls
 
 
-def write_to_sheet(data_row):
-    """Scrivi una riga nel foglio OUTPUT"""
-    global output_worksheet
+def get_urls_from_sheet(client, input_sheet_url):
+    """Legge tutti gli URL dal foglio INPUT"""
+    return [u for page in iter_url_pages(client, input_sheet_url) for u in page]
+
+
+def iter_pending_pages(pages, processed, resumed=frozenset()):
+    """Toglie da ogni pagina gli URL già processati (o in dead-letter) e gli altri URL dello
+    stesso luogo (link brevi, coordinate diverse, ?cid=): ogni luogo viene visitato una volta
     
-    with sheets_lock:
-        try:
-            output_worksheet.append_row(data_row)
-        except Exception as e:
-            logging.error(f"Errore scrittura su Google Sheets: {e}")
+    resumed: URL già ripresi dal checkpoint (coda e retry), saltati come doppioni
+    """
+    seen = set()
+    session = get_http_session() if RESOLVE_SHORT_LINKS else None
+    for page in pages:
+        fresh = [u for u in page if u not in processed]
+        keys = place_keys(fresh, session)
+        pending = []
+        for url in fresh:
+            key = keys[url]
+            if key in seen or url in resumed:
+                continue
+            owner = processed.place_url(key)
+            if owner is not None and owner != url and (owner in processed or owner in resumed):
+                continue
+            seen.add(key)
+            pending.append(url)
+        processed.set_place_urls([(keys[u], u) for u in pending])
+        ingest_stats["read"] += len(page)
+        ingest_stats["skipped"] += len(page) - len(fresh)
+        ingest_stats["duplicates"] += len(fresh) - len(pending)
+        yield pending
+
+
+def start_sheets_writer(project_name):
+    """Avvia i writer in background: foglio OUTPUT e/o file locali (OUTPUT_SINKS)
+    
+    Gli URL risultano processati dopo la scrittura su Sheets, o sui file locali
+    se Sheets non è tra gli output.
+    """
+    global sheets_writer, local_writer
+    
+    safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', project_name)
+    if LOCAL_SINKS:
+        sinks = open_sinks(LOCAL_SINKS, OUTPUT_DIR, safe_name, OUTPUT_HEADERS)
+        local_writer = SheetsBatchWriter(
+            sinks,
+            batch_size=OUTPUT_BATCH_SIZE,
+            flush_interval=OUTPUT_FLUSH_INTERVAL,
+            max_pending=SHEETS_MAX_PENDING,
+            max_retries=SHEETS_MAX_RETRIES,
+            fallback_file=f"output_failed_{safe_name}.jsonl",
+            on_flushed=None if SHEETS_OUTPUT else _mark_rows_written,
+            on_fallback=None if SHEETS_OUTPUT else _mark_rows_fallback,
+            observe_flush=_observe_local_flush,
+            name="file locali",
+        ).start()
+        print(f"💾 Output locale: {', '.join(sinks.paths())}")
+    if not SHEETS_OUTPUT:
+        return local_writer
+    
+    sheets_writer = SheetsBatchWriter(
+        output_worksheet,
+        batch_size=SHEETS_BATCH_SIZE,
+        flush_interval=SHEETS_FLUSH_INTERVAL,
+        max_pending=SHEETS_MAX_PENDING,
+        max_retries=SHEETS_MAX_RETRIES,
+        fallback_file=f"sheets_failed_{safe_name}.jsonl",
+        on_flushed=_mark_rows_written,
+        on_fallback=_mark_rows_fallback,
+        observe_flush=_observe_sheets_flush,
+    ).start()
+    return sheets_writer
+
+
+def _observe_sheets_flush(seconds, rows):
+    STAGE_SECONDS.observe(seconds, stage="sheets_flush")
+    SHEETS_ROWS.inc(rows, result="written")
+
+
+def _observe_local_flush(seconds, rows):
+    STAGE_SECONDS.observe(seconds, stage="output_flush")
+
+
+def _mark_rows_written(urls):
+    """Callback del writer: gli URL sono scritti, ora risultano processati"""
+    get_processed_store(current_project).mark_many(urls, STATUS_DONE)
+    if lease_queue is not None:
+        lease_queue.complete(urls, STATUS_DONE)
+
+
+def _mark_rows_fallback(urls):
+    """Callback del writer: righe salvate nel file di fallback, gli URL non vanno riestratti
+    
+    Restano registrati come falliti (con il motivo) e il lease viene chiuso: altrimenti
+    la coda distribuita li aspetterebbe fino alla fine della sessione.
+    """
+    get_processed_store(current_project).mark_many(urls, STATUS_FAILED, "righe nel file di fallback")
+    if lease_queue is not None:
+        lease_queue.complete(urls, STATUS_FAILED)
+
+
+def stop_sheets_writer():
+    """Flush finale delle righe in coda e stop dei writer"""
+    if sheets_writer:
+        sheets_writer.close()
+        if sheets_writer.rows_failed:
+            SHEETS_ROWS.inc(sheets_writer.rows_failed, result="fallback")
+    if local_writer:
+        local_writer.close()
+        local_writer.worksheet.close()
+
+
+def write_to_sheet(data_row, url=None):
+    """Accoda una riga per gli output (foglio OUTPUT e/o file locali, scritti a blocchi in background)
+    
+    L'URL viene segnato come processato solo dopo la scrittura effettiva su Sheets
+    (o sui file locali se Sheets non è tra gli output).
+    Nei processi worker la riga viene inoltrata al coordinatore.
+    """
+    if result_queue is not None:
+        result_queue.put(("row", url, list(data_row)))
+        return
+    if sheets_writer:
+        sheets_writer.put(data_row, key=url)
+    if local_writer:
+        local_writer.put(data_row, key=url)
 
 
 # ========== UTIL ==========
@@ -214,6 +574,31 @@ def _normalize_home(url: str) -> str:
         return url
 
 
+# ========== CACHE CONTATTI ==========
+def get_contact_cache():
+    """Apre (una sola volta) la cache persistente dei contatti"""
+    global contact_cache
+    with contact_cache_lock:
+        if contact_cache is None:
+            contact_cache = ContactCache(
+                CONTACT_CACHE_FILE,
+                ttl=CONTACT_CACHE_TTL,
+                negative_ttl=CONTACT_CACHE_NEGATIVE_TTL,
+                max_entries=CONTACT_CACHE_MAX_ENTRIES,
+                hot_size=CONTACT_CACHE_HOT_SIZE,
+            )
+        return contact_cache
+
+
+def close_contact_cache():
+    """Chiude la cache dei contatti a fine sessione"""
+    global contact_cache
+    with contact_cache_lock:
+        if contact_cache is not None:
+            contact_cache.close()
+            contact_cache = None
+
+
 # ========== PLAYWRIGHT ==========
 def accept_cookies_on_maps(page):
     """Accetta i cookies su Google Maps"""
@@ -228,48 +613,22 @@ def accept_cookies_on_maps(page):
         pass
 
 
-def _text_or_dash(page, selector: str) -> str:
-    """Estrai testo o ritorna '-'"""
+def _wait_place_panel(page):
+    """Unica attesa: il pannello del luogo è pronto quando compare il nome"""
     try:
-        element = page.wait_for_selector(selector, timeout=3000)
-        if element:
-            text = element.text_content()
-            return text.strip() if text else "-"
-        return "-"
+        page.wait_for_selector(PLACE_PANEL_SELECTOR, timeout=PLACE_PANEL_TIMEOUT)
     except:
-        return "-"
+        pass
 
 
-def estrai_dati_azienda(page):
-    """Estrai i dati aziendali da Google Maps"""
-    nome = _text_or_dash(page, "h1.DUwDvf")
-    categoria = _text_or_dash(page, "button[jsaction*='pane.wfvdle17.category']")
-    indirizzo = _text_or_dash(page, "button[data-item-id='address'] div.Io6YTe")
-    
-    telefono = "-"
-    try:
-        tel_elem = page.wait_for_selector("button[aria-label*='Telefono'] div.Io6YTe, button[aria-label*='tel:'] div.Io6YTe", timeout=3000)
-        if tel_elem:
-            telefono = tel_elem.text_content().strip() or "-"
-    except:
-        pass
-    
-    sito = "-"
-    try:
-        sito_elem = page.wait_for_selector("a[aria-label*='Sito web'], a[aria-label*='sito web']", timeout=3000)
-        if sito_elem:
-            sito = sito_elem.get_attribute("href") or "-"
-    except:
-        pass
-    
-    email = "-"
-    social = {k: "-" for k in SOCIAL_DOMAINS.keys()}
-    
-    if sito != "-":
-        email, social = estrai_contatti_da_sito(page.context, sito)
-    
+def _place_row(campi, email, social):
+    """Riga di output dai campi del pannello e dai contatti del sito"""
     return [
-        nome, categoria, indirizzo, telefono, sito,
+        campi.get("nome") or "-",
+        campi.get("categoria") or "-",
+        campi.get("indirizzo") or "-",
+        campi.get("telefono") or "-",
+        campi.get("sito") or "-",
         email,
         social["facebook"],
         social["instagram"],
@@ -281,21 +640,104 @@ def estrai_dati_azienda(page):
     ]
 
 
-def estrai_contatti_da_sito(context, sito_url: str):
-    """Estrai email e social da un sito web"""
+def _output_row(campi, email, social):
+    """Riga del foglio OUTPUT; in modalità ricerca con valutazione e URL Maps in coda"""
+    row = _place_row(campi, email, social)
+    if INPUT_MODE == "search":
+        row += [campi.get("valutazione") or "-", campi.get("url") or "-"]
+    return row
+
+
+def _place_fields_source(campi):
+    source = "dom" if campi is None else "state"
+    PLACE_FIELDS_SOURCE.inc(source=source)
+    annotate(fields=source)
+
+
+def _leggi_stato_luogo(page):
+    """Campi dallo stato incorporato nella pagina; None se manca o non corrisponde all'URL"""
+    try:
+        with timed_stage("state"):
+            return parse_place_payload(page.evaluate(PLACE_STATE_JS), page.url)
+    except:
+        return None
+
+
+def estrai_dati_azienda(page):
+    """Estrai i dati aziendali da Google Maps: stato della pagina, altrimenti un solo snapshot del pannello"""
+    campi = _leggi_stato_luogo(page)
+    _place_fields_source(campi)
+    if campi is None:
+        with timed_stage("panel"):
+            _wait_place_panel(page)
+        try:
+            with timed_stage("fields"):
+                campi = page.evaluate(PLACE_FIELDS_JS) or {}
+        except:
+            campi = {}
+    
+    if (campi.get("nome") or "-") == "-":
+        raise ParseError("pannello del luogo non trovato")
+    
+    sito = campi.get("sito") or "-"
+    email = "-"
+    social = empty_social()
+    
+    if sito != "-":
+        with timed_stage("website"):
+            email, social = estrai_contatti_da_sito(page.context, sito)
+    
+    campi["url"] = page.url
+    return _output_row(campi, email, social)
+
+
+def _contatti_senza_browser(sito_url, http_first=HTTP_FIRST, fetched=None):
+    """Contatti dalla cache o dall'HTML statico; None se serve il browser
+    
+    In fetched finiscono le pagine candidate già scaricate via HTTP, da non riscaricare.
+    """
+    home = _normalize_home(sito_url)
+    domain = normalize_domain(home)
+    cache = get_contact_cache()
+    cached = cache.get(domain)
+    if cached is not None:
+        annotate(contacts="cache")
+        return cached
+    
+    if http_first:
+        fast = estrai_contatti_http(home, fetched)
+        if fast is not None:
+            annotate(contacts="http")
+            cache.put(domain, *fast)
+            return fast
+    return None
+
+
+def estrai_contatti_da_sito(context, sito_url: str, http_first=HTTP_FIRST, fetched=None):
+    """Estrai email e social da un sito web (fetched: pagine già scaricate via HTTP)"""
     home = _normalize_home(sito_url)
-    domain = urlparse(home).netloc.lower()
+    domain = normalize_domain(home)
+    
+    annotate(site=domain)
+    fetched = set() if fetched is None else fetched
+    fast = _contatti_senza_browser(home, http_first, fetched)
+    if fast is not None:
+        return fast
     
-    with domain_cache_lock:
-        if domain in domain_cache:
-            return domain_cache[domain]
+    annotate(contacts="browser")
+    cache = get_contact_cache()
     
-    email_found = "-"
-    social_found = {k: "-" for k in SOCIAL_DOMAINS.keys()}
+    ranker = EmailRanker(domain)
+    social = SocialCollector()
     
+    page = None
     try:
         page = context.new_page()
+        ACTIVE_PAGES.inc()
+        if BLOCK_RESOURCES:
+            SITE_ROUTE_POLICY.install(page)
         page.set_default_timeout(CONTACT_TIMEOUT)
+        rate_limiter.acquire(domain)
         page.goto(home, wait_until="domcontentloaded")
         
         try:
@@ -310,68 +752,256 @@ def estrai_contatti_da_sito(context, sito_url: str):
         except:
             pass
         
-        try:
-            mailto_links = page.locator("a[href^='mailto:']").all()
-            for link in mailto_links:
-                href = link.get_attribute("href") or ""
-                if href.lower().startswith("mailto:"):
-                    mail = href.split("mailto:", 1)[1].split("?")[0].strip()
-                    if EMAIL_REGEX.fullmatch(mail):
-                        email_found = mail
-                        break
-        except:
-            pass
-        
-        if email_found == "-":
-            try:
-                content = page.content()
-                m = EMAIL_REGEX.search(content)
-                if m:
-                    email_found = m.group(0)
-            except:
-                pass
+        anchors = _scan_page(page, ranker, social)
         
-        try:
-            all_links = page.locator("a[href]").all()
-            for link in all_links:
-                href = link.get_attribute("href") or ""
-                if not href:
-                    continue
-                for key, patterns in SOCIAL_DOMAINS.items():
-                    if social_found[key] != "-":
-                        continue
-                    for p in patterns:
-                        if p in href:
-                            social_found[key] = href
-                            break
-        except:
-            pass
+        if not _contacts_complete(ranker, social):
+            with timed_stage("contact_pages"):
+                _crawl_contact_pages(page, anchors, ranker, social, fetched)
         
-        if email_found == "-":
+    except Exception as e:
+        logging.debug(f"Errore apertura sito {home}: {e}")
+    finally:
+        if page:
+            ACTIVE_PAGES.dec()
             try:
-                contact_links = page.locator("a[href]:has-text('Contatti'), a[href]:has-text('Contact')").all()
-                if contact_links:
-                    contact_url = contact_links[0].get_attribute("href")
-                    if contact_url:
-                        page.goto(contact_url, wait_until="domcontentloaded")
-                        content2 = page.content()
-                        m2 = EMAIL_REGEX.search(content2)
-                        if m2:
-                            email_found = m2.group(0)
+                page.close()
             except:
                 pass
-        
-        page.close()
-        
-    except Exception as e:
-        logging.debug(f"Errore apertura sito {home}: {e}")
     
-    with domain_cache_lock:
-        domain_cache[domain] = (email_found, social_found)
+    email_found = ranker.best() or "-"
+    social_found = social.result()
+    cache.put(domain, email_found, social_found)
+    
+    return email_found, social_found
+
+
+def _scan_page(page, ranker, social):
+    """Email e social della pagina con una sola evaluate; ritorna i link (href, testo)"""
+    try:
+        found = page.evaluate(SITE_SCAN_JS) or {}
+    except:
+        return []
+    return _apply_scan(found, ranker, social)
+
+
+def _apply_scan(found, ranker, social):
+    """Aggiunge a ranker e social il risultato di SITE_SCAN_JS; ritorna i link"""
+    anchors = found.get("anchors") or []
+    hrefs = [href for href, _ in anchors]
+    ranker.add_mailtos(hrefs)
+    ranker.add_text(found.get("text") or "")
+    social.add(hrefs)
+    return anchors
+
+
+def _contacts_complete(ranker, social):
+    """True quando c'è un'email del sito e ogni social ha un profilo: inutile cercare oltre"""
+    return ranker.has_site_email() and social.complete()
+
+
+def _crawl_contact_pages(page, anchors, ranker, social, fetched=()):
+    """Pagine interne candidate: in parallelo via HTTP, poi la prima nel browser se manca ancora l'email
+    
+    Le pagine in fetched sono già state scaricate dal tentativo HTTP e non vengono riscaricate.
+    """
+    candidates = rank_contact_links(anchors, page.url, CONTACT_PAGES)
+    if not candidates:
+        return
+    deadline = time.monotonic() + CONTACT_CRAWL_BUDGET
+    pending = [url for url in candidates if url not in fetched]
+    if pending:
+        _crawl_contact_pages_http(pending, normalize_domain(page.url), ranker, social)
+    if ranker or remaining(deadline) < 1:
+        return
+    # Sito renderizzato via JavaScript: la pagina più promettente nel browser
+    try:
+        page.set_default_timeout(min(CONTACT_TIMEOUT, remaining(deadline) * 1000))
+        rate_limiter.acquire(normalize_domain(page.url))
+        page.goto(candidates[0], wait_until="domcontentloaded")
+        _scan_page(page, ranker, social)
+    except:
+        pass
+
+
+# ========== HTTP FAST PATH ==========
+def _crawl_contact_pages_http(candidates, domain, ranker, social, fetched=None):
+    """Scarica le pagine candidate in parallelo entro CONTACT_CRAWL_BUDGET (annotandole in fetched)"""
+    def fetch(url):
+        if fetched is not None:
+            fetched.add(url)
+        rate_limiter.acquire(domain)
+        found = fetch_page(url, timeout=CONTACT_TIMEOUT / 1000)
+        return None if found is None or found.is_shell else found
+    
+    return crawl_pages(
+        candidates, fetch,
+        on_page=lambda found: _contacts_from_html_page(found, ranker, social),
+        is_complete=lambda: _contacts_complete(ranker, social),
+        budget=CONTACT_CRAWL_BUDGET,
+    )
+
+
+def _contacts_from_html_page(page, ranker, social):
+    """Email e social da una pagina HTML statica (stessa logica della versione browser)"""
+    hrefs = [href for href, _ in page.anchors]
+    ranker.add_mailtos(hrefs)
+    ranker.add_text(page.text)
+    social.add(hrefs)
+
+
+def estrai_contatti_http(home: str, fetched=None):
+    """Estrai email e social da homepage e pagina contatti via HTTP, senza browser
+    
+    Ritorna None se l'HTML statico non contiene nulla o sembra un guscio JavaScript:
+    in quel caso il chiamante ripiega sul browser, saltando le pagine candidate
+    annotate in fetched.
+    """
+    timeout = CONTACT_TIMEOUT / 1000
+    domain = normalize_domain(home)
+    rate_limiter.acquire(domain)
+    page = fetch_page(home, timeout=timeout)
+    if page is None or page.is_shell:
+        return None
+    
+    ranker = EmailRanker(domain)
+    social = SocialCollector()
+    _contacts_from_html_page(page, ranker, social)
     
+    if not _contacts_complete(ranker, social):
+        candidates = rank_contact_links(page.anchors, page.url, CONTACT_PAGES)
+        if candidates:
+            with timed_stage("contact_pages"):
+                _crawl_contact_pages_http(candidates, domain, ranker, social, fetched)
+    
+    email_found = ranker.best() or "-"
+    social_found = social.result()
+    if email_found == "-" and all(v == "-" for v in social_found.values()):
+        return None
     return email_found, social_found
 
 
+# ========== RICERCA (FEED) ==========
+def _harvests_feed(url):
+    """True se dall'URL si raccolgono i luoghi del feed: solo ricerche e solo in modalità ricerca
+    
+    In modalità places le righe hanno le colonne di un luogo: un URL /maps/search/ viene
+    elaborato come una scheda qualsiasi.
+    """
+    return INPUT_MODE == "search" and is_search_url(url)
+
+
+def _item_deadline(url):
+    """Scadenza in secondi: una ricerca comprende feed e siti di decine di luoghi"""
+    return SEARCH_DEADLINE if _harvests_feed(url) else URL_DEADLINE
+
+
+def _unseen_listings(listings):
+    """(chiave, campi) delle schede non ancora scritte in questa sessione né processate prima"""
+    store = get_processed_store(current_project) if result_queue is None else None
+    fresh = {}
+    for campi in listings:
+        key = place_key(campi["url"])
+        if key in fresh:
+            continue
+        with harvested_lock:
+            if key in harvested_places:
+                continue
+        if store is not None:
+            owner = store.place_url(key)
+            if owner is not None and owner in store:
+                continue
+        fresh[key] = campi
+    return list(fresh.items())
+
+
+def _scroll_search_feed(page):
+    """Scorre il feed fino alla fine dell'elenco, a SEARCH_MAX_RESULTS schede o finché non cresce più
+    
+    Ritorna False se la pagina non ha un feed (ricerca con un solo risultato).
+    """
+    try:
+        page.wait_for_selector(f"{SEARCH_FEED_SELECTOR}, {PLACE_PANEL_SELECTOR}", timeout=PLACE_PANEL_TIMEOUT)
+    except:
+        pass
+    if page.query_selector(SEARCH_FEED_SELECTOR) is None:
+        return False
+    last, stale = -1, 0
+    while stale < 3:
+        state = page.evaluate(FEED_SCROLL_JS) or {}
+        count = state.get("count", 0)
+        if state.get("end") or count >= SEARCH_MAX_RESULTS:
+            break
+        stale = stale + 1 if count == last else 0
+        last = count
+        page.wait_for_timeout(SEARCH_SCROLL_PAUSE)
+    return True
+
+
+def _contacts_without_browser(sites, fetched):
+    """Cache e HTTP di più siti in parallelo: sito → contatti, None dove serve il browser"""
+    with ThreadPoolExecutor(max_workers=SEARCH_ENRICH_WORKERS) as pool:
+        return dict(zip(sites, pool.map(lambda sito: _contatti_senza_browser(sito, HTTP_FIRST, fetched[sito]), sites)))
+
+
+def _contacts_for_sites(context, sites):
+    """Contatti di più siti: cache e HTTP in parallelo, il browser solo per quelli rimasti"""
+    sites = list(sites)
+    if not sites:
+        return {}
+    fetched = {sito: set() for sito in sites}
+    found = _contacts_without_browser(sites, fetched)
+    timer = current_timer()
+    for sito in sites:
+        if found[sito] is None:
+            if timer is not None:
+                timer.check_deadline()
+            found[sito] = estrai_contatti_da_sito(context, sito, http_first=False, fetched=fetched[sito])
+    return found
+
+
+def _listing_rows(listings, contacts):
+    """(chiave, url del luogo, riga) per ogni scheda"""
+    rows = []
+    for key, campi in listings:
+        email, social = contacts.get(campi["sito"]) or ("-", empty_social())
+        rows.append((key, campi["url"], _output_row(campi, email, social)))
+    return rows
+
+
+def estrai_risultati_ricerca(page):
+    """Luoghi del feed di una ricerca, con i contatti dei siti: lista di (chiave, url, riga)"""
+    with timed_stage("feed"):
+        has_feed = _scroll_search_feed(page)
+    if not has_feed:
+        # Maps ha aperto direttamente l'unico risultato
+        return [(place_key(page.url), page.url, estrai_dati_azienda(page))]
+    with timed_stage("fields"):
+        raw = page.evaluate(FEED_LISTINGS_JS) or []
+    listings = _unseen_listings([listing_fields(r) for r in raw[:SEARCH_MAX_RESULTS]])
+    with timed_stage("website"):
+        contacts = _contacts_for_sites(page.context, {c["sito"] for _, c in listings if c["sito"] != "-"})
+    return _listing_rows(listings, contacts)
+
+
+def _write_search_results(search, results):
+    """Scrive le righe dei luoghi di una ricerca
+    
+    L'ultima riga porta anche la chiave della ricerca: la ricerca risulta processata
+    solo quando tutte le sue righe sono scritte.
+    """
+    with harvested_lock:
+        fresh = [r for r in results if r[0] not in harvested_places]
+        harvested_places.update(key for key, _, _ in fresh)
+    for i, (key, place_url, row) in enumerate(fresh):
+        _record_found_stats(row)
+        write_to_sheet(row, (place_url, search) if i == len(fresh) - 1 else place_url)
+    if not fresh:
+        save_processed_url(search, current_project)
+    elif result_queue is None:
+        get_processed_store(current_project).set_place_urls([(key, place_url) for key, place_url, _ in fresh])
+    stats.inc("search_places", len(fresh))
+
+
 # ========== PROCESSED LOG ==========
 def get_project_log_file(project_name):
     """Ottieni il nome del file di log per un progetto"""
@@ -379,208 +1009,1321 @@ def get_project_log_file(project_name):
     return f"processed_urls_{safe_name}.log"
 
 
-def load_processed_urls(project_name):
-    """Carica URL già processati per un progetto"""
-    log_file = get_project_log_file(project_name)
-    processed = set()
-    p = Path(log_file)
-    if p.exists():
-        with p.open("r", encoding="utf-8") as f:
-            processed.update(line.strip() for line in f if line.strip())
-    return processed
-
-
-def save_processed_url(url, project_name):
-    """Salva URL processato per un progetto"""
-    log_file = get_project_log_file(project_name)
+def get_project_store_file(project_name):
+    """Database SQLite con lo stato degli URL di un progetto"""
+    safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', project_name)
+    return f"processed_{safe_name}.sqlite"
+
+
+def get_processed_store(project_name):
+    """Apre (una sola volta) il registro URL del progetto, migrando il vecchio .log"""
+    global processed_store
+    with processed_lock:
+        if processed_store is None:
+            processed_store = ProcessedStore(get_project_store_file(project_name))
+            migrated = processed_store.import_legacy_log(get_project_log_file(project_name))
+            if migrated:
+                print(f"📦 Importati {migrated} URL dal vecchio log del progetto")
+        return processed_store
+
+
+def close_processed_store():
+    """Scrive gli stati in sospeso e chiude il registro"""
+    global processed_store
     with processed_lock:
-        with open(log_file, "a", encoding="utf-8") as f:
-            f.write(url + "\n")
+        if processed_store is not None:
+            processed_store.close()
+            processed_store = None
+
+
+def load_processed_urls(project_name):
+    """Registro degli URL già processati (o falliti definitivamente); supporta `url in ...`"""
+    return get_processed_store(project_name)
+
+
+def save_processed_url(url, project_name, status=STATUS_DONE, error=None):
+    """Registra lo stato di un URL per un progetto (nei processi worker lo fa il coordinatore)"""
+    if result_queue is not None:
+        result_queue.put(("status", url, status, error))
+        return
+    get_processed_store(project_name).mark(url, status, error)
+    # Ogni stato finale chiude il lease (anche DONE senza righe, es. ricerca senza luoghi nuovi)
+    if status != STATUS_RETRYING and lease_queue is not None:
+        lease_queue.complete([url], status)
+
+
+def get_project_dead_letter_file(project_name):
+    """File dead-letter (URL falliti dopo MAX_TENTATIVI) di un progetto"""
+    safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', project_name)
+    return f"dead_letter_{safe_name}.jsonl"
+
+
+def init_retry_scheduler(project_name):
+    """Crea lo scheduler dei retry con il dead-letter del progetto"""
+    global retry_scheduler
+    retry_scheduler = RetryScheduler(
+        MAX_TENTATIVI, RETRY_BASE_DELAY, RETRY_MAX_DELAY,
+        dead_letter_file=get_project_dead_letter_file(project_name),
+    )
+    return retry_scheduler
+
+
+def export_dead_letter(project_name):
+    """Esporta il dead-letter del progetto in CSV; ritorna (file, numero URL)"""
+    safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', project_name)
+    report_file = f"dead_letter_{safe_name}.csv"
+    count = export_dead_letter_report(get_project_dead_letter_file(project_name), report_file)
+    return report_file, count
 
 
 def clear_processed_urls(project_name):
-    """Cancella il log degli URL processati per un progetto"""
-    log_file = get_project_log_file(project_name)
-    p = Path(log_file)
-    if p.exists():
-        p.unlink()
+    """Cancella il registro degli URL processati (dead-letter e checkpoint compresi) per un progetto"""
+    get_processed_store(project_name).clear()
+    for log_file in (get_project_log_file(project_name), get_project_dead_letter_file(project_name),
+                     get_project_checkpoint_file(project_name)):
+        p = Path(log_file)
+        if p.exists():
+            p.unlink()
     print(f"✅ Log del progetto '{project_name}' cancellato. Ricomincerò da capo.")
 
 
-# ========== WORKER ==========
-def pseudo_random_sleep():
-    time.sleep(random.uniform(DELAY_MIN, DELAY_MAX))
+# ========== CHECKPOINT ==========
+def get_project_checkpoint_file(project_name):
+    """Checkpoint della sessione interrotta (coda, retry, contatori) di un progetto"""
+    safe_name = re.sub(r'[^a-zA-Z0-9_-]', '_', project_name)
+    return f"checkpoint_{safe_name}.json"
 
 
-def check_time_limit():
-    """Controlla se è stato superato il limite di tempo"""
-    global session_start_time
-    if session_start_time:
-        elapsed = (datetime.now() - session_start_time).total_seconds()
-        return elapsed >= MAX_SESSION_TIME
-    return False
+def _drain_queue(queue):
+    """Svuota una coda: URL accodati che nessun worker ha preso"""
+    urls = []
+    while queue is not None:
+        try:
+            url = queue.get_nowait()
+        except Empty:
+            break
+        if url is not None:
+            urls.append(url)
+    return urls
 
 
-def worker(queue: Queue, pbar, playwright):
-    """Worker thread per estrazione parallela"""
-    global stats, current_project
+def save_session_checkpoint(project_name, queue=None):
+    """Salva quello che la sessione successiva deve riprendere
     
-    browser = None
+    - coda: URL interrotti oltre la grazia, rimasti in coda o letti e non ancora accodati
+      (con la coda distribuita no: i lease tornano agli altri nodi)
+    - retry programmati con i tentativi fatti, contatori della sessione, ritmo Maps raggiunto
+    """
+    retries = retry_scheduler.snapshot()
+    scheduled = {url for url, _ in retries["scheduled"]}
+    pending = [*interrupted_urls, *_drain_queue(queue), *unqueued_urls]
+    if lease_queue is not None:
+        pending, retries = [], {"attempts": {}, "scheduled": []}
+    # un URL fallito dopo l'interruzione è già tra i retry, con il tentativo contato
+    pending = [u for u in dict.fromkeys(pending) if u not in scheduled]
+    state = {
+        "project": project_name,
+        "reason": drain.reason,
+        "queue": pending,
+        "retries": retries,
+        "stats": stats.snapshot(),
+        "maps_rate": rate_limiter.maps.rate,
+    }
+    path = get_project_checkpoint_file(project_name)
     try:
-        browser = playwright.chromium.launch(headless=True)
-        context = browser.new_context(
-            viewport={'width': 1366, 'height': 900},
-            locale='it-IT',
-            user_agent='Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/140.0.0.0 Safari/537.36'
-        )
-        
-        while not stop_requested.is_set():
-            if check_time_limit():
-                stop_requested.set()
-                break
-            
-            try:
-                url = queue.get_nowait()
-            except:
-                break
-            
-            if not _looks_like_url(url):
-                logging.error(f"Input non valido: {url} → skip")
-                stats["errors"] += 1
-                pbar.update(1)
-                queue.task_done()
-                continue
-            
-            try:
-                page = context.new_page()
-                page.goto(url, wait_until="domcontentloaded")
-                accept_cookies_on_maps(page)
-                
-                dati = estrai_dati_azienda(page)
-                
-                # Statistiche
-                if dati[5] != "-":  # Email
-                    stats["emails_found"] += 1
-                if any(dati[6:13]) and any(d != "-" for d in dati[6:13]):  # Social
-                    stats["social_found"] += 1
-                
-                write_to_sheet(dati)
-                save_processed_url(url, current_project)
-                stats["processed"] += 1
-                
-                page.close()
-                pbar.update(1)
-                
-            except PlaywrightTimeout as e:
-                logging.error(f"Timeout su {url}: {e}")
-                stats["errors"] += 1
-                
-                try_count = 0
-                m = re.search(r"[?&]__ret=(\d+)", url)
-                if m:
-                    try_count = int(m.group(1))
-                if try_count + 1 < MAX_TENTATIVI:
-                    sep = "&" if "?" in url else "?"
-                    queue.put(f"{url}{sep}__ret={try_count+1}")
-                else:
-                    logging.error(f"Max tentativi raggiunti per {url}")
-                
-            except Exception as e:
-                logging.error(f"Errore imprevisto su {url}: {e}")
-                stats["errors"] += 1
-            
+        save_checkpoint(path, state)
+    except Exception as e:
+        logging.error(f"Errore salvataggio checkpoint {path}: {e}")
+        return None
+    print(f"💾 Checkpoint salvato in {path}: {len(pending)} URL in coda, {len(retries['scheduled'])} retry")
+    return path
+
+
+def load_session_checkpoint(project_name, processed):
+    """Carica (e cancella) il checkpoint della sessione precedente
+    
+    Ripristina subito contatori e ritmo Maps; ritorna il checkpoint con la coda
+    ripulita dagli URL già processati, oppure None.
+    """
+    path = get_project_checkpoint_file(project_name)
+    state = load_checkpoint(path)
+    if state is None:
+        return None
+    discard_checkpoint(path)
+    
+    stats.merge({k: v for k, v in (state.get("stats") or {}).items() if isinstance(v, int)})
+    maps_rate = state.get("maps_rate")
+    if isinstance(maps_rate, (int, float)):
+        rate_limiter.maps.set_rate(max(MAPS_RATE_MIN, min(MAPS_RATE_MAX, maps_rate)))
+    state["queue"] = [u for u in state.get("queue") or [] if u not in processed]
+    state["retries"] = state.get("retries") or {"attempts": {}, "scheduled": []}
+    print(f"♻️  Checkpoint del {state.get('saved_at', '?')}: {len(state['queue'])} URL in coda, "
+          f"{len(state['retries'].get('scheduled') or [])} retry, {stats['processed']} già processati")
+    return state
+
+
+def _resume_plan(checkpoint):
+    """(coda, retry) da riprendere; con più processi i retry vivono nei worker e ripartono dalla coda"""
+    if not checkpoint:
+        return [], None
+    if NUM_PROCESSES > 1:
+        return checkpoint["queue"] + [url for url, _ in checkpoint["retries"].get("scheduled") or []], None
+    return checkpoint["queue"], checkpoint["retries"]
+
+
+def resumed_urls(checkpoint):
+    """URL ripresi dal checkpoint (coda + retry): non vanno riletti dal foglio INPUT"""
+    if not checkpoint:
+        return set()
+    return set(checkpoint["queue"]) | {url for url, _ in checkpoint["retries"].get("scheduled") or []}
+
+
+# ========== ARRESTO ==========
+def request_drain(reason):
+    """Arresto coordinato: stop all'intake, DRAIN_GRACE secondi per le pagine in corso"""
+    if drain.request(reason):
+        why = {
+            REASON_TIME_LIMIT: "limite di tempo raggiunto",
+            REASON_WORKERS: "browser non avviabili",
+        }.get(reason, "arresto richiesto")
+        print(f"\n🛑 {why}: niente nuovi URL, {DRAIN_GRACE:.0f}s per chiudere quelli in corso")
+
+
+def install_shutdown_handlers():
+    """SIGTERM (redeploy Render) e Ctrl-C avviano il drain; un secondo segnale interrompe subito"""
+    drain.install_signal_handlers(
+        lambda signum: print(f"\n🛑 Segnale {signum} ricevuto: arresto con {DRAIN_GRACE:.0f}s di grazia "
+                             "(di nuovo per interrompere subito)")
+    )
+
+
+def _put_until_stopped(queue, url):
+    """Accoda url; se intanto arriva l'arresto lo mette tra gli URL da riprendere e ritorna False"""
+    while not stop_requested.is_set():
+        try:
+            queue.put(url, timeout=0.5)
+            return True
+        except Full:
+            continue
+    unqueued_urls.append(url)
+    return False
+
+
+# ========== CODA DISTRIBUITA ==========
+def open_work_queue(project_name):
+    """Apre la coda condivisa del progetto e avvia l'heartbeat dei lease"""
+    global lease_queue
+    lease_queue = LeaseQueue(
+        WORK_QUEUE_DB, project_name, node_id=NODE_ID,
+        lease_seconds=LEASE_SECONDS, batch_size=LEASE_BATCH,
+    ).start_heartbeat()
+    return lease_queue
+
+
+def close_work_queue():
+    """Restituisce agli altri nodi gli URL presi in lease e non completati"""
+    global lease_queue
+    if lease_queue is not None:
+        released = lease_queue.release()
+        if released:
+            print(f"🌐 {released} URL non completati restituiti alla coda distribuita")
+        lease_queue.close()
+        lease_queue = None
+
+
+def start_work_queue_ingestion(pages):
+    """Thread che versa nella coda distribuita le pagine lette dal foglio INPUT"""
+    def ingest():
+        added = 0
+        try:
+            for page in pages:
+                added += lease_queue.enqueue_many(page)
+        except Exception as e:
+            logging.error(f"Errore caricamento URL nella coda distribuita: {e}")
+        finally:
+            lease_ingest_done.set()
+        print(f"\n🌐 Coda distribuita: {added} nuovi URL aggiunti dal foglio INPUT")
+    
+    lease_ingest_done.clear()
+    t = threading.Thread(target=ingest, name="work-queue-ingest", daemon=True)
+    t.start()
+    return t
+
+
+def iter_leased_urls(queue_db):
+    """URL presi in lease a blocchi, finché nessun nodo ha più lavoro in corso
+    
+    Se gli URL rimasti sono in lease ad altri nodi si attende: se un nodo muore
+    i suoi lease scadono e vengono ripresi da qui.
+    """
+    while not stop_requested.is_set():
+        if check_time_limit():
+            request_drain(REASON_TIME_LIMIT)
+            return
+        batch = queue_db.claim()
+        if batch:
+            yield from batch
+        elif lease_ingest_done.is_set() and queue_db.outstanding() == 0:
+            return
+        else:
+            time.sleep(LEASE_POLL_INTERVAL)
+
+
+def grow_progress_total(urls, pbar):
+    """Allarga il totale della barra man mano che gli URL vengono accodati"""
+    for url in urls:
+        pbar.total += 1
+        if pbar.total % 100 == 0:
+            pbar.refresh()
+        yield url
+
+
+def start_url_feeder(urls, queue):
+    """Thread che accoda gli URL man mano che arrivano; intake_done segnala la fine"""
+    def feed():
+        try:
+            for url in urls:
+                if not _put_until_stopped(queue, url):
+                    break
+        except Exception as e:
+            logging.error(f"Errore lettura URL da accodare: {e}")
+        finally:
+            intake_done.set()
+    
+    intake_done.clear()
+    t = threading.Thread(target=feed, name="url-feeder", daemon=True)
+    t.start()
+    return t
+
+
+# ========== WORKER ==========
+def check_time_limit():
+    """Controlla se è stato superato il limite di tempo"""
+    if session_start_time:
+        elapsed = (datetime.now() - session_start_time).total_seconds()
+        return elapsed >= MAX_SESSION_TIME
+    return False
+
+
+def _record_found_stats(dati):
+    """Aggiorna i contatori di email e social trovati per una riga estratta"""
+    if dati[5] != "-":  # Email
+        stats.inc("emails_found")
+    if any(dati[6:13]) and any(d != "-" for d in dati[6:13]):  # Social
+        stats.inc("social_found")
+
+
+def _ensure_not_blocked(page_url):
+    """Solleva BlockedError se Google ha rediretto alla pagina captcha"""
+    if "/sorry/" in page_url or "google.com/sorry" in page_url:
+        raise BlockedError(f"pagina captcha: {page_url}")
+
+
+def _observe_stage(stage, seconds):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+
+
+def _finish_url_timer(timer, result):
+    """Chiude il timer dell'URL: istogramma della durata totale e record nel log tempi"""
+    timer.stop()
+    _record_url_time(timer, result)
+
+
+def _record_url_time(timer, result):
+    """Istogramma della durata totale e record nel log tempi (scrive su file)"""
+    URL_SECONDS.observe(timer.elapsed(), result=result)
+    if timing_log is not None:
+        timing_log.write(timer.record(result=result))
+
+
+def open_timing_log():
+    global timing_log
+    if TIMING_LOG_FILE and timing_log is None:
+        timing_log = TimingLog(TIMING_LOG_FILE)
+    return timing_log
+
+
+def close_timing_log():
+    global timing_log
+    if timing_log is not None:
+        timing_log.close()
+        timing_log = None
+
+
+# Fasi in cui un timeout dipende da Maps (e non da un sito lento)
+MAPS_STAGES = ("maps_goto", "cookies", "panel", "feed")
+
+
+def _is_maps_failure(error, kind):
+    """True per captcha/blocco e per i timeout della navigazione Maps: solo questi rallentano il ritmo"""
+    if kind == ERROR_BLOCKED:
+        return True
+    if kind != ERROR_TIMEOUT or isinstance(error, DeadlineExceeded):
+        return False
+    timer = current_timer()
+    return timer is not None and timer.failed_stage in MAPS_STAGES
+
+
+def _handle_failure(url, error, pbar):
+    """Classifica l'errore e programma il retry con backoff, oppure dead-letter"""
+    kind = classify_error(error)
+    stats.inc("errors")
+    if _is_maps_failure(error, kind):
+        rate_limiter.maps_feedback(kind)
+    if retry_scheduler.record_failure(url, kind, str(error)):
+        logging.warning(f"Errore {kind} su {url}: {error} → retry programmato")
+        RETRIES_TOTAL.inc(kind=kind)
+        save_processed_url(url, current_project, STATUS_RETRYING, kind)
+    else:
+        logging.error(f"Max tentativi raggiunti per {url} ({kind}) → dead-letter")
+        URLS_TOTAL.inc(result="failed")
+        save_processed_url(url, current_project, STATUS_FAILED, kind)
+        pbar.update(1)
+    return kind
+
+
+def _take_url_nowait(queue):
+    """Retry scaduto o prossimo URL in coda: (url, dalla_coda) oppure None"""
+    url = retry_scheduler.pop_due()
+    if url is not None:
+        return url, False
+    try:
+        return queue.get_nowait(), True
+    except Empty:
+        return None
+
+
+def _work_exhausted():
+    """True se non arriveranno altri URL e non ci sono retry in attesa"""
+    return intake_done.is_set() and retry_scheduler.next_due_in() is None
+
+
+def _next_url(queue):
+    """Attende il prossimo URL; None quando coda, ingestione e retry sono esauriti"""
+    while not stop_requested.is_set():
+        item = _take_url_nowait(queue)
+        if item is not None:
+            return item
+        if _work_exhausted():
+            # ricontrolla: l'ingestione può aver accodato l'ultimo URL nel frattempo
+            return _take_url_nowait(queue)
+        wait = retry_scheduler.next_due_in()
+        time.sleep(min(wait, 0.5) if wait is not None else 0.2)
+    return None
+
+
+def _setup_maps_context(context):
+    if BLOCK_RESOURCES:
+        MAPS_ROUTE_POLICY.install(context)
+
+
+def _has_work(queue):
+    """True finché restano URL in coda, in arrivo o in retry"""
+    return not stop_requested.is_set() and not (_work_exhausted() and queue.empty())
+
+
+def _abandon_url(url, pbar):
+    """URL di un worker bloccato e sostituito: conta come timeout"""
+    _handle_failure(url, TimeoutError("worker bloccato oltre la scadenza"), pbar)
+
+
+def _new_browser_slot(playwright):
+    return BrowserSlot(
+        playwright, CONTEXT_OPTIONS, _setup_maps_context,
+        max_pages=BROWSER_MAX_PAGES, max_rss_mb=BROWSER_MAX_RSS_MB, launch_options=LAUNCH_OPTIONS,
+    )
+
+
+def _start_playwright():
+    from playwright.sync_api import sync_playwright
+    return sync_playwright().start()
+
+
+def start_browser_prelaunch():
+    """Avvia in background i thread dei worker con Playwright e browser già pronti
+    
+    Chiamata prima dell'autenticazione a Sheets: browser e lettura dell'INPUT procedono
+    insieme. Ogni browser parte nel thread del worker che lo userà (gli oggetti Playwright
+    sync non si possono passare tra thread). Solo nel motore thread a processo singolo;
+    per il motore async si anticipa l'import di Playwright, i processi worker avviano i propri browser.
+    """
+    global prelaunched_slots
+    if NUM_PROCESSES > 1:
+        return
+    if ENGINE == "async":
+        threading.Thread(target=importlib.import_module, args=("playwright.async_api",),
+                         name="playwright-import", daemon=True).start()
+        return
+    if prelaunched_slots is None:
+        prelaunched_slots = PrelaunchedSlots(
+            _start_playwright, _new_browser_slot, NUM_WORKERS,
+            on_ready=lambda: mark_startup("browsers"),
+        ).start()
+
+
+def stop_browser_prelaunch():
+    """Chiude browser e Playwright dei thread pre-avviati mai consegnati a un worker"""
+    global prelaunched_slots
+    if prelaunched_slots is not None:
+        prelaunched_slots.close()
+        prelaunched_slots = None
+
+
+def mark_startup(phase):
+    """Registra (una volta) quando l'avvio raggiunge una fase; al primo URL stampa il riepilogo"""
+    with startup_lock:
+        if phase in startup_marks:
+            return
+        seconds = process_uptime()
+        startup_marks[phase] = seconds
+    STARTUP_SECONDS.set(seconds, phase=phase)
+    if phase == "first_url":
+        labels = {"main": "main", "sheets": "Sheets", "input": "INPUT", "browsers": "browser", "first_url": "primo URL"}
+        steps = " · ".join(f"{labels[p]} {startup_marks[p]:.1f}s" for p in labels if p in startup_marks)
+        print(f"\n⚡ Avvio (secondi dall'avvio del processo): {steps}")
+
+
+def run_supervised_workers(queue, pbar, n):
+    """Avvia n worker thread sotto supervisione e attende che il lavoro sia finito"""
+    supervisor = WorkerSupervisor(
+        lambda handle: _worker_thread(queue, pbar, handle),
+        n,
+        has_work=lambda: _has_work(queue),
+        hang_timeout=WORKER_HANG_TIMEOUT,
+        on_abandoned=lambda url: _abandon_url(url, pbar),
+        give_up=drain.expired,
+        spawn=prelaunched_slots.spawn if prelaunched_slots else None,
+    )
+    supervisor.run()
+    if supervisor.restarts or supervisor.replaced:
+        print(f"🩺 Worker riavviati: {supervisor.restarts}, sostituiti perché bloccati: {supervisor.replaced}")
+    if supervisor.restart_limit_hit and _has_work(queue):
+        # Nessun URL è stato consumato dai lanci falliti: coda e retry finiscono nel checkpoint
+        request_drain(REASON_WORKERS)
+    busy = supervisor.busy_urls()
+    if busy:
+        # Grazia scaduta: gli URL ancora in corso ripartono dalla prossima sessione
+        interrupted_urls.extend(busy)
+        print(f"🛑 {len(busy)} URL ancora in corso allo scadere della grazia → checkpoint")
+    return supervisor
+
+
+def _worker_thread(queue, pbar, handle):
+    """Corpo del thread worker: ogni thread avvia il proprio Playwright
+    
+    L'API sync di Playwright non si può usare da un thread diverso da quello che l'ha avviata
+    (greenlet: "Cannot switch to a different thread"). I thread pre-avviati arrivano con
+    handle.playwright già pronto.
+    """
+    if handle.playwright is not None:
+        worker(queue, pbar, handle.playwright, handle)
+        return
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as playwright:
+        worker(queue, pbar, playwright, handle)
+
+
+def worker(queue: Queue, pbar, playwright, handle=None):
+    """Worker thread per estrazione parallela
+    
+    Il browser è gestito da un BrowserSlot: la pagina Maps resta calda tra un URL e
+    l'altro e il browser viene riciclato dopo BROWSER_MAX_PAGES pagine o oltre la soglia RSS.
+    """
+    handle = handle or WorkerHandle(threading.current_thread().name)
+    slot = handle.slot or _new_browser_slot(playwright)
+    handle.slot = slot
+    try:
+        while not stop_requested.is_set() and not handle.retired.is_set():
+            if check_time_limit():
+                request_drain(REASON_TIME_LIMIT)
+                break
+            
+            # Browser prima dell'URL: se non si avvia il worker cade (e il supervisore lo
+            # riavvia) senza consumare un tentativo di un URL che non ha colpe
+            page = slot.acquire_page()
+            item = _next_url(queue)
+            if item is None:
+                break
+            url, from_queue = item
+            
+            if not _looks_like_url(url):
+                logging.error(f"Input non valido: {url} → skip")
+                stats.inc("errors")
+                URLS_TOTAL.inc(result="invalid")
+                pbar.update(1)
+                if from_queue:
+                    queue.task_done()
+                continue
+            
+            mark_startup("first_url")
+            deadline = _item_deadline(url)
+            timer = UrlTimer(url, observe=_observe_stage, deadline=deadline).start()
+            handle.begin(url, hang_timeout=deadline + WORKER_HANG_GRACE)
+            result = "done"
+            ACTIVE_PAGES.inc()
+            try:
+                rate_limiter.acquire(MAPS)
+                with timed_stage("maps_goto"):
+                    page.goto(url, wait_until="domcontentloaded")
+                _ensure_not_blocked(page.url)
+                with timed_stage("cookies"):
+                    accept_cookies_on_maps(page)
+                
+                if _harvests_feed(url):
+                    results = estrai_risultati_ricerca(page)
+                    if not handle.commit():
+                        result = "abandoned"  # URL già riassegnato dal supervisore
+                        continue
+                    with timed_stage("sink"):
+                        _write_search_results(url, results)
+                else:
+                    dati = estrai_dati_azienda(page)
+                    if not handle.commit():
+                        result = "abandoned"  # URL già riassegnato dal supervisore
+                        continue
+                    _record_found_stats(dati)
+                    with timed_stage("sink"):
+                        write_to_sheet(dati, url)
+                retry_scheduler.record_success(url)
+                rate_limiter.maps_feedback(None)
+                stats.inc("processed")
+                URLS_TOTAL.inc(result="done")
+                pbar.update(1)
+                
+            except Exception as e:
+                if handle.retired.is_set():
+                    result = "abandoned"  # errore dopo la sostituzione: l'URL è già in retry
+                else:
+                    result = _handle_failure(url, e, pbar)
+            
             finally:
-                queue.task_done()
-                pseudo_random_sleep()
+                handle.end()
+                _finish_url_timer(timer, result)
+                ACTIVE_PAGES.dec()
+                # Dopo un errore lo stato della pagina è incerto: meglio una nuova
+                slot.release_page(healthy=result == "done")
+                if from_queue:
+                    queue.task_done()
+    finally:
+        slot.close()
+
+
+# ========== ASYNC ENGINE ==========
+async def accept_cookies_on_maps_async(page):
+    """Accetta i cookies su Google Maps (versione async)"""
+    try:
+        await page.wait_for_selector(
+            "button:has-text('Accetta'), button:has-text('Accept'), button:has-text('OK')",
+            timeout=2500
+        )
+        await page.click("button:has-text('Accetta'), button:has-text('Accept'), button:has-text('OK')")
+        await asyncio.sleep(0.6)
+    except:
+        pass
+
+
+async def _wait_place_panel_async(page):
+    """Unica attesa del pannello del luogo (versione async)"""
+    try:
+        await page.wait_for_selector(PLACE_PANEL_SELECTOR, timeout=PLACE_PANEL_TIMEOUT)
+    except:
+        pass
+
+
+async def _leggi_stato_luogo_async(page):
+    """Campi dallo stato incorporato nella pagina (versione async)"""
+    try:
+        with timed_stage("state"):
+            return parse_place_payload(await page.evaluate(PLACE_STATE_JS), page.url)
+    except:
+        return None
+
+
+async def estrai_dati_azienda_async(page):
+    """Estrai i dati aziendali da Google Maps: stato della pagina, altrimenti un solo snapshot (versione async)"""
+    campi = await _leggi_stato_luogo_async(page)
+    _place_fields_source(campi)
+    if campi is None:
+        with timed_stage("panel"):
+            await _wait_place_panel_async(page)
+        try:
+            with timed_stage("fields"):
+                campi = await page.evaluate(PLACE_FIELDS_JS) or {}
+        except:
+            campi = {}
+    
+    if (campi.get("nome") or "-") == "-":
+        raise ParseError("pannello del luogo non trovato")
+    
+    sito = campi.get("sito") or "-"
+    email = "-"
+    social = empty_social()
+    
+    if sito != "-":
+        with timed_stage("website"):
+            email, social = await estrai_contatti_da_sito_async(page.context, sito)
+    
+    campi["url"] = page.url
+    return _output_row(campi, email, social)
+
+
+async def estrai_contatti_da_sito_async(context, sito_url: str, http_first=HTTP_FIRST, fetched=None):
+    """Estrai email e social da un sito web (versione async)
+    
+    Nel browser si usa una sola pagina: le pagine candidate passano via HTTP e solo
+    la più promettente viene aperta nella stessa scheda.
+    """
+    home = _normalize_home(sito_url)
+    domain = normalize_domain(home)
+    
+    annotate(site=domain)
+    fetched = set() if fetched is None else fetched
+    fast = await asyncio.to_thread(_contatti_senza_browser, home, http_first, fetched)
+    if fast is not None:
+        return fast
+    
+    annotate(contacts="browser")
+    
+    ranker = EmailRanker(domain)
+    social = SocialCollector()
+    
+    page = None
+    try:
+        page = await context.new_page()
+        ACTIVE_PAGES.inc()
+        if BLOCK_RESOURCES:
+            await SITE_ROUTE_POLICY.install_async(page)
+        page.set_default_timeout(CONTACT_TIMEOUT)
+        await rate_limiter.acquire_async(domain)
+        await page.goto(home, wait_until="domcontentloaded")
+        
+        try:
+            await page.evaluate("window.scrollTo(0, Math.min(1500, document.body.scrollHeight))")
+        except:
+            pass
+        
+        try:
+            await page.wait_for_selector("button:has-text('Accetta'), button:has-text('OK'), button:has-text('Accept')", timeout=2000)
+            await page.click("button:has-text('Accetta'), button:has-text('OK'), button:has-text('Accept')")
+            await asyncio.sleep(0.4)
+        except:
+            pass
+        
+        anchors = await _scan_page_async(page, ranker, social)
+        
+        if not _contacts_complete(ranker, social):
+            with timed_stage("contact_pages"):
+                await _crawl_contact_pages_async(page, anchors, ranker, social, fetched)
+        
+    except Exception as e:
+        logging.debug(f"Errore apertura sito {home}: {e}")
+    finally:
+        if page:
+            ACTIVE_PAGES.dec()
+            try:
+                await page.close()
+            except:
+                pass
+    
+    email_found = ranker.best() or "-"
+    social_found = social.result()
+    # SQLite: fuori dall'event loop
+    await asyncio.to_thread(get_contact_cache().put, domain, email_found, social_found)
+    
+    return email_found, social_found
+
+
+async def _scan_page_async(page, ranker, social):
+    """Email e social della pagina con una sola evaluate (versione async)"""
+    try:
+        found = await page.evaluate(SITE_SCAN_JS) or {}
+    except:
+        return []
+    return _apply_scan(found, ranker, social)
+
+
+async def _crawl_contact_pages_async(page, anchors, ranker, social, fetched=()):
+    """Come _crawl_contact_pages: candidate via HTTP, poi la prima nella stessa pagina del sito
+    
+    Nessuna pagina in più oltre quelle dei task: ASYNC_PAGES_PER_BROWSER resta il limite del browser.
+    """
+    candidates = rank_contact_links(anchors, page.url, CONTACT_PAGES)
+    if not candidates:
+        return
+    deadline = time.monotonic() + CONTACT_CRAWL_BUDGET
+    pending = [url for url in candidates if url not in fetched]
+    if pending:
+        await asyncio.to_thread(_crawl_contact_pages_http, pending, normalize_domain(page.url), ranker, social)
+    if ranker or remaining(deadline) < 1:
+        return
+    # Sito renderizzato via JavaScript: la pagina più promettente nel browser
+    try:
+        page.set_default_timeout(min(CONTACT_TIMEOUT, remaining(deadline) * 1000))
+        await rate_limiter.acquire_async(normalize_domain(page.url))
+        await page.goto(candidates[0], wait_until="domcontentloaded")
+        await _scan_page_async(page, ranker, social)
+    except:
+        pass
+
+
+async def _scroll_search_feed_async(page):
+    """Scorre il feed dei risultati (versione async)"""
+    try:
+        await page.wait_for_selector(f"{SEARCH_FEED_SELECTOR}, {PLACE_PANEL_SELECTOR}", timeout=PLACE_PANEL_TIMEOUT)
+    except:
+        pass
+    if await page.query_selector(SEARCH_FEED_SELECTOR) is None:
+        return False
+    last, stale = -1, 0
+    while stale < 3:
+        state = await page.evaluate(FEED_SCROLL_JS) or {}
+        count = state.get("count", 0)
+        if state.get("end") or count >= SEARCH_MAX_RESULTS:
+            break
+        stale = stale + 1 if count == last else 0
+        last = count
+        await page.wait_for_timeout(SEARCH_SCROLL_PAUSE)
+    return True
+
+
+async def estrai_risultati_ricerca_async(page):
+    """Luoghi del feed di una ricerca (versione async): i siti vengono visitati in parallelo"""
+    with timed_stage("feed"):
+        has_feed = await _scroll_search_feed_async(page)
+    if not has_feed:
+        return [(place_key(page.url), page.url, await estrai_dati_azienda_async(page))]
+    with timed_stage("fields"):
+        raw = await page.evaluate(FEED_LISTINGS_JS) or []
+    listings = await asyncio.to_thread(_unseen_listings, [listing_fields(r) for r in raw[:SEARCH_MAX_RESULTS]])
+    with timed_stage("website"):
+        contacts = await _contacts_for_sites_async(page.context, {c["sito"] for _, c in listings if c["sito"] != "-"})
+    return _listing_rows(listings, contacts)
+
+
+async def _contacts_for_sites_async(context, sites):
+    """Come _contacts_for_sites: cache e HTTP in parallelo nei thread, poi il browser un sito alla volta
+    
+    Così la ricerca usa al più una pagina del sito oltre a quella di Maps.
+    """
+    sites = list(sites)
+    if not sites:
+        return {}
+    fetched = {sito: set() for sito in sites}
+    found = await asyncio.to_thread(_contacts_without_browser, sites, fetched)
+    for sito in sites:
+        if found[sito] is None:
+            found[sito] = await estrai_contatti_da_sito_async(context, sito, http_first=False, fetched=fetched[sito])
+    return found
+
+
+async def _process_url_async(context, idle_pages, url, from_queue, queue, pbar):
+    """Elabora un singolo URL Maps con una pagina calda del contesto (o una nuova)
+    
+    Oltre URL_DEADLINE secondi l'elaborazione viene annullata e conta come timeout.
+    """
+    if not _looks_like_url(url):
+        logging.error(f"Input non valido: {url} → skip")
+        stats.inc("errors")
+        URLS_TOTAL.inc(result="invalid")
+        pbar.update(1)
+        if from_queue:
+            queue.task_done()
+        return
+    
+    mark_startup("first_url")
+    timer = UrlTimer(url, observe=_observe_stage).start()
+    result = "done"
+    page = None
+    try:
+        async with asyncio.timeout(_item_deadline(url)):
+            page = idle_pages.pop() if idle_pages else await context.new_page()
+            ACTIVE_PAGES.inc()
+            await rate_limiter.acquire_async(MAPS)
+            with timed_stage("maps_goto"):
+                await page.goto(url, wait_until="domcontentloaded")
+            _ensure_not_blocked(page.url)
+            with timed_stage("cookies"):
+                await accept_cookies_on_maps_async(page)
+            
+            if _harvests_feed(url):
+                results = await estrai_risultati_ricerca_async(page)
+            else:
+                dati = await estrai_dati_azienda_async(page)
         
-        context.close()
-        browser.close()
+        # Fuori dalla scadenza: una riga già accodata non va annullata a metà
+        # Sheets è bloccante: non deve fermare l'event loop
+        with timed_stage("sink"):
+            if _harvests_feed(url):
+                await asyncio.to_thread(_write_search_results, url, results)
+            else:
+                _record_found_stats(dati)
+                await asyncio.to_thread(write_to_sheet, dati, url)
+        retry_scheduler.record_success(url)
+        rate_limiter.maps_feedback(None)
+        stats.inc("processed")
+        URLS_TOTAL.inc(result="done")
+        pbar.update(1)
         
+    except asyncio.CancelledError:
+        if _browser_lost(context) and not drain.requested:
+            # Browser caduto: l'URL riparte con il prossimo browser
+            result = "requeued"
+            retry_scheduler.requeue(url)
+        else:
+            # Grazia dell'arresto scaduta: l'URL riparte dalla prossima sessione
+            result = "interrupted"
+            interrupted_urls.append(url)
+        raise
+    
     except Exception as e:
-        logging.error(f"Errore worker: {e}")
+        if _browser_lost(context):
+            # La colpa è del browser, non dell'URL: nessun tentativo consumato
+            result = "requeued"
+            retry_scheduler.requeue(url)
+        else:
+            # Registro URL, dead-letter e log: su disco, fuori dall'event loop
+            result = await asyncio.to_thread(_handle_failure, url, e, pbar)
+    
+    finally:
+        timer.stop()
+        await asyncio.to_thread(_record_url_time, timer, result)
+        if page:
+            ACTIVE_PAGES.dec()
+            if result == "done":
+                idle_pages.append(page)
+            else:
+                try:
+                    await page.close()
+                except:
+                    pass
+        if from_queue:
+            queue.task_done()
+
+
+_async_launch_lock = None
+
+
+def _browser_lost(context):
+    """True se il browser del contesto è caduto (crash o processo chiuso)"""
+    return not context.browser.is_connected()
+
+
+def _browser_worn_out(pages_served, pid):
+    """True quando il browser va riciclato (troppe pagine o troppa memoria)"""
+    if BROWSER_MAX_PAGES and pages_served >= BROWSER_MAX_PAGES:
+        return True
+    if BROWSER_MAX_RSS_MB and pages_served and pages_served % 10 == 0:
+        return browser_rss_mb(pid) > BROWSER_MAX_RSS_MB
+    return False
+
+
+async def _browser_session_async(playwright, queue: Queue, pbar):
+    """Un browser che elabora fino a ASYNC_PAGES_PER_BROWSER pagine in parallelo
+    
+    Ritorna True se il browser va riciclato, False a lavoro finito; se il browser cade
+    solleva RuntimeError dopo aver rimesso in coda gli URL in corso.
+    """
+    global _async_launch_lock
+    if _async_launch_lock is None:
+        _async_launch_lock = asyncio.Lock()
+    
+    browser = None
+    recycle = False
+    try:
+        async with _async_launch_lock:
+            before = set(chromium_rss_by_browser())
+            browser = await playwright.chromium.launch(**LAUNCH_OPTIONS)
+            pid = launched_browser_pid(before)
+        context = await browser.new_context(**CONTEXT_OPTIONS)
+        if BLOCK_RESOURCES:
+            await MAPS_ROUTE_POLICY.install_async(context)
+        slots = asyncio.Semaphore(ASYNC_PAGES_PER_BROWSER)
+        tasks = set()
+        idle_pages = []
+        pages_served = 0
+        crashed = False
+        
+        while not stop_requested.is_set():
+            if not browser.is_connected():
+                crashed = True
+                break
+            if check_time_limit():
+                request_drain(REASON_TIME_LIMIT)
+                break
+            if _browser_worn_out(pages_served, pid):
+                recycle = True
+                break
+            
+            await slots.acquire()
+            if stop_requested.is_set() or not browser.is_connected():
+                slots.release()
+                continue
+            item = _take_url_nowait(queue)
+            if item is None:
+                slots.release()
+                if not tasks and _work_exhausted() and queue.empty():
+                    break
+                # Le pagine ancora attive possono programmare altri retry
+                wait = retry_scheduler.next_due_in()
+                wait = min(wait, 0.5) if wait is not None else 0.2
+                if tasks:
+                    await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    await asyncio.sleep(wait)
+                continue
+            
+            url, from_queue = item
+            task = asyncio.create_task(_process_url_async(context, idle_pages, url, from_queue, queue, pbar))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+            pages_served += 1
+        
+        if tasks:
+            # All'arresto le pagine in corso hanno la grazia residua, poi vengono annullate;
+            # con il browser caduto falliscono subito e tornano in coda da sole
+            grace = min(5.0, drain.remaining()) if crashed else drain.remaining()
+            _, late = await asyncio.wait(set(tasks), timeout=grace)
+            for task in late:
+                task.cancel()
+            if late:
+                await asyncio.gather(*late, return_exceptions=True)
+        if crashed:
+            raise RuntimeError("browser disconnesso")
+        return recycle
+    
+    finally:
         if browser:
-            browser.close()
+            try:
+                await browser.close()
+            except:
+                pass
+
+
+async def _browser_loop_async(playwright, queue: Queue, pbar):
+    """Tiene in vita un browser async: lo ricicla quando è consumato e lo rilancia se cade"""
+    failures = 0
+    while not stop_requested.is_set():
+        try:
+            if not await _browser_session_async(playwright, queue, pbar):
+                return
+            failures = 0
+        except Exception as e:
+            failures += 1
+            logging.error(f"Errore browser async ({failures}/{BROWSER_MAX_FAILURES}): {e}")
+            if not _has_work(queue):
+                return
+            if failures >= BROWSER_MAX_FAILURES:
+                # URL in coda e rimessi in coda dal crash finiscono nel checkpoint
+                request_drain(REASON_WORKERS)
+                return
+            await asyncio.sleep(min(30, 2 ** failures))
+
+
+async def run_async_engine(queue: Queue, pbar):
+    """Motore asyncio: ASYNC_BROWSERS browser condivisi da più pagine concorrenti"""
+    from playwright.async_api import async_playwright
+    async with async_playwright() as playwright:
+        await asyncio.gather(*(
+            _browser_loop_async(playwright, queue, pbar) for _ in range(ASYNC_BROWSERS)
+        ))
+
+
+# ========== MULTI-PROCESSO ==========
+class _ProgressToCoordinator:
+    """Barra di avanzamento dei processi worker: inoltra gli update al coordinatore"""
+    
+    def update(self, n=1):
+        result_queue.put(("progress", n))
+
+
+def _feed_local_queue(work_queue, local_queue):
+    """Sposta gli URL dalla coda condivisa alla coda locale del processo"""
+    while not stop_requested.is_set():
+        url = work_queue.get()
+        if url is None or not _put_until_stopped(local_queue, url):
+            break
+    intake_done.set()
+
+
+def _watch_coordinator_drain(drain_event):
+    """Il coordinatore ha avviato l'arresto: drain anche in questo processo"""
+    drain_event.wait()
+    drain.request(REASON_SIGNAL)
+
+
+def _push_metrics(results, stop):
+    """Invia periodicamente al coordinatore lo stato delle metriche del processo"""
+    while not stop.wait(METRICS_PUSH_INTERVAL):
+        results.put(("metrics", os.getpid(), METRICS.state()))
+
+
+def _process_main(work_queue, results, project_name, start_time, n_processes, drain_event):
+    """Entry point di un processo worker: browser propri, risultati al coordinatore
+    
+    All'arresto restituisce al coordinatore la coda locale non elaborata e i retry programmati.
+    """
+    global result_queue, current_project, session_start_time, rate_limiter
+    
+    result_queue = results
+    current_project = project_name
+    session_start_time = start_time
+    # Il budget Maps è per nodo: ogni processo ne usa una quota
+    rate_limiter = HostRateLimiter(
+        MAPS_RATE / n_processes, MAPS_RATE_MIN / n_processes, MAPS_RATE_MAX / n_processes, SITE_RATE
+    )
+    init_retry_scheduler(project_name)
+    open_timing_log()
+    install_shutdown_handlers()
+    threading.Thread(target=_watch_coordinator_drain, args=(drain_event,), daemon=True).start()
+    
+    local_queue = Queue(maxsize=PROCESS_WORKERS * 4)
+    intake_done.clear()
+    threading.Thread(target=_feed_local_queue, args=(work_queue, local_queue), daemon=True).start()
+    QUEUE_DEPTH.set_function(local_queue.qsize)
+    metrics_stop = threading.Event()
+    threading.Thread(target=_push_metrics, args=(results, metrics_stop), daemon=True).start()
+    
+    pbar = _ProgressToCoordinator()
+    try:
+        if ENGINE == "async":
+            asyncio.run(run_async_engine(local_queue, pbar))
+        else:
+            run_supervised_workers(local_queue, pbar, PROCESS_WORKERS)
+    except Exception as e:
+        logging.error(f"Errore processo worker: {e}")
+    finally:
+        close_contact_cache()
+        close_timing_log()
+        metrics_stop.set()
+        results.put(("metrics", os.getpid(), METRICS.state()))
+        results.put(("routes", MAPS_ROUTE_POLICY.counters(), SITE_ROUTE_POLICY.counters()))
+        results.put(("stats", stats.snapshot()))
+        if drain.requested:
+            pending = [*interrupted_urls, *_drain_queue(local_queue), *unqueued_urls]
+            results.put(("checkpoint", pending, retry_scheduler.snapshot()))
+        results.put(("done", os.getpid()))
+
+
+def _handle_process_message(message, pbar):
+    """Il coordinatore è l'unico a scrivere su Sheets e sul registro URL"""
+    kind = message[0]
+    if kind == "row":
+        _, url, row = message
+        write_to_sheet(row, url)
+    elif kind == "status":
+        _, url, status, error = message
+        save_processed_url(url, current_project, status, error)
+    elif kind == "progress":
+        mark_startup("first_url")
+        pbar.update(message[1])
+    elif kind == "stats":
+        stats.merge(message[1])
+    elif kind == "routes":
+        MAPS_ROUTE_POLICY.merge(message[1])
+        SITE_ROUTE_POLICY.merge(message[2])
+    elif kind == "metrics":
+        METRICS.set_remote(message[1], message[2])
+    elif kind == "checkpoint":
+        # Un processo si è fermato da solo (browser non avviabili): si ferma la sessione
+        if not drain.requested:
+            request_drain(REASON_WORKERS)
+        # Coda e retry del processo finiscono nel checkpoint del coordinatore
+        unqueued_urls.extend(message[1])
+        retry_scheduler.restore(message[2])
+
+
+def run_process_pool(urls, pbar):
+    """Coordinatore: NUM_PROCESSES processi worker prelevano da una coda condivisa"""
+    ctx = multiprocessing.get_context("spawn")
+    # Coda limitata: con la coda distribuita il nodo non prende in lease più di quanto lavora
+    work_queue = ctx.Queue(maxsize=NUM_PROCESSES * PROCESS_WORKERS * 4)
+    results = ctx.Queue()
+    
+    drain_event = ctx.Event()
+    
+    def feed():
+        for u in urls:
+            if check_time_limit():
+                request_drain(REASON_TIME_LIMIT)
+            if not _put_until_stopped(work_queue, u):
+                break
+        for _ in range(NUM_PROCESSES):
+            work_queue.put(None)
+    
+    threading.Thread(target=feed, name="process-feeder", daemon=True).start()
+    QUEUE_DEPTH.set_function(work_queue.qsize)
+    # Browser e ritmo Maps sono dei processi worker, che li riportano ciascuno per sé:
+    # l'RSS visto da qui conterebbe due volte i loro browser
+    BROWSER_RSS.set_function(None)
+    MAPS_RATE_GAUGE.set_function(None)
+    
+    processes = [
+        ctx.Process(
+            target=_process_main,
+            args=(work_queue, results, current_project, session_start_time, NUM_PROCESSES, drain_event),
+        )
+        for _ in range(NUM_PROCESSES)
+    ]
+    for p in processes:
+        p.start()
+    
+    running = {p.pid for p in processes}
+    while running:
+        if drain.requested and not drain_event.is_set():
+            drain_event.set()
+        if drain.requested and time.monotonic() > drain.deadline + DRAIN_GRACE:
+            # Processi che non rispondono oltre il doppio della grazia: chiusi d'ufficio
+            for p in processes:
+                if p.pid in running and p.is_alive():
+                    logging.error(f"Processo worker {p.pid} non si è fermato in tempo → terminato")
+                    p.terminate()
+                running.discard(p.pid)
+            break
+        try:
+            message = results.get(timeout=1.0)
+        except Empty:
+            for p in processes:
+                if p.pid in running and not p.is_alive():
+                    logging.error(f"Processo worker {p.pid} terminato inatteso (exit code {p.exitcode})")
+                    running.discard(p.pid)
+            continue
+        if message[0] == "done":
+            running.discard(message[1])
+        else:
+            _handle_process_message(message, pbar)
+    
+    for p in processes:
+        p.join()
+    if drain.requested:
+        unqueued_urls.extend(_drain_queue(work_queue))
+    # Dopo uno stop per limite di tempo possono restare URL non letti nella coda condivisa
+    work_queue.cancel_join_thread()
 
 
 # ========== MAIN ==========
+def start_metrics():
+    """Avvia l'endpoint /metrics per tutta la sessione (se la porta è libera)"""
+    if not METRICS_ENABLED:
+        return None
+    try:
+        server = start_metrics_server(METRICS, METRICS_PORT)
+    except OSError as e:
+        logging.warning(f"Server metriche non avviato sulla porta {METRICS_PORT}: {e}")
+        return None
+    print(f"📈 Metriche Prometheus su http://0.0.0.0:{METRICS_PORT}/metrics")
+    return server
+
+
 def print_stats():
     """Stampa statistiche finali"""
     print("\n" + "=" * 60)
     print("📊 STATISTICHE SESSIONE")
     print("=" * 60)
+    print(f"📥 URL letti dal foglio INPUT: {ingest_stats['read']}")
+    if ingest_stats["skipped"]:
+        print(f"⏭️  Saltati (già processati o in dead-letter): {ingest_stats['skipped']}")
+    if ingest_stats["duplicates"]:
+        print(f"🔁 Doppioni dello stesso luogo saltati: {ingest_stats['duplicates']}")
     print(f"✅ URL processati: {stats['processed']}")
     print(f"📧 Email trovate: {stats['emails_found']}")
     print(f"🔗 Profili social trovati: {stats['social_found']}")
+    if stats["search_places"]:
+        print(f"🔎 Luoghi raccolti dai feed di ricerca: {stats['search_places']}")
     print(f"❌ Errori: {stats['errors']}")
+    if BLOCK_RESOURCES:
+        print(f"🛡️  {MAPS_ROUTE_POLICY.summary()}")
+        print(f"🛡️  {SITE_ROUTE_POLICY.summary()}")
     print("=" * 60)
 
 
 def main():
-    global current_project, session_start_time, stats
+    global current_project, session_start_time
     
+    mark_startup("main")
     print("=" * 60)
     print("🔍 GOOGLE MAPS SCRAPER - Versione Render")
     print("=" * 60)
+    try:
+        check_sinks(LOCAL_SINKS)
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ OUTPUT_SINKS non valido: {e}")
+        return
+    start_metrics()
     
     # Input URLs dalle variabili d'ambiente
     input_sheet_url = os.environ.get('INPUT_SHEET_URL')
     output_sheet_url = os.environ.get('OUTPUT_SHEET_URL')
     current_project = os.environ.get('PROJECT_NAME', 'render_project')
     
-    if not input_sheet_url or not output_sheet_url:
+    if not input_sheet_url or (SHEETS_OUTPUT and not output_sheet_url):
         print("❌ ERRORE: Variabili d'ambiente mancanti!")
         print("   Configura in Render:")
         print("   - INPUT_SHEET_URL")
-        print("   - OUTPUT_SHEET_URL")
+        if SHEETS_OUTPUT:
+            print("   - OUTPUT_SHEET_URL")
         return
     
     print(f"📊 INPUT: {input_sheet_url[:50]}...")
-    print(f"📊 OUTPUT: {output_sheet_url[:50]}...")
+    if SHEETS_OUTPUT:
+        print(f"📊 OUTPUT: {output_sheet_url[:50]}...")
     print(f"🏷️  PROGETTO: {current_project}")
     
+    # I browser partono mentre ci si autentica a Sheets e si legge l'INPUT
+    start_browser_prelaunch()
+    
     # Inizializza Google Sheets
     print("\n🔌 Connessione a Google Sheets...")
     client = init_google_sheets()
+    mark_startup("sheets")
     
-    # Mostra tab esistenti
-    print("\n📋 Progetti esistenti nel foglio OUTPUT:")
-    existing_tabs = get_existing_tabs(client, output_sheet_url)
-    
-    if existing_tabs:
-        for i, tab in enumerate(existing_tabs, 1):
-            print(f"   {i}. {tab}")
-        print(f"   {len(existing_tabs) + 1}. [NUOVO PROGETTO]")
+    if SHEETS_OUTPUT:
+        # Mostra tab esistenti
+        print("\n📋 Progetti esistenti nel foglio OUTPUT:")
+        existing_tabs = get_existing_tabs(client, output_sheet_url)
         
-        # Usa il progetto esistente o crea uno nuovo
-        if current_project in existing_tabs:
-            get_or_create_tab(client, output_sheet_url, current_project, create_new=False)
+        if existing_tabs:
+            for i, tab in enumerate(existing_tabs, 1):
+                print(f"   {i}. {tab}")
+            print(f"   {len(existing_tabs) + 1}. [NUOVO PROGETTO]")
+            
+            # Usa il progetto esistente o crea uno nuovo
+            if current_project in existing_tabs:
+                get_or_create_tab(client, output_sheet_url, current_project, create_new=False)
+            else:
+                current_project = get_or_create_tab(client, output_sheet_url, current_project, create_new=True)
         else:
+            print("   (Nessun progetto esistente)")
             current_project = get_or_create_tab(client, output_sheet_url, current_project, create_new=True)
-    else:
-        print("   (Nessun progetto esistente)")
-        current_project = get_or_create_tab(client, output_sheet_url, current_project, create_new=True)
     
     # Opzione ricomincia/prosegui (sempre prosegui su Render)
     print(f"\n❓ Progetto: '{current_project}'")
     print("   Proseguendo (salta URL già processati)")
     
-    # Leggi URL
-    print("\n📥 Lettura URL dal foglio INPUT...")
-    urls = get_urls_from_sheet(client, input_sheet_url)
-    print(f"✅ Trovati {len(urls)} URL totali")
-    
-    # Filtra già processati
+    # Leggi URL a pagine, saltando quelli già processati: i worker partono dalla prima pagina
+    print(f"\n📥 Lettura URL dal foglio INPUT (a pagine di {INPUT_PAGE_SIZE} righe)...")
     processed = load_processed_urls(current_project)
-    urls_to_process = [u for u in urls if u not in processed]
-    skipped = len(urls) - len(urls_to_process)
-    
-    if skipped > 0:
-        print(f"⏭️  Saltati {skipped} URL già processati in questo progetto")
-    print(f"🎯 Da processare: {len(urls_to_process)} URL\n")
+    checkpoint = load_session_checkpoint(current_project, processed)
+    pending_pages = iter_pending_pages(iter_url_pages(client, input_sheet_url), processed, resumed_urls(checkpoint))
+    resume_queue, resume_retries = _resume_plan(checkpoint)
+    scheduled_retries = len((resume_retries or {}).get("scheduled") or [])
     
-    if len(urls_to_process) == 0:
-        print("✅ Tutti gli URL sono già stati processati per questo progetto!")
-        return
+    if WORK_QUEUE_DB:
+        # Coda distribuita: gli URL vanno nella coda condivisa, il nodo li prende in lease a blocchi
+        open_work_queue(current_project)
+        print(f"🌐 Coda distribuita attiva (nodo {lease_queue.node_id})")
+        start_work_queue_ingestion(pending_pages)
+        url_source = iter_leased_urls(lease_queue)
+    else:
+        # La coda del checkpoint parte subito, mentre il foglio viene ancora letto
+        url_stream = itertools.chain(resume_queue, (u for page in pending_pages for u in page))
+        first_url = next(url_stream, None)
+        mark_startup("input")
+        if first_url is None and not scheduled_retries:
+            print(f"✅ Letti {ingest_stats['read']} URL: tutti già processati per questo progetto!")
+            stop_browser_prelaunch()
+            return
+        url_source = itertools.chain([first_url] if first_url is not None else [], url_stream)
     
     # Notifiche Telegram
     telegram_enabled = False
@@ -590,42 +2333,86 @@ def main():
     else:
         print("📱 Notifiche Telegram non configurate (opzionale)")
     
-    # Queue
-    q = Queue()
-    for u in urls_to_process:
-        q.put(u)
+    # Queue limitata: la lettura del foglio procede al ritmo dei worker
+    q = Queue(maxsize=max(NUM_WORKERS, ASYNC_BROWSERS * ASYNC_PAGES_PER_BROWSER) * 2)
+    QUEUE_DEPTH.set_function(q.qsize)
     
     # Start extraction
     session_start_time = datetime.now()
-    print(f"\n🚀 Avvio estrazione con {NUM_WORKERS} worker paralleli...")
+    if NUM_PROCESSES > 1:
+        print(f"\n🚀 Avvio estrazione con {NUM_PROCESSES} processi x {PROCESS_WORKERS} worker...")
+    elif ENGINE == "async":
+        print(f"\n🚀 Avvio estrazione async con {ASYNC_BROWSERS} browser x {ASYNC_PAGES_PER_BROWSER} pagine...")
+    else:
+        print(f"\n🚀 Avvio estrazione con {NUM_WORKERS} worker paralleli...")
     print(f"⏱️  Auto-stop dopo 2 ore (alle {(session_start_time + timedelta(seconds=MAX_SESSION_TIME)).strftime('%H:%M:%S')})")
     print()
+    install_shutdown_handlers()
     
-    with sync_playwright() as playwright:
-        workers = []
-        with tqdm(total=len(urls_to_process), desc="Estrazione", ncols=80) as pbar:
-            for _ in range(NUM_WORKERS):
-                t = threading.Thread(target=worker, args=(q, pbar, playwright), daemon=True)
-                workers.append(t)
-                t.start()
-            
-            q.join()
+    init_retry_scheduler(current_project)
+    if resume_retries:
+        retry_scheduler.restore(resume_retries)
+    start_sheets_writer(current_project)
+    if open_timing_log():
+        print(f"⏱️  Tempi per fase di ogni URL in {TIMING_LOG_FILE}")
+    from tqdm import tqdm
+    try:
+        # Il totale cresce man mano che le pagine del foglio vengono lette
+        with tqdm(total=scheduled_retries, desc="Estrazione", ncols=80) as pbar:
+            url_source = grow_progress_total(url_source, pbar)
+            if NUM_PROCESSES > 1:
+                run_process_pool(url_source, pbar)
+            elif ENGINE == "async":
+                start_url_feeder(url_source, q)
+                asyncio.run(run_async_engine(q, pbar))
+            else:
+                start_url_feeder(url_source, q)
+                # I primi worker girano nei thread pre-avviati durante l'autenticazione a Sheets;
+                # i retry non passano dalla coda: si aspetta la fine dei worker
+                run_supervised_workers(q, pbar, NUM_WORKERS)
+    finally:
+        print("💾 Scrittura delle ultime righe in output...")
+        stop_sheets_writer()
+        if drain.requested:
+            save_session_checkpoint(current_project, q)
+        stop_browser_prelaunch()
+        close_work_queue()
+        close_processed_store()
+        close_contact_cache()
+        close_timing_log()
     
     # Risultati
     print_stats()
     
-    if check_time_limit():
+    if drain.reason == REASON_TIME_LIMIT:
         msg = f"⏱️ SESSIONE INTERROTTA - Limite 2 ore raggiunto\n\nProgetto: {current_project}\n✅ Processati: {stats['processed']}\n📧 Email: {stats['emails_found']}\n\nRiavvia lo script per continuare!"
         print(f"\n{msg}")
         if telegram_enabled:
             send_telegram_notification(f"🔍 <b>Scraper Auto-Stop</b>\n\n{msg}")
+    elif drain.reason == REASON_SIGNAL:
+        msg = f"🛑 SESSIONE INTERROTTA - Arresto richiesto (es. redeploy)\n\nProgetto: {current_project}\n✅ Processati: {stats['processed']}\n📧 Email: {stats['emails_found']}\n\nAl prossimo avvio si riparte dal checkpoint!"
+        print(f"\n{msg}")
+        if telegram_enabled:
+            send_telegram_notification(f"🔍 <b>Scraper Arrestato</b>\n\n{msg}")
+    elif drain.reason == REASON_WORKERS:
+        msg = f"⚠️ SESSIONE INTERROTTA - Browser non avviabili\n\nProgetto: {current_project}\n✅ Processati: {stats['processed']}\n📧 Email: {stats['emails_found']}\n\nControlla l'installazione di Chromium; al prossimo avvio si riparte dal checkpoint!"
+        print(f"\n{msg}")
+        if telegram_enabled:
+            send_telegram_notification(f"🔍 <b>Scraper Fermo</b>\n\n{msg}")
     else:
         msg = f"✅ ESTRAZIONE COMPLETATA!\n\nProgetto: {current_project}\n✅ Processati: {stats['processed']}\n📧 Email: {stats['emails_found']}"
         print(f"\n{msg}")
         if telegram_enabled:
             send_telegram_notification(f"🔍 <b>Scraper Completato</b>\n\n{msg}")
     
-    print(f"\n📊 Dati salvati nel foglio OUTPUT, tab: {current_project}")
+    if SHEETS_OUTPUT:
+        print(f"\n📊 Dati salvati nel foglio OUTPUT, tab: {current_project}")
+    if local_writer:
+        print(f"💾 Dati salvati in: {', '.join(local_writer.worksheet.paths())}")
+    
+    report_file, dead_count = export_dead_letter(current_project)
+    if dead_count:
+        print(f"☠️  {dead_count} URL falliti dopo {MAX_TENTATIVI} tentativi → report: {report_file}")
 
 
 if __name__ == "__main__":
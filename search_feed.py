@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Modalità ricerca: una query (o un URL /maps/search/) → tutti i luoghi del feed dei risultati
+Il feed viene scorso fino alla fine (o a un massimo di risultati) e nome, categoria,
+indirizzo, telefono, sito, valutazione e URL di ogni scheda escono da una sola evaluate
+"""
+
+import re
+from urllib.parse import urlparse, parse_qs, quote_plus
+
+SEARCH_FEED_SELECTOR = "div[role='feed']"
+
+# Scorre il feed in fondo; ritorna quante schede ci sono e se Maps ha mostrato la fine dell'elenco
+FEED_SCROLL_JS = """
+() => {
+    const feed = document.querySelector("div[role='feed']");
+    if (!feed) return {count: 0, end: true};
+    feed.scrollTop = feed.scrollHeight;
+    return {
+        count: feed.querySelectorAll("a.hfpxzc").length,
+        end: !!feed.querySelector("span.HlvSq"),
+    };
+}
+"""
+
+FEED_LISTINGS_JS = """
+() => Array.from(document.querySelectorAll("div[role='feed'] a.hfpxzc"), a => {
+    const card = a.closest("div.Nv2PK") || a.parentElement;
+    const text = (selector) => {
+        const el = card.querySelector(selector);
+        return el && el.textContent ? el.textContent.trim() : "";
+    };
+    const site = card.querySelector("a[data-value='Sito web'], a[data-value='Website'], a.lcr4fd");
+    return {
+        url: a.href,
+        nome: a.getAttribute("aria-label") || text(".qBF1Pd"),
+        valutazione: text("span.MW4etd"),
+        telefono: text("span.UsdlK"),
+        sito: site ? site.href : "",
+        righe: Array.from(card.querySelectorAll(".W4Efsd .W4Efsd"), d => d.textContent.trim()).filter(Boolean),
+    };
+})
+"""
+
+_PRICE = re.compile(r"^[€$£¥]{1,4}(?:\s*[-–]\s*[€$£¥]{1,4})?$|^[€$£¥]\s*\d")
+_HOURS = re.compile(r"^(aperto|chiuso|apre|chiude|open|closed|opens|closes|temporaneamente|24 ore)", re.IGNORECASE)
+
+
+def is_search_url(url) -> bool:
+    """True per un URL di ricerca Maps (/maps/search/... o /maps?q=...)"""
+    parsed = urlparse(url)
+    path = parsed.path.rstrip("/")
+    if path.startswith("/maps/search"):
+        return True
+    query = parse_qs(parsed.query)
+    return path == "/maps" and "q" in query and "cid" not in query
+
+
+def search_url(query) -> str:
+    """URL di ricerca Maps per una query testuale (es. "pizzerie Milano")"""
+    return f"https://www.google.com/maps/search/{quote_plus(query.strip())}?hl=it"
+
+
+def _looks_like_phone(value):
+    return sum(c.isdigit() for c in value) >= 6 and not re.search(r"[A-Za-z]{3,}", value)
+
+
+def _unwrap_redirect(href):
+    """Link del sito passato dal redirect google.com/url?q=... → link diretto"""
+    parsed = urlparse(href)
+    if parsed.path == "/url" and "google." in (parsed.hostname or ""):
+        target = parse_qs(parsed.query).get("q") or parse_qs(parsed.query).get("url")
+        return target[0] if target else href
+    return href
+
+
+def listing_fields(raw) -> dict:
+    """Campi di una scheda del feed nello stesso formato di PLACE_FIELDS_JS"""
+    categoria = indirizzo = ""
+    for line in raw.get("righe") or []:
+        parts = [p.strip() for p in line.replace("⋅", "·").split("·") if p.strip()]
+        if not parts or _HOURS.match(parts[0]):
+            continue
+        if not categoria:
+            categoria = parts[0]
+            parts = parts[1:]
+        for part in parts:
+            if not indirizzo and not _PRICE.match(part) and not _HOURS.match(part) and not _looks_like_phone(part):
+                indirizzo = part
+        if indirizzo:
+            break
+    return {
+        "nome": (raw.get("nome") or "").strip() or "-",
+        "categoria": categoria or "-",
+        "indirizzo": indirizzo or "-",
+        "telefono": (raw.get("telefono") or "").strip() or "-",
+        "sito": _unwrap_redirect((raw.get("sito") or "").strip()) or "-",
+        "valutazione": (raw.get("valutazione") or "").strip() or "-",
+        "url": raw.get("url") or "-",
+    }
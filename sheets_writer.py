@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Scrittura bufferizzata su Google Sheets
+Le righe vengono accumulate in memoria e inviate con append_rows in background
+"""
+
+import json
+import time
+import logging
+import threading
+from queue import Queue, Empty
+
+_STOP = object()
+
+
+def _flatten_keys(batch):
+    """Chiavi delle righe: una riga può portarne più di una (tupla)"""
+    keys = []
+    for _, key in batch:
+        if isinstance(key, tuple):
+            keys.extend(key)
+        elif key is not None:
+            keys.append(key)
+    return keys
+
+
+class SheetsBatchWriter:
+    """Writer in background che invia le righe a blocchi con append_rows
+
+    - flush quando il buffer raggiunge batch_size righe o dopo flush_interval secondi
+    - la coda è limitata a max_pending righe: oltre quel limite put() blocca (backpressure)
+    - un flush fallito viene ritentato con backoff esponenziale fino a max_retries volte,
+      poi le righe vengono salvate in fallback_file (JSONL) per non perderle
+    - on_flushed(keys) viene chiamata con le chiavi delle righe appena scritte
+      (key può essere una tupla di chiavi), on_fallback(keys) con quelle finite in fallback_file
+    - observe_flush(seconds, rows) riceve la durata di ogni append_rows riuscito
+    - worksheet può essere qualsiasi oggetto con append_rows (es. sinks.OutputSinks);
+      name compare nei log
+    """
+
+    def __init__(self, worksheet, batch_size=50, flush_interval=5.0, max_pending=2000,
+                 max_retries=5, fallback_file=None, on_flushed=None, observe_flush=None,
+                 name="Google Sheets", on_fallback=None):
+        self.worksheet = worksheet
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.fallback_file = fallback_file
+        self.on_flushed = on_flushed
+        self.on_fallback = on_fallback
+        self.observe_flush = observe_flush
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.flushes = 0
+        self._queue = Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name=f"writer-{name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def put(self, row, key=None):
+        """Accoda una riga (con chiave opzionale, es. l'URL); blocca solo se il buffer è pieno"""
+        self._queue.put((list(row), key))
+
+    def pending(self) -> int:
+        """Righe in coda non ancora inviate"""
+        return self._queue.qsize()
+
+    def close(self, timeout=None):
+        """Ferma il writer dopo un flush finale delle righe in coda"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            wait = self.flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except Empty:
+                item = None
+
+            if item is _STOP:
+                self._flush(batch)
+                return
+
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        rows = [row for row, _ in batch]
+        for attempt in range(self.max_retries):
+            try:
+                start = time.perf_counter()
+                self.worksheet.append_rows(rows, value_input_option="RAW")
+                if self.observe_flush:
+                    self.observe_flush(time.perf_counter() - start, len(rows))
+                self.rows_written += len(rows)
+                self.flushes += 1
+                self._notify(self.on_flushed, _flatten_keys(batch))
+                return
+            except Exception as e:
+                delay = min(60, 2 ** (attempt + 1))
+                logging.warning(
+                    f"Errore scrittura batch su {self.name} ({len(rows)} righe, "
+                    f"tentativo {attempt + 1}/{self.max_retries}): {e} → riprovo tra {delay}s"
+                )
+                time.sleep(delay)
+
+        self.rows_failed += len(rows)
+        logging.error(f"Impossibile scrivere {len(rows)} righe su {self.name} dopo {self.max_retries} tentativi")
+        if self._save_fallback(rows):
+            self._notify(self.on_fallback, _flatten_keys(batch))
+
+    def _notify(self, callback, keys):
+        if not callback or not keys:
+            return
+        try:
+            callback(keys)
+        except Exception as e:
+            logging.error(f"Errore callback dopo scrittura su {self.name}: {e}")
+
+    def _save_fallback(self, rows) -> bool:
+        """Salva le righe in fallback_file; True se sono al sicuro su file"""
+        if not self.fallback_file:
+            return False
+        try:
+            with open(self.fallback_file, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            logging.error(f"Righe non scritte salvate in {self.fallback_file}")
+            return True
+        except Exception as e:
+            logging.error(f"Errore salvataggio righe non scritte: {e}")
+            return False
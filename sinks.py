@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Output locali in streaming accanto (o al posto) di Google Sheets
+Ogni sink espone append_rows(rows) come un worksheet gspread: lo stesso
+SheetsBatchWriter li alimenta a blocchi in background
+- jsonl: un oggetto per riga, in append
+- csv: intestazione alla creazione del file, poi righe in append
+- parquet: una cartella di file part-*.parquet, uno per blocco (un row group ciascuno),
+  leggibile con pandas.read_parquet(cartella); richiede pyarrow
+"""
+
+import os
+import csv
+import json
+import logging
+import threading
+from datetime import datetime
+
+SINK_EXTENSIONS = {"jsonl": ".jsonl", "csv": ".csv", "parquet": "_parquet"}
+FALLBACK_SUFFIX = ".failed.jsonl"
+
+
+class JsonlSink:
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def append_rows(self, rows):
+        lines = [json.dumps(dict(zip(self.columns, row)), ensure_ascii=False) + "\n" for row in rows]
+        self._file.write("".join(lines))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class CsvSink:
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(self.columns)
+            self._file.flush()
+
+    def append_rows(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """Ogni append_rows scrive un file Parquet completo: un crash non corrompe i blocchi già scritti"""
+
+    def __init__(self, path, columns):
+        pa, pq = _import_pyarrow()
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.columns = list(columns)
+        self._schema = pa.schema([(c, pa.string()) for c in self.columns])
+        self._session = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._parts = 0
+        os.makedirs(path, exist_ok=True)
+
+    def append_rows(self, rows):
+        data = {c: [str(row[i]) if i < len(row) else None for row in rows] for i, c in enumerate(self.columns)}
+        table = self._pa.Table.from_pydict(data, schema=self._schema)
+        self._parts += 1
+        target = os.path.join(self.path, f"part-{self._session}-{os.getpid()}-{self._parts:05d}.parquet")
+        tmp = target + ".tmp"
+        self._pq.write_table(table, tmp, row_group_size=len(rows))
+        os.replace(tmp, target)
+
+    def close(self):
+        pass
+
+
+SINK_TYPES = {"jsonl": JsonlSink, "csv": CsvSink, "parquet": ParquetSink}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("l'output parquet richiede pyarrow (pip install \".[parquet]\")") from e
+    return pa, pq
+
+
+class OutputSinks:
+    """Più sink locali dietro un solo append_rows (stessa interfaccia di un worksheet)
+
+    Un sink che fallisce non blocca gli altri: le sue righe finiscono in
+    <percorso del sink>.failed.jsonl. L'errore risale (e il blocco viene ritentato
+    dal writer) se falliscono tutti, o se non si riesce a salvare il fallback.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self._lock = threading.Lock()
+
+    def append_rows(self, rows, value_input_option=None):
+        errors = []
+        with self._lock:
+            for sink in self.sinks:
+                try:
+                    sink.append_rows(rows)
+                except Exception as e:
+                    errors.append((sink, e))
+                    logging.error(f"Errore scrittura su {sink.path}: {e}")
+            if errors and len(errors) == len(self.sinks):
+                raise errors[0][1]
+            for sink, error in errors:
+                if not self._save_fallback(sink, rows):
+                    raise error
+
+    @staticmethod
+    def _save_fallback(sink, rows) -> bool:
+        """Righe non scritte su un sink: in append in un JSONL accanto al sink"""
+        path = sink.path + FALLBACK_SUFFIX
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logging.error(f"Errore salvataggio righe non scritte su {sink.path}: {e}")
+            return False
+        logging.error(f"Righe non scritte su {sink.path} salvate in {path}")
+        return True
+
+    def paths(self):
+        return [sink.path for sink in self.sinks]
+
+    def close(self):
+        with self._lock:
+            for sink in self.sinks:
+                try:
+                    sink.close()
+                except Exception as e:
+                    logging.error(f"Errore chiusura {sink.path}: {e}")
+
+
+def check_sinks(kinds):
+    """Da chiamare all'avvio: ValueError per un output sconosciuto, RuntimeError se manca pyarrow"""
+    unknown = [k for k in kinds if k not in SINK_TYPES]
+    if unknown:
+        raise ValueError(f"output sconosciuti: {', '.join(unknown)} (disponibili: sheets, {', '.join(SINK_TYPES)})")
+    if "parquet" in kinds:
+        _import_pyarrow()
+
+
+def open_sinks(kinds, directory, basename, columns):
+    """Apre i sink locali richiesti (es. ("jsonl", "parquet")) in directory/basename.*"""
+    check_sinks(kinds)
+    os.makedirs(directory, exist_ok=True)
+    sinks = [SINK_TYPES[k](os.path.join(directory, basename + SINK_EXTENSIONS[k]), columns) for k in kinds]
+    return OutputSinks(sinks)
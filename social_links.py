@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Classificazione dei link social di un sito
+Indice per hostname (nessun loop di sottostringhe), scarto di link di condivisione,
+intent, post e video, scelta del link al profilo più probabile per ogni social
+"""
+
+from urllib.parse import urlparse
+
+# Ordine delle colonne social nel foglio OUTPUT
+SOCIAL_NETWORKS = ("facebook", "instagram", "linkedin", "youtube", "tiktok", "x", "pinterest")
+
+SOCIAL_HOSTS = {
+    "facebook.com": "facebook",
+    "fb.com": "facebook",
+    "instagram.com": "instagram",
+    "linkedin.com": "linkedin",
+    "youtube.com": "youtube",
+    "tiktok.com": "tiktok",
+    "x.com": "x",
+    "twitter.com": "x",
+    "pinterest.com": "pinterest",
+    "pinterest.it": "pinterest",
+}
+
+# Primo segmento del percorso che non indica un profilo
+_REJECTED_SEGMENTS = {
+    "facebook": {"sharer", "sharer.php", "share", "share.php", "dialog", "plugins", "tr", "login",
+                 "login.php", "l.php", "photo.php", "photo", "watch", "hashtag", "policies", "privacy",
+                 "events", "groups", "story.php", "permalink.php", "media", "video.php", "videos", "reel",
+                 "stories", "marketplace", "gaming", "help", "business", "ads", "notes", "home.php",
+                 "search", "messages", "fundraisers", "donate"},
+    "instagram": {"p", "reel", "reels", "tv", "explore", "stories", "accounts", "share"},
+    "linkedin": {"sharearticle", "sharing", "share", "cws", "feed", "posts", "pulse", "jobs", "login"},
+    "youtube": {"watch", "embed", "shorts", "results", "playlist", "share", "redirect"},
+    "tiktok": {"share", "embed", "tag", "music", "discover"},
+    "x": {"intent", "share", "home", "hashtag", "search", "i", "login"},
+    "pinterest": {"pin", "share", "search"},
+}
+
+# Forme di percorso preferite (punteggio più alto = più canonico)
+_PREFERRED_SEGMENTS = {
+    "linkedin": {"company": 2, "school": 1, "in": 1},
+    "youtube": {"channel": 2, "c": 1, "user": 1},
+}
+
+
+def _network_for_host(host):
+    """Social dell'host (anche sottodomini come m.facebook.com, it.linkedin.com)"""
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        network = SOCIAL_HOSTS.get(".".join(parts[i:]))
+        if network:
+            return network
+    return None
+
+
+def classify_social(href):
+    """(social, url canonico, punteggio) per un link a un profilo, altrimenti None"""
+    if not href or not href.lower().startswith(("http://", "https://", "//")):
+        return None
+    parsed = urlparse(href if not href.startswith("//") else "https:" + href)
+    host = (parsed.hostname or "").lower()
+    network = _network_for_host(host)
+    if network is None:
+        return None
+
+    segments = [s for s in parsed.path.split("/") if s]
+    if not segments:
+        return None
+    first = segments[0].lower()
+    if first in _REJECTED_SEGMENTS[network]:
+        return None
+
+    score = _PREFERRED_SEGMENTS.get(network, {}).get(first, 0)
+    if network == "tiktok":
+        if not first.startswith("@"):
+            return None
+        segments = segments[:1]  # /@utente/video/123 → /@utente
+    if network == "youtube" and first.startswith("@"):
+        score = 2
+    if network == "linkedin" and first in ("company", "school", "in"):
+        segments = segments[:2]
+    if network == "facebook":
+        # /acme/posts/123 → /acme; /pg/acme/about → /acme; /pages/<nome>/<id> e /people/<nome>/<id> restano
+        if first == "pg":
+            segments = segments[1:2]
+        elif first in ("pages", "people"):
+            segments = segments[:3]
+        else:
+            segments = segments[:1]
+        if not segments:
+            return None
+
+    for mobile in ("m.", "mobile."):
+        if host.startswith(mobile):
+            host = "www." + host[len(mobile):]
+    canonical = f"https://{host}/{'/'.join(segments)}"
+    if network == "facebook" and first == "profile.php":
+        profile_id = [q for q in parsed.query.split("&") if q.startswith("id=")]
+        if not profile_id:
+            return None
+        canonical += "?" + profile_id[0]
+    return network, canonical, score
+
+
+class SocialCollector:
+    """Link social raccolti da una o più pagine dello stesso sito
+
+    Per ogni social vince il profilo con punteggio di percorso più alto, poi quello
+    linkato più volte (header + footer), poi il primo incontrato.
+    """
+
+    def __init__(self):
+        self._candidates = {network: {} for network in SOCIAL_NETWORKS}
+        self._order = 0
+
+    def add(self, hrefs):
+        for href in hrefs:
+            found = classify_social(href)
+            if found is None:
+                continue
+            network, canonical, score = found
+            key = canonical.lower().replace("://www.", "://", 1)
+            entry = self._candidates[network].get(key)
+            if entry is None:
+                self._candidates[network][key] = [canonical, score, 1, self._order]
+                self._order += 1
+            else:
+                entry[2] += 1
+
+    def best(self, network):
+        entries = self._candidates[network].values()
+        if not entries:
+            return "-"
+        return min(entries, key=lambda e: (-e[1], -e[2], e[3]))[0]
+
+    def result(self):
+        """Dizionario social → link (o "-") per le colonne del foglio"""
+        return {network: self.best(network) for network in SOCIAL_NETWORKS}
+
+    def complete(self) -> bool:
+        """True quando ogni social ha almeno un profilo"""
+        return all(self._candidates[network] for network in SOCIAL_NETWORKS)
+
+
+def empty_social():
+    return {network: "-" for network in SOCIAL_NETWORKS}
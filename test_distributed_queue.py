@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test della coda distribuita: iter_leased_urls deve esaurirsi quando ogni URL
+ha uno stato finale, comprese le ricerche senza righe e le righe finite nel fallback
+"""
+
+import threading
+
+import pytest
+
+import scraper_maps as sm
+from distributed_queue import LeaseQueue
+from sheets_writer import SheetsBatchWriter
+
+
+class _BrokenWorksheet:
+    def append_rows(self, rows, value_input_option=None):
+        raise RuntimeError("quota superata")
+
+
+@pytest.fixture
+def lease_session(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sm, "current_project", "test")
+    monkeypatch.setattr(sm, "processed_store", None)
+    monkeypatch.setattr(sm, "session_start_time", None)
+    monkeypatch.setattr(sm, "LEASE_POLL_INTERVAL", 0.05)
+    queue = LeaseQueue(str(tmp_path / "work.sqlite"), "test", node_id="node-1", batch_size=2)
+    monkeypatch.setattr(sm, "lease_queue", queue)
+    sm.lease_ingest_done.set()
+    yield queue
+    sm.stop_requested.set()
+    sm.close_processed_store()
+    queue.close()
+    sm.stop_requested.clear()
+    sm.lease_ingest_done.clear()
+
+
+def _drain(urls, handle, timeout=20):
+    """Consuma iter_leased_urls in un thread; True se il generatore si è esaurito"""
+    seen = []
+
+    def run():
+        for url in urls:
+            seen.append(url)
+            handle(url)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), seen
+
+
+def test_iter_leased_urls_exhausts_with_final_statuses(lease_session):
+    search = "https://www.google.com/maps/search/pizzerie+milano"
+    failed = "https://www.google.com/maps/place/Rotto/@45.1,9.1,17z"
+    fallback = "https://www.google.com/maps/place/Fallback/@45.2,9.2,17z"
+    lease_session.enqueue_many([search, failed, fallback])
+
+    writer = SheetsBatchWriter(
+        _BrokenWorksheet(), batch_size=1, max_retries=1, fallback_file="sheets_failed_test.jsonl",
+        on_flushed=sm._mark_rows_written, on_fallback=sm._mark_rows_fallback,
+    ).start()
+
+    def handle(url):
+        if url == search:
+            sm._write_search_results(url, [])  # nessun luogo nuovo: DONE senza righe
+        elif url == failed:
+            sm.save_processed_url(url, "test", sm.STATUS_FAILED, "error")
+        else:
+            writer.put(["Fallback"], url)
+            writer.close()
+
+    finished, seen = _drain(sm.iter_leased_urls(lease_session), handle)
+
+    assert finished, "iter_leased_urls resta in attesa di lease mai completati"
+    assert sorted(seen) == sorted([search, failed, fallback])
+    assert lease_session.outstanding() == 0
+    assert fallback in sm.get_processed_store("test")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test dell'estrazione email dal testo: offuscazioni riconosciute e falsi positivi scartati
+"""
+
+import pytest
+
+from email_engine import EmailRanker, normalize_email
+
+
+def _emails(text, site_domain=None):
+    ranker = EmailRanker(site_domain)
+    ranker.add_text(text)
+    return ranker.ranked()
+
+
+@pytest.mark.parametrize("text, email", [
+    ("Scrivici: info [at] pizzeriamario [dot] it", "info@pizzeriamario.it"),
+    ("info(chiocciola)pizzeriamario(punto)it", "info@pizzeriamario.it"),
+    ("me [at] home [dot] com", "me@home.com"),
+    ("contatti: info at pizzeriamario dot it", "info@pizzeriamario.it"),
+    ("mario.rossi at studiorossi punto it", "mario.rossi@studiorossi.it"),
+    ("ufficio_vendite at acme dot co dot uk", "ufficio_vendite@acme.co.uk"),
+])
+def test_obfuscated_emails(text, email):
+    assert _emails(text) == [email]
+
+
+@pytest.mark.parametrize("text", [
+    "Siamo at Milano punto vendita",
+    "write to me at home dot com",
+    "Ci vediamo at night dot com",
+    "Apriamo alle 9 at via Roma punto it",
+])
+def test_sentences_are_not_emails(text):
+    assert _emails(text) == []
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("logo@2x.png", None),
+    ("icon@3x.webp", None),
+    ("info@example.com", None),
+    ("5f2b8c9e1a7d4b3c6e0f9a8b@sentry.wixpress.com", None),
+    ("mario.map@studio.it", "mario.map@studio.it"),
+    ("Info@Pizzeria.IT", "Info@pizzeria.it"),
+])
+def test_normalize_email(value, expected):
+    assert normalize_email(value) == expected
+
+
+def test_site_domain_preferred():
+    text = "mario80@gmail.com — info@pizzeriamario.it — noreply@pizzeriamario.it"
+    assert _emails(text, "pizzeriamario.it")[0] == "info@pizzeriamario.it"
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test della chiave canonica dei luoghi (place_ids.place_key)
+"""
+
+from place_ids import place_key
+
+
+def test_place_key_ignores_zoom_and_state():
+    """Lo stesso /place/ con zoom, lingua e stato diversi ha la stessa chiave"""
+    a = place_key("https://www.google.com/maps/place/Bar+Sport/@45.46421,9.19012,17z")
+    b = place_key("https://www.google.com/maps/place/Bar+Sport/@45.46419,9.19008,12z?hl=it")
+    c = place_key("https://www.google.com/maps/place/Bar+Sport/@45.4642,9.1901,17z/data=!3m1!4b1")
+    assert a == b == c == "url:google.com/maps/place/Bar+Sport/@45.464,9.190"
+
+
+def test_place_key_keeps_same_name_places_apart():
+    """Due luoghi con lo stesso nome in città diverse non collassano sulla stessa chiave"""
+    milano = place_key("https://www.google.com/maps/place/Bar+Sport/@45.4642,9.1900,17z")
+    roma = place_key("https://www.google.com/maps/place/Bar+Sport/@41.9028,12.4964,17z")
+    assert milano != roma
+
+
+def test_place_key_prefers_place_coordinates_in_data():
+    """Le coordinate del luogo (!3d/!4d) valgono più della vista della mappa"""
+    a = place_key("https://www.google.com/maps/place/Bar+Sport/@45.40,9.10,12z/data=!3m1!4b1!3d45.4642!4d9.19")
+    b = place_key("https://www.google.com/maps/place/Bar+Sport/@45.4642,9.1900,17z")
+    assert a == b
+
+
+def test_place_key_keeps_viewport_without_place():
+    """Senza /place/ le coordinate restano nella chiave (solo lo zoom viene tolto)"""
+    a = place_key("https://www.google.com/maps/@45.1,9.1,17z")
+    b = place_key("https://www.google.com/maps/@45.2,9.2,17z")
+    assert a == "url:google.com/maps/@45.1,9.1"
+    assert a != b
+
+
+def test_place_key_prefers_cid():
+    assert place_key("https://maps.google.com/?cid=12345&hl=it") == "cid:12345"
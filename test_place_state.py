@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test del parser dello stato incorporato (place_state) su una pagina Maps salvata,
+e del ripiego sul pannello (DOM) quando lo stato manca o è di un altro luogo
+"""
+
+from pathlib import Path
+
+import pytest
+
+import scraper_maps as sm
+from place_state import parse_place_html, parse_place_payload, state_payload_from_html
+
+FIXTURE = Path(__file__).parent / "bench" / "fixtures" / "place_state_maps.html"
+PLACE_URL = ("https://www.google.com/maps/place/Osteria+dell'Arco/@45.4579612,9.1812243,17z/"
+             "data=!3m1!4b1!4m6!3m5!1s0x4786c1868d74d1e5:0x9a1c3f0e5b7d2c41!8m2!3d45.4579612!4d9.1812243")
+OTHER_URL = "https://www.google.com/maps/place/Altro/data=!4m2!3m1!1s0x4786c1868d74d1e5:0x1234"
+
+
+@pytest.fixture(scope="module")
+def html():
+    return FIXTURE.read_text(encoding="utf-8")
+
+
+def test_parse_saved_maps_page(html):
+    assert parse_place_html(html, PLACE_URL) == {
+        "nome": "Osteria dell'Arco – Pizzeria & Cucina",
+        "categoria": "Pizzeria",
+        "indirizzo": "Corso di Porta Ticinese, 16, 20123 Milano MI",
+        "telefono": "02 8942 1180",
+        "sito": "http://www.osteriadellarco.it/?utm_source=gmb&utm_medium=referral",
+        "valutazione": "4,4",
+    }
+
+
+def test_state_of_another_place_is_rejected(html):
+    assert parse_place_html(html, OTHER_URL) is None
+
+
+@pytest.mark.parametrize("payload", [None, "", "[1,2,3]", ")]}'\nnon json", ")]}'\n[null,null,null,null,null,null,[]]"])
+def test_invalid_payload(payload):
+    assert parse_place_payload(payload) is None
+
+
+class _PanelOnlyPage:
+    """Pagina Maps finta: lo stato è di un altro luogo, il pannello ha i campi giusti"""
+
+    def __init__(self, state_payload):
+        self.url = OTHER_URL
+        self.state_payload = state_payload
+        self.context = None
+
+    def evaluate(self, script):
+        if script == sm.PLACE_STATE_JS:
+            return self.state_payload
+        assert script == sm.PLACE_FIELDS_JS
+        return {"nome": "Altro", "categoria": "Bar", "indirizzo": "Via Vigevano, 3, 20144 Milano MI",
+                "telefono": "02 1234 567", "sito": "-"}
+
+    def wait_for_selector(self, selector, timeout=None):
+        return True
+
+
+def test_dom_fallback_when_state_does_not_match(html):
+    dom_reads = sm.PLACE_FIELDS_SOURCE.values().get(("dom",), 0)
+    row = sm.estrai_dati_azienda(_PanelOnlyPage(state_payload_from_html(html)))
+    assert row[:5] == ["Altro", "Bar", "Via Vigevano, 3, 20144 Milano MI", "02 1234 567", "-"]
+    assert sm.PLACE_FIELDS_SOURCE.values()[("dom",)] == dom_reads + 1
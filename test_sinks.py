@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test degli output locali: un sink che fallisce non perde le sue righe
+"""
+
+import json
+
+import pytest
+
+from sinks import FALLBACK_SUFFIX, JsonlSink, OutputSinks
+
+
+class _BrokenSink:
+    def __init__(self, path):
+        self.path = path
+
+    def append_rows(self, rows):
+        raise OSError("disco pieno")
+
+    def close(self):
+        pass
+
+
+def test_failed_sink_rows_go_to_fallback(tmp_path):
+    good = JsonlSink(str(tmp_path / "progetto.jsonl"), ["Nome", "Email"])
+    broken = _BrokenSink(str(tmp_path / "progetto.csv"))
+    sinks = OutputSinks([good, broken])
+
+    sinks.append_rows([["Bar Sport", "info@barsport.it"]])
+    sinks.close()
+
+    assert (tmp_path / "progetto.jsonl").read_text(encoding="utf-8").count("\n") == 1
+    fallback = (tmp_path / ("progetto.csv" + FALLBACK_SUFFIX)).read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in fallback] == [["Bar Sport", "info@barsport.it"]]
+
+
+def test_all_sinks_failing_raises(tmp_path):
+    sinks = OutputSinks([_BrokenSink(str(tmp_path / "a.csv")), _BrokenSink(str(tmp_path / "b.jsonl"))])
+    with pytest.raises(OSError):
+        sinks.append_rows([["Bar Sport"]])
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Test della classificazione dei link social (profili tenuti, post ed eventi scartati)
+"""
+
+import pytest
+
+from social_links import classify_social
+
+
+@pytest.mark.parametrize("href, canonical", [
+    ("https://www.facebook.com/acme", "https://www.facebook.com/acme"),
+    ("https://www.facebook.com/acme/posts/123456", "https://www.facebook.com/acme"),
+    ("https://m.facebook.com/acme/photos/?ref=page_internal", "https://www.facebook.com/acme"),
+    ("https://www.facebook.com/pg/acme/about/", "https://www.facebook.com/acme"),
+    ("https://www.facebook.com/pages/Acme-Srl/123456789/", "https://www.facebook.com/pages/Acme-Srl/123456789"),
+    ("https://www.facebook.com/profile.php?id=1000123&sk=about", "https://www.facebook.com/profile.php?id=1000123"),
+])
+def test_facebook_profile_link(href, canonical):
+    assert classify_social(href)[1] == canonical
+
+
+@pytest.mark.parametrize("href", [
+    "https://www.facebook.com/events/987654321/",
+    "https://www.facebook.com/groups/amicidiacme/",
+    "https://www.facebook.com/sharer/sharer.php?u=https://acme.it",
+    "https://www.facebook.com/story.php?story_fbid=1&id=2",
+    "https://www.facebook.com/pg/",
+])
+def test_facebook_non_profile_rejected(href):
+    assert classify_social(href) is None